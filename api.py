@@ -0,0 +1,337 @@
+"""API de migração para uso programático (sem prompts do rich)
+
+    from api import LxcMigration, run
+    result = run(LxcMigration(id="120", name="web", target="10.0.0.5",
+                              password_ssh="...", password_ct="..."),
+                 sink=JsonLinesSink())
+
+`run_async` e `run_many` executam migrações em threads, cada uma com o
+seu sink de eventos; `run_containers` migra em paralelo os containers de
+uma origem que é host de Docker/LXC.
+"""
+import re
+import asyncio
+import threading
+import uuid
+import logging
+from dataclasses import dataclass, field, asdict, replace
+from datetime import datetime
+from typing import ClassVar, Optional
+
+from utils import events
+from utils import fanout
+from utils import placement
+from utils import source_containers
+from utils.events import JsonLinesSink, ListSink
+from utils.logger import use_migration
+from utils.exceptions import ValidationError
+from utils.migration_state import MigrationState
+from utils.profiler import tracer
+
+logger = logging.getLogger('lincon')
+
+@dataclass
+class DockerMigration:
+    """Migração de um host Linux para um container Docker local"""
+    kind: ClassVar[str] = "docker"
+
+    container_name: str
+    target: str
+    password_ssh: str
+    port: int = 22
+    network: str = "bridge"
+    ports: str = ""
+    volumes: str = ""
+    registry: str = ""
+    registry_user: str = ""
+    registry_password: str = ""
+    registry_insecure: bool = False
+    compression: str = "adaptive"
+    transfer: str = "full"
+    source_container: str = ""
+    validate: bool = False
+
+    def to_data(self):
+        """Dicionário `data` usado pelo migrate_docker"""
+        data = asdict(self)
+        data["passwordSSH"] = str(data.pop("password_ssh"))
+        data["port"] = str(self.port)
+        return data
+
+@dataclass
+class LxcMigration:
+    """Migração de um host Linux para um container LXC no Proxmox"""
+    kind: ClassVar[str] = "lxc"
+
+    id: str
+    name: str
+    target: str
+    password_ssh: str
+    password_ct: str
+    port: int = 22
+    bridge: str = "vmbr0"
+    ip: str = "dhcp"
+    gateway: str = "dhcp"
+    rootsize: str = "8"
+    memory: str = "512"
+    storage: str = "auto"
+    node: Optional[str] = None
+    engine: str = "auto"
+    compression: str = "adaptive"
+    extractor: str = "pct"
+    channel: str = "ssh"
+    channel_host: Optional[str] = None
+    channel_streams: int = 1
+    source_container: str = ""
+    validate: bool = False
+
+    def to_data(self):
+        """Dicionário `data` usado pelo migrate_lxc"""
+        data = asdict(self)
+        data["passwordSSH"] = str(data.pop("password_ssh"))
+        data["passwordCT"] = str(data.pop("password_ct"))
+        data.update(id=str(self.id), port=str(self.port), rootsize=str(self.rootsize), memory=str(self.memory))
+        return data
+
+REQUEST_TYPES = {"docker": DockerMigration, "lxc": LxcMigration}
+
+# Chaves do `data` dos jobs (--submit/--plan) -> campos das requisições
+_LEGACY_KEYS = {"passwordSSH": "password_ssh", "passwordCT": "password_ct"}
+
+def request_from_job(job):
+    """Cria a requisição tipada a partir de um job JSON ({"kind", "data"})"""
+    request_type = REQUEST_TYPES[job["kind"]]
+    fields = {_LEGACY_KEYS.get(key, key): value for key, value in job["data"].items()}
+    try:
+        return request_type(**fields)
+    except TypeError as e:
+        raise ValidationError(f"Job {job['kind']} inválido: {e}")
+
+@dataclass
+class MigrationResult:
+    migration_id: str
+    kind: str
+    success: bool
+    transferred_bytes: int = 0
+    metrics: dict = field(default_factory=dict)
+
+def _module(kind):
+    if kind == "lxc":
+        import migrate_lxc
+        return migrate_lxc
+    import migrate_docker
+    return migrate_docker
+
+def execute(kind, data, state_manager):
+    """Executa a conversão de uma migração já validada, salvando o estado
+
+    Núcleo comum à API e aos fluxos interativos.
+    """
+    module = _module(kind)
+    state_manager.save_state(data, "converting")
+    events.emit("state", step="converting")
+    with use_migration(state_manager.migration_id), tracer.span("convert", kind=kind) as span:
+        converted = module.convert(data)
+        span.set(bytes=data.get("transferred_bytes", 0), success=converted)
+
+    if converted:
+        state_manager.save_state(data, "completed")
+        state_manager.clear_state()  # Remove o arquivo de estado após sucesso
+    else:
+        state_manager.save_state(data, "failed")
+    events.emit("state", step="completed" if converted else "failed")
+    return converted
+
+def run(request, sink=None, migration_id=None):
+    """Executa uma migração sem interação, emitindo eventos para `sink`
+
+    Sem sink os eventos são descartados (nada é escrito no console).
+    """
+    migration_id = migration_id or _new_migration_id()
+    module = _module(request.kind)
+    data = request.to_data()
+    state_manager = MigrationState(migration_id)
+
+    with events.use_sink(sink or (lambda event: None), migration_id), use_migration(migration_id):
+        events.emit("state", step="started", kind=request.kind)
+        success = False
+        if module.check_dependencies() and module.validate_parameters(data):
+            state_manager.save_state(data, "validated")
+            try:
+                success = execute(request.kind, data, state_manager)
+            except Exception as e:
+                logger.error(f"Erro na migração {migration_id}: {e}")
+                state_manager.save_state(data, "failed")
+                events.emit("state", step="failed", error=str(e))
+        else:
+            events.emit("state", step="failed")
+
+        result = MigrationResult(
+            migration_id, request.kind, success,
+            transferred_bytes=data.get("transferred_bytes", 0),
+            metrics=data.get("metrics", {}),
+        )
+        events.emit("result", **asdict(result))
+    return result
+
+def _new_migration_id():
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+def run_fanout(requests, sink=None, migration_id=None):
+    """Coleta a origem uma vez e cria todos os destinos de `requests`
+
+    Todas as requisições devem ter a mesma origem. O stream do `tar czpf`
+    (com as exclusões de todos os tipos de destino) é repartido entre os
+    destinos (o mais lento dita o ritmo) e só chega ao fim depois que a
+    coleta terminou com sucesso: um destino não inicia o container com uma
+    coleta incompleta. O estado da migração guarda o status de cada
+    destino. Retorna um `MigrationResult` por requisição, na mesma ordem;
+    os bytes da rede são divididos entre os destinos pelo que cada um
+    recebeu.
+    """
+    first = requests[0]
+    source = (first.target, first.port, first.password_ssh)
+    if any((request.target, request.port, request.password_ssh) != source for request in requests):
+        raise ValidationError("Fan-out exige a mesma origem em todos os destinos")
+
+    migration_id = migration_id or _new_migration_id()
+    state_manager = MigrationState(migration_id)
+    targets = {}
+    for i, request in enumerate(requests):
+        data = request.to_data()
+        name = f"{i}-{request.kind}-{data.get('name') or data.get('container_name')}"
+        targets[name] = (request, data)
+    state = {
+        "target": first.target,
+        "targets": {name: {"kind": request.kind, "status": "pending"} for name, (request, _) in targets.items()},
+    }
+    lock = threading.Lock()
+
+    def update(name, status):
+        with lock:
+            state["targets"][name]["status"] = status
+            state_manager.save_state(state, "converting")
+        events.emit("target", target=name, status=status)
+
+    def consumer(name, request, data):
+        def consume(stream):
+            update(name, "converting")
+            converted = _module(request.kind).convert(data, stream)
+            update(name, "completed" if converted else "failed")
+            return converted
+        return consume
+
+    with events.use_sink(sink or (lambda event: None), migration_id), use_migration(migration_id):
+        events.emit("state", step="started", kind="fanout", targets=list(targets))
+        consumers = {}
+        for name, (request, data) in targets.items():
+            module = _module(request.kind)
+            if module.check_dependencies() and module.validate_parameters(data):
+                consumers[name] = consumer(name, request, data)
+            else:
+                update(name, "failed")
+
+        results, stats = {}, {"bytes": 0, "delivered": {}}
+        if consumers:
+            # Docker exclui também /boot e /lib/modules: vale a união dos tipos
+            excluded_paths = []
+            for request in requests:
+                for path in _module(request.kind).EXCLUDED_PATHS:
+                    if path not in excluded_paths:
+                        excluded_paths.append(path)
+            module = _module(first.kind)
+            module.display_message("TITLE_INFO", "MSG_COLLECTING_FS")
+            process = module.collect_fs(module.build_ssh_command(targets[next(iter(targets))][1]),
+                                        excluded_paths=excluded_paths)
+
+            def collected():
+                process.stdout.close()
+                return process.wait() == 0
+
+            try:
+                results, stats = fanout.tee(process.stdout, consumers, finish=collected)
+            finally:
+                # Todos os destinos desistiram antes do fim: a coleta é interrompida
+                if process.poll() is None and not any(results.values()):
+                    process.kill()
+                process.stdout.close()
+            if process.wait() != 0:
+                logger.error(f"Coleta do fan-out {migration_id} falhou")
+                results = dict.fromkeys(results, False)
+            logger.info(f"Fan-out {migration_id}: {stats['bytes']} bytes, espera por destino {stats.get('blocked_seconds')}")
+
+        success = bool(results) and all(results.values()) and len(results) == len(targets)
+        state_manager.save_state(state, "completed" if success else "failed")
+        if success:
+            state_manager.clear_state()
+        events.emit("state", step="completed" if success else "failed")
+
+        delivered = sum(stats["delivered"].values())
+        outcome = []
+        for name, (request, data) in targets.items():
+            share = stats["bytes"] * stats["delivered"].get(name, 0) // delivered if delivered else 0
+            metrics = dict(data.get("metrics", {}), fanout_stream_bytes=stats["bytes"])
+            result = MigrationResult(
+                migration_id, request.kind, results.get(name, False),
+                transferred_bytes=share, metrics=metrics,
+            )
+            events.emit("result", target=name, **asdict(result))
+            outcome.append(result)
+    return outcome
+
+async def run_async(request, sink=None, migration_id=None):
+    """Versão assíncrona de `run` (a migração roda em uma thread)"""
+    return await asyncio.to_thread(run, request, sink, migration_id)
+
+async def run_many(requests, sink=None, limit=4):
+    """Executa várias migrações no mesmo processo, no máximo `limit` ao mesmo tempo"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run_one(request):
+        async with semaphore:
+            return await run_async(request, sink)
+
+    return await asyncio.gather(*(run_one(request) for request in requests))
+
+def container_requests(request, containers, used_ids=None):
+    """Uma cópia de `request` por container da origem
+
+    Docker usa o nome do container de origem; LXC usa o nome como hostname
+    e numera os IDs a partir do ID de `request`, pulando os já usados no
+    cluster (`used_ids`, consultados no Proxmox se None).
+    """
+    if request.kind == "lxc" and used_ids is None:
+        used_ids = placement.PlacementEngine().used_ids()
+    requests = []
+    next_id = int(request.id) if request.kind == "lxc" else 0
+    for container in containers:
+        if request.kind == "lxc":
+            while next_id in used_ids:
+                next_id += 1
+            hostname = re.sub(r"[^A-Za-z0-9-]", "-", container["name"])
+            requests.append(replace(request, id=str(next_id), name=hostname,
+                                    source_container=container["id"]))
+            next_id += 1
+        else:
+            requests.append(replace(request, container_name=container["name"], source_container=container["id"]))
+    return requests
+
+def run_containers(request, containers=None, sink=None, limit=4):
+    """Migra em paralelo containers de uma origem que é host de containers
+
+    `containers` são nomes ou IDs (todos os detectados se None). Retorna
+    um `MigrationResult` por container.
+    """
+    detected = source_containers.detect(_module(request.kind).build_ssh_command(request.to_data()))
+    if containers is not None:
+        detected = [container for container in detected
+                    if container["name"] in containers or container["id"] in containers]
+    if not detected:
+        raise ValidationError("Nenhum container encontrado na origem")
+    return asyncio.run(run_many(container_requests(request, detected), sink, limit))
+
+__all__ = [
+    "DockerMigration", "LxcMigration", "MigrationResult", "JsonLinesSink", "ListSink",
+    "request_from_job", "execute", "run", "run_fanout", "run_async", "run_many",
+    "container_requests", "run_containers",
+]
@@ -0,0 +1,82 @@
+"""Benchmark do canal de dados TCP contra o `ssh` puro
+
+Transfere N MB de um comando remoto (por padrão `head -c` de /dev/zero,
+para medir só o transporte) pelo SSH padrão, pelo SSH com cifras AEAD e
+pelo canal TCP com 1 e 4 conexões. Com o sshd local, o loopback mostra o
+custo da cifra sem a rede:
+
+    python3 benchmarks/bench_data_channel.py --ssh "ssh root@127.0.0.1" --mb 2000
+
+Sem SSH (--ssh local) o "remoto" é um shell local e só o canal é medido.
+"""
+import argparse
+import shlex
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils import data_channel
+
+class Counter:
+    """Destino que só conta os bytes (sem custo de disco)"""
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+
+def over_ssh(ssh_command, remote_command):
+    counter = Counter()
+    process = subprocess.Popen(ssh_command + [remote_command], stdout=subprocess.PIPE)
+    while True:
+        chunk = process.stdout.read1(data_channel.CHUNK_SIZE)
+        if not chunk:
+            break
+        counter.write(chunk)
+    process.wait()
+    return counter.bytes
+
+def over_channel(ssh_command, remote_command, host, streams):
+    channel = data_channel.open_channel(ssh_command, remote_command, host, streams)
+    if channel is None:
+        return None
+    counter = Counter()
+    return counter.bytes if channel.receive(counter) else None
+
+def report(name, function):
+    started = time.perf_counter()
+    transferred = function()
+    elapsed = time.perf_counter() - started
+    if not transferred:
+        print(f"  {name:<22} indisponível")
+        return
+    print(f"  {name:<22} {elapsed:7.2f}s  {transferred / 1024 ** 2 / elapsed:8.1f} MB/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ssh", default="local", help='Comando SSH, ex.: "ssh root@host" (padrão: shell local)')
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço da origem para o canal TCP")
+    parser.add_argument("--mb", type=int, default=1000)
+    parser.add_argument("--command", default=None, help="Comando remoto (padrão: head -c de /dev/zero)")
+    args = parser.parse_args()
+
+    remote_command = args.command or f"head -c {args.mb * 1024 * 1024} /dev/zero"
+    if args.ssh == "local":
+        # Junta os argumentos como o sshd faz e executa no shell local
+        ssh_command = ["sh", "-c", 'eval "$*"', "sh"]
+    else:
+        ssh_command = shlex.split(args.ssh)
+
+    print(f"{args.mb} MB via {args.ssh}")
+    if args.ssh != "local":
+        report("ssh", lambda: over_ssh(ssh_command, remote_command))
+        report("ssh (AEAD)", lambda: over_ssh(data_channel.fast_ssh_command(ssh_command), remote_command))
+    for streams in (1, 4):
+        report(f"tcp ({streams} conexões)", lambda: over_channel(ssh_command, remote_command, args.host, streams))
+
+if __name__ == "__main__":
+    main()
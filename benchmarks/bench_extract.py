@@ -0,0 +1,125 @@
+"""Benchmark da extração paralela contra o GNU tar
+
+Gera uma árvore de arquivos pequenos (estilo node_modules/spool de e-mail),
+empacota em um tar e mede `tar xpf` e o extrator do LINCON com diferentes
+números de workers, cada execução em um diretório vazio. Ao final compara
+as árvores extraídas (nomes, tamanhos, modos, mtimes e links).
+
+    python3 benchmarks/bench_extract.py --files 50000 --workers 4,16,32
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.extractor import extract
+
+def build_fixture(base, files, seed=1):
+    """Cria `files` arquivos de 0-8 KB em diretórios aninhados, com links"""
+    rng = random.Random(seed)
+    tree = base / "tree"
+    directories = [tree]
+    for i in range(files):
+        if i % 40 == 0:
+            parent = rng.choice(directories)
+            directory = parent / f"d{i}"
+            directory.mkdir(parents=True, exist_ok=True)
+            directories.append(directory)
+        path = rng.choice(directories) / f"f{i}.js"
+        path.write_bytes(os.urandom(rng.randint(0, 1024)) * rng.randint(1, 8))
+        if i % 100 == 0:
+            os.symlink(path.name, path.with_suffix(".link"))
+        if i % 250 == 0:
+            os.link(path, path.with_suffix(".hard"))
+    os.chmod(directories[-1], 0o700)
+
+    archive = base / "fixture.tar"
+    # Formato GNU, como o `tar czpf` da coleta
+    with tarfile.open(archive, "w", format=tarfile.GNU_FORMAT) as tar:
+        tar.add(tree, arcname=".")
+    return archive
+
+def snapshot(root):
+    """Nome -> (tipo, tamanho, modo, mtime, alvo) de cada entrada"""
+    entries = {}
+    for directory, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            path = os.path.join(directory, name)
+            st = os.lstat(path)
+            target = os.readlink(path) if os.path.islink(path) else None
+            size = st.st_size if not os.path.isdir(path) else 0
+            entries[os.path.relpath(path, root)] = (st.st_mode, size, int(st.st_mtime), target)
+    return entries
+
+def drop_caches():
+    """Limpa o page cache quando possível (root), para medir a escrita real"""
+    try:
+        subprocess.run(["sync"], check=True)
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3")
+    except OSError:
+        pass
+
+def timed(function, runs):
+    times = []
+    for _ in range(runs):
+        drop_caches()
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--workers", default="4,16")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--dir", default=None, help="Diretório de trabalho (padrão: temporário)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as work:
+        work = Path(work)
+        archive = build_fixture(work, args.files)
+        print(f"Fixture: {args.files} arquivos, {archive.stat().st_size / 1024 ** 2:.1f} MB de tar")
+
+        counter = iter(range(1_000_000))
+
+        def fresh():
+            path = work / f"out{next(counter)}"
+            path.mkdir()
+            return path
+
+        outputs = {}
+
+        def gnu_tar():
+            outputs["tar"] = fresh()
+            subprocess.run(["tar", "xpf", str(archive), "-C", str(outputs["tar"])], check=True)
+
+        baseline = timed(gnu_tar, args.runs)
+        print(f"  GNU tar            {baseline:7.2f}s")
+
+        reference = snapshot(outputs["tar"])
+        for workers in (int(value) for value in args.workers.split(",")):
+            def lincon():
+                outputs["lincon"] = fresh()
+                with open(archive, "rb") as f:
+                    extract(f, outputs["lincon"], workers=workers)
+
+            elapsed = timed(lincon, args.runs)
+            same = snapshot(outputs["lincon"]) == reference
+            print(f"  lincon {workers:3d} workers {elapsed:7.2f}s  ({baseline / elapsed:.2f}x)"
+                  f"{'' if same else '  ÁRVORE DIFERENTE DO GNU TAR'}")
+            shutil.rmtree(outputs["lincon"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark do tempo de importação do LINCON
+
+Executa `python -X importtime -c "import main"` várias vezes e mostra a
+mediana do tempo total e os módulos mais lentos. Com --max-ms, sai com
+código 1 se a mediana passar do limite (útil para acompanhar regressões).
+
+    python3 benchmarks/bench_startup.py --runs 10 --max-ms 150
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def measure_import(module):
+    """Retorna (tempo cumulativo do módulo em µs, {módulo: µs cumulativos})"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        modules[name] = int(cumulative_us)
+    return modules.get(module, 0), modules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    totals = []
+    slowest = {}
+    for _ in range(args.runs):
+        total, modules = measure_import(args.module)
+        totals.append(total)
+        for name, cumulative in modules.items():
+            slowest[name] = max(slowest.get(name, 0), cumulative)
+
+    median_ms = statistics.median(totals) / 1000
+    print(f"import {args.module}: mediana {median_ms:.1f} ms "
+          f"(min {min(totals) / 1000:.1f} ms, max {max(totals) / 1000:.1f} ms, {args.runs} execuções)")
+    print("\nMódulos mais lentos (cumulativo, pior execução):")
+    for name, cumulative in sorted(slowest.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(f"\nFALHOU: mediana acima de {args.max_ms} ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
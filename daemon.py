@@ -0,0 +1,248 @@
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+import subprocess
+import logging
+from pathlib import Path
+
+from utils.job_queue import JobQueue
+from utils.migration_state import MigrationState
+from utils.exceptions import ValidationError
+from utils.logger import use_migration
+from utils.system_info import get_storage_status, get_docker_root_free
+from utils.placement import PlacementEngine, HEADROOM
+
+logger = logging.getLogger('lincon')
+
+DEFAULT_SOCKET = "/run/lincon/lincon.sock"
+
+# Limites padrão do escalonador
+DEFAULT_MAX_JOBS = 4
+DEFAULT_BANDWIDTH_BUDGET = 1000  # Mbit/s somados entre jobs rodando
+DEFAULT_CPU_THRESHOLD = 0.8      # load average de 1 min por CPU
+POLL_INTERVAL = 5
+
+# Disco (GB) de um job LXC sem "rootsize", o mesmo padrão da API
+DEFAULT_ROOTSIZE = "8"
+
+class Scheduler:
+    """Admite jobs da fila conforme a capacidade atual do destino"""
+    def __init__(self, queue, max_jobs=DEFAULT_MAX_JOBS,
+                 bandwidth_budget=DEFAULT_BANDWIDTH_BUDGET, cpu_threshold=DEFAULT_CPU_THRESHOLD):
+        self.queue = queue
+        self.max_jobs = max_jobs
+        self.bandwidth_budget = bandwidth_budget
+        self.cpu_threshold = cpu_threshold
+
+    def _required_bytes(self, job):
+        """Espaço que o job vai ocupar no destino"""
+        if job["job"]["kind"] == "lxc":
+            return int(float(job.get("rootsize") or DEFAULT_ROOTSIZE) * 1024 ** 3)
+        # Docker: tarball temporário + camada da imagem
+        return job["job"]["estimated_bytes"] * 2
+
+    def _place(self, job, running):
+        """Escolhe storage/node para jobs LXC com storage "auto"
+
+        O espaço já reservado por jobs rodando em cada storage é descontado
+        antes de aceitar um candidato.
+        """
+        try:
+            candidates = PlacementEngine().place(
+                self._required_bytes(job), job["job"]["estimated_bytes"]
+            )
+        except Exception as e:
+            logger.warning(f"Falha na placement do job {job['job']['id']}: {e}")
+            return False
+
+        for candidate in candidates:
+            reserved = sum(
+                self._required_bytes(other) for other in running
+                if other["job"]["kind"] == "lxc"
+                and other.get("storage") == candidate["storage"]
+                and other.get("node") in (None, candidate["node"])
+            )
+            if candidate["avail"] - reserved >= candidate["required"] * HEADROOM:
+                job["storage"] = candidate["storage"]
+                job["node"] = candidate["node"]
+                return True
+        return False
+
+    def _has_storage(self, job, running):
+        kind = job["job"]["kind"]
+        reserved = sum(
+            self._required_bytes(other) for other in running
+            if other["job"]["kind"] == kind
+            and (kind == "docker" or other.get("storage") == job.get("storage"))
+        )
+        if kind == "lxc" and job.get("storage") in (None, "", "auto"):
+            return self._place(job, running)
+        try:
+            if kind == "lxc":
+                storage = get_storage_status().get(job["storage"])
+                if not storage or storage["status"] != "active":
+                    return False
+                free = storage["avail"]
+            else:
+                free = get_docker_root_free()
+        except (subprocess.CalledProcessError, FileNotFoundError, OSError) as e:
+            logger.warning(f"Não foi possível consultar a capacidade do destino: {e}")
+            return False
+        return free - reserved >= self._required_bytes(job)
+
+    def admit(self, job):
+        """Retorna True se o job pode começar agora"""
+        running = self.queue.running()
+        if len(running) >= self.max_jobs:
+            return False
+
+        load = os.getloadavg()[0] / (os.cpu_count() or 1)
+        if running and load > self.cpu_threshold:
+            return False
+
+        bandwidth = sum(other["job"]["bandwidth"] for other in running)
+        if running and bandwidth + job["job"]["bandwidth"] > self.bandwidth_budget:
+            return False
+
+        return self._has_storage(job, running)
+
+def validate_job(kind, data):
+    """Recusa no envio o job que não viraria uma requisição da API
+
+    O escalonador avalia os jobs sem interação: um rootsize inválido só
+    apareceria quando o job já estivesse na fila.
+    """
+    import api
+
+    request = api.request_from_job({"kind": kind, "data": data})
+    if kind == "lxc":
+        try:
+            rootsize = float(request.rootsize)
+        except (TypeError, ValueError):
+            rootsize = 0
+        if rootsize <= 0:
+            raise ValidationError(f"rootsize inválido: {request.rootsize!r} (tamanho em GB, ex.: 8)")
+
+def run_job(queue, job):
+    """Executa a migração de um job pela API, sem interação com o usuário
+
+    Os eventos atualizam a etapa do job na fila e o `MigrationResult` fica
+    nos metadados do job. A migração tem estado próprio (`<job>_run`): o
+    arquivo do job continua sendo da fila. Ao fim o estado da execução é
+    removido: quem guarda o resultado (e retoma o job) é a fila.
+    """
+    import api
+
+    job_id = job["job"]["id"]
+    migration_id = f"{job_id}_run"
+    data = {key: value for key, value in job.items() if key != "job"}
+
+    # Início e fim do job também vão para o log da migração
+    with use_migration(migration_id):
+        logger.info(f"Iniciando job {job_id} ({job['job']['kind']})")
+        result = None
+        try:
+            request = api.request_from_job({"kind": job["job"]["kind"], "data": data})
+            result = api.run(request, sink=lambda event: queue.record_event(job_id, event),
+                             migration_id=migration_id)
+        except Exception as e:
+            logger.error(f"Erro no job {job_id}: {e}")
+        MigrationState(migration_id).clear_state()
+
+        success = bool(result and result.success)
+        queue.finish(job_id, success, result.transferred_bytes if result else 0)
+        logger.info(f"Job {job_id} finalizado: {'sucesso' if success else 'falha'}")
+
+def scheduler_loop(queue, scheduler, stop_event):
+    """Inicia jobs enquanto houver capacidade"""
+    while not stop_event.is_set():
+        # Um job com dados inválidos não pode derrubar o escalonador
+        try:
+            job = queue.take_next(scheduler.admit)
+        except Exception:
+            logger.exception("Erro no escalonador")
+            job = None
+        if job:
+            threading.Thread(target=run_job, args=(queue, job), daemon=True).start()
+            continue
+        queue.wait(POLL_INTERVAL)
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Uma requisição JSON por linha, uma resposta JSON por linha"""
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                response = {"ok": True, "result": self.server.dispatch(request)}
+            except (ValueError, KeyError, TypeError, ValidationError) as e:
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode())
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, queue):
+        self.queue = queue
+        super().__init__(socket_path, RequestHandler)
+
+    def dispatch(self, request):
+        action = request["action"]
+        if action == "submit":
+            validate_job(request["kind"], request["data"])
+            return self.queue.submit(
+                request["kind"], request["data"],
+                priority=request.get("priority", 0),
+                deadline=request.get("deadline"),
+                estimated_bytes=request.get("estimated_bytes", 0),
+                bandwidth=request.get("bandwidth", 0),
+            )
+        if action == "list":
+            return self.queue.list_jobs()
+        if action == "cancel":
+            return self.queue.cancel(request["id"])
+        if action == "metrics":
+            return self.queue.metrics()
+        if action == "plan":
+            from plan import build_plan
+            return build_plan(request["kind"], request["data"], request.get("window"))
+        raise ValueError(f"Ação desconhecida: {action}")
+
+def run_daemon(socket_path=DEFAULT_SOCKET, **scheduler_options):
+    """Executa o daemon até receber SIGINT/SIGTERM"""
+    socket_path = Path(socket_path)
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    if socket_path.exists():
+        socket_path.unlink()
+
+    queue = JobQueue()
+    scheduler = Scheduler(queue, **scheduler_options)
+    stop_event = threading.Event()
+
+    threading.Thread(target=scheduler_loop, args=(queue, scheduler, stop_event), daemon=True).start()
+
+    with DaemonServer(str(socket_path), queue) as server:
+        os.chmod(socket_path, 0o600)
+        logger.info(f"Daemon LINCON escutando em {socket_path}")
+
+        def handle_term(signum, frame):
+            threading.Thread(target=server.shutdown).start()
+
+        signal.signal(signal.SIGTERM, handle_term)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop_event.set()
+            socket_path.unlink(missing_ok=True)
+
+def send_request(request, socket_path=DEFAULT_SOCKET):
+    """Envia uma requisição ao daemon e retorna a resposta"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path))
+        sock.sendall((json.dumps(request) + "\n").encode())
+        with sock.makefile("r") as f:
+            return json.loads(f.readline())
@@ -59,12 +59,30 @@ translations = {
         "MSG_CT_CREATED": "Container criado com sucesso",
         "MSG_STARTING_CT": "Iniciando container...",
         "MSG_CT_STARTED": "Container iniciado com sucesso",
+        "MSG_VALIDATING": "Comparando o desempenho do container com a origem...",
+        "MSG_VALIDATION_OK": "Validação concluída: container equivalente à origem",
+        "MSG_VALIDATION_REGRESSION": "Validação encontrou regressões em relação à origem (veja o relatório)",
+        "MSG_PACKAGE_ANALYSIS": "Analisando os pacotes da origem (transferência por pacotes)...",
+        "MSG_PACKAGE_TRANSFER_FALLBACK": "Transferência por pacotes indisponível para esta origem; usando a coleta completa",
+        "MSG_PACKAGES_UNRESOLVED": "Alguns pacotes não puderam ser instalados no destino; os arquivos deles serão copiados da origem (veja o log)",
+        "MSG_EXPORTING_CONTAINER": "Exportando o container da origem...",
+        "MSG_SOURCE_CONTAINER_NOT_FOUND": "Container não encontrado na origem",
+        "MSG_SOURCE_ROOTFS_UNAVAILABLE": "Rootfs do container LXC inacessível na origem (inicie o container)",
+        "MSG_SOURCE_CONTAINER_NO_INIT": "O container Docker não tem /sbin/init e não iniciaria como LXC; migre-o para Docker",
+        "MSG_SOURCE_CONTAINERS_PROMPT": "A origem tem containers. Migrar o host inteiro ou um container?",
+        "LBL_WHOLE_HOST": "Host inteiro",
+        "LBL_SOURCE_CONTAINER": "Container da origem",
         "MSG_CT_START_FAILED": "Falha ao iniciar container",
+        "MSG_CT_PASSWORD_NOT_SET": "Não foi possível definir a senha de root do container",
         "MSG_CT_FAILED": "Falha ao criar container",
         "MSG_USER_INPUT_CANCELLED": "Entrada de dados cancelada pelo usuário",
         "MSG_MIGRATION_CANCELLED_INT": "Migração cancelada por interrupção",
         "MSG_MIGRATION_CANCELLED_BY_USER": "Migração cancelada pelo usuário",
         "MSG_CONFIRM_DETAILS_PREAMBLE": "Detalhes da Migração:",
+        "MSG_NATIVE_REPLICATION": "Origem e storage usam o mesmo sistema de arquivos, replicando com send/receive...",
+        "MSG_NATIVE_REPLICATION_FAILED": "Falha na replicação send/receive (CT novo: seguindo pelo tar)",
+        "MSG_CT_ID_IN_USE": "Já existe um CT com esse ID que não é uma réplica desta origem; escolha outro ID",
+        "MSG_PARALLEL_EXTRACTION": "Coletando e extraindo o sistema de arquivos direto no container...",
         
         # Docker specific messages
         "MSG_NO_DOCKER": "Docker não encontrado",
@@ -74,6 +92,11 @@ translations = {
         "MSG_STARTING_DOCKER_CONTAINER": "Iniciando container Docker...",
         "MSG_DOCKER_CONTAINER_STARTED": "Container Docker iniciado com sucesso",
         "MSG_DOCKER_CONTAINER_FAILED": "Falha ao iniciar container Docker",
+        "MSG_SOURCE_UNCHANGED": "Origem sem alterações desde a última migração, reaproveitando a imagem",
+        "MSG_DOCKER_CONTAINER_EXISTS": "Já existe um container com esse nome que não veio de uma migração do lincon; remova-o ou escolha outro nome",
+        "MSG_PUSHING_IMAGE": "Publicando imagem no registry...",
+        "MSG_IMAGE_PUSHED": "Imagem publicada com sucesso",
+        "MSG_PUSH_FAILED": "Falha ao publicar imagem no registry (repita com lincon --push)",
         
         # opções
         "OPTION_DHCP": "DHCP (automático)",
@@ -148,12 +171,30 @@ translations = {
         "MSG_CT_CREATED": "Container created successfully",
         "MSG_STARTING_CT": "Starting container...",
         "MSG_CT_STARTED": "Container started successfully",
+        "MSG_VALIDATING": "Comparing container performance with the source...",
+        "MSG_VALIDATION_OK": "Validation finished: container matches the source",
+        "MSG_VALIDATION_REGRESSION": "Validation found regressions compared to the source (see the report)",
+        "MSG_PACKAGE_ANALYSIS": "Analyzing source packages (package-aware transfer)...",
+        "MSG_PACKAGE_TRANSFER_FALLBACK": "Package-aware transfer unavailable for this source; using the full collection",
+        "MSG_PACKAGES_UNRESOLVED": "Some packages could not be installed on the target; their files will be copied from the source (see the log)",
+        "MSG_EXPORTING_CONTAINER": "Exporting the source container...",
+        "MSG_SOURCE_CONTAINER_NOT_FOUND": "Container not found on the source",
+        "MSG_SOURCE_ROOTFS_UNAVAILABLE": "LXC container rootfs not accessible on the source (start the container)",
+        "MSG_SOURCE_CONTAINER_NO_INIT": "The Docker container has no /sbin/init and would not start as LXC; migrate it to Docker",
+        "MSG_SOURCE_CONTAINERS_PROMPT": "The source has containers. Migrate the whole host or a single container?",
+        "LBL_WHOLE_HOST": "Whole host",
+        "LBL_SOURCE_CONTAINER": "Source container",
         "MSG_CT_START_FAILED": "Failed to start container",
+        "MSG_CT_PASSWORD_NOT_SET": "Could not set the container root password",
         "MSG_CT_FAILED": "Failed to create container",
         "MSG_USER_INPUT_CANCELLED": "User input cancelled",
         "MSG_MIGRATION_CANCELLED_INT": "Migration cancelled by interrupt",
         "MSG_MIGRATION_CANCELLED_BY_USER": "Migration cancelled by user",
         "MSG_CONFIRM_DETAILS_PREAMBLE": "Migration Details:",
+        "MSG_NATIVE_REPLICATION": "Source and storage share the same file system, replicating with send/receive...",
+        "MSG_NATIVE_REPLICATION_FAILED": "send/receive replication failed (new CT: falling back to tar)",
+        "MSG_CT_ID_IN_USE": "A CT with this ID already exists and is not a replica of this source; choose another ID",
+        "MSG_PARALLEL_EXTRACTION": "Collecting and extracting the file system directly into the container...",
         
         # Docker specific messages
         "MSG_NO_DOCKER": "Docker not found",
@@ -163,6 +204,11 @@ translations = {
         "MSG_STARTING_DOCKER_CONTAINER": "Starting Docker container...",
         "MSG_DOCKER_CONTAINER_STARTED": "Docker container started successfully",
         "MSG_DOCKER_CONTAINER_FAILED": "Failed to start Docker container",
+        "MSG_SOURCE_UNCHANGED": "Source unchanged since the last migration, reusing the image",
+        "MSG_DOCKER_CONTAINER_EXISTS": "A container with this name already exists and did not come from a lincon migration; remove it or choose another name",
+        "MSG_PUSHING_IMAGE": "Pushing image to the registry...",
+        "MSG_IMAGE_PUSHED": "Image pushed successfully",
+        "MSG_PUSH_FAILED": "Failed to push image to the registry (retry with lincon --push)",
         
         # options
         "OPTION_DHCP": "DHCP (automatic)",
@@ -1,21 +1,21 @@
-from rich.console import Console
-from rich.panel import Panel
-from rich.table import Table
-from rich.text import Text
-from rich.prompt import Prompt
-from rich.progress import track
-from rich.layout import Layout
-from rich.live import Live
-from rich.spinner import Spinner
+import argparse
+import json
 
 from lang.translations import translations
-from utils.system_info import get_system_info, get_system_status, get_lincon_version
-from utils.logger import setup_logging
+from utils.system_info import get_system_info, get_system_status, get_lincon_version, status_cache
+from utils.logger import setup_logging, get_log_file
 from utils.exceptions import *
 
-# Configuração inicial
-console = Console()
-logger = setup_logging()
+# A interface (rich) e os módulos de migração são carregados sob demanda:
+# os modos daemon/--jobs/--push não precisam deles
+_console = None
+
+def get_console():
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
 
 LINCON_BANNER = """
  [bold bright_cyan]██╗     ██╗███╗   ██╗ ██████╗ ██████╗ ███╗   ██╗
@@ -30,6 +30,11 @@ LINCON_BANNER = """
 """
 
 def select_language():
+    from rich.panel import Panel
+    from rich.table import Table
+    from rich.prompt import Prompt
+
+    console = get_console()
     console.print(Panel("🌎 Language / Idioma", style="bold blue"))
     table = Table(show_header=False, box=None)
     table.add_row("[1] Português (Brasil)")
@@ -40,6 +45,11 @@ def select_language():
     return "pt-br" if choice == "1" else "en"
 
 def show_menu(language):
+    from rich.panel import Panel
+    from rich.table import Table
+    from rich.prompt import Prompt
+
+    console = get_console()
     while True:
         console.clear()
         # Mostra a arte ASCII do LINCON e informações
@@ -60,7 +70,13 @@ def show_menu(language):
         status_table = Table(show_header=False, box=None)
         status_table.add_row("[bright_cyan]✓ Components Status:[/bright_cyan]")
         docker_status = "[green]Available[/green]" if sys_status["docker"] else "[red]Not Available[/red]"
+        if sys_status["docker"] and not sys_status.get("docker_daemon"):
+            docker_status += " [yellow](daemon not reachable)[/yellow]"
+        elif sys_status.get("docker_server_version"):
+            docker_status += f" [bright_black]({sys_status['docker_server_version']})[/bright_black]"
         proxmox_status = "[green]Available[/green]" if sys_status["proxmox"] else "[red]Not Available[/red]"
+        if sys_status.get("proxmox_version"):
+            proxmox_status += f" [bright_black]({sys_status['proxmox_version']})[/bright_black]"
         status_table.add_row(f"[bright_black]→[/bright_black] Docker: {docker_status}")
         status_table.add_row(f"[bright_black]→[/bright_black] Proxmox: {proxmox_status}")
         status_table.add_row("")
@@ -95,7 +111,102 @@ def show_menu(language):
             migrate_lxc()
             input("\nPressione Enter para continuar...")
 
+def parse_args():
+    parser = argparse.ArgumentParser(prog="lincon")
+    parser.add_argument("--daemon", action="store_true", help="Executa o daemon de jobs de migração")
+    parser.add_argument("--socket", default=None, help="Socket Unix do daemon")
+    parser.add_argument("--max-jobs", type=int, default=None, help="Máximo de jobs simultâneos")
+    parser.add_argument("--bandwidth-budget", type=float, default=None, help="Orçamento de rede em Mbit/s")
+    parser.add_argument("--submit", metavar="ARQUIVO", help="Envia um job (JSON) ao daemon")
+    parser.add_argument("--jobs", action="store_true", help="Lista os jobs e métricas do daemon")
+    parser.add_argument("--push", nargs=2, metavar=("IMAGEM", "DESTINO"), help="Publica uma imagem local em um registry")
+    parser.add_argument("--plan", metavar="ARQUIVO", help="Prevê tempo, rede e disco de um job (JSON) sem transferir nada")
+    parser.add_argument("--window", type=float, default=None, help="Janela de manutenção em minutos para o --plan")
+    parser.add_argument("--apply", action="store_true", help="Com --plan, grava no job o motor e o codec recomendados")
+    parser.add_argument("--profile", action="store_true", help="Grava um trace (Chrome trace JSON) das etapas e subprocessos")
+    parser.add_argument("--profile-python", action="store_true", help="Inclui o cProfile do lado Python no --profile")
+    parser.add_argument("--run", metavar="ARQUIVO", help="Executa um job (JSON) sem interface, pela API; uma lista de jobs faz fan-out")
+    parser.add_argument("--containers", action="store_true", help="Com --run, migra em paralelo os containers da origem (\"containers\" no job limita a lista)")
+    parser.add_argument("--json-events", action="store_true", help="Com --run, escreve os eventos em JSON lines no stdout")
+    parser.add_argument("--insecure-registry", action="store_true", help="Usa http no registry do --push")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    setup_logging()
+
+    if args.profile or args.profile_python:
+        import atexit
+        from utils.profiler import tracer
+        tracer.enable(python_profile=args.profile_python)
+        # O trace fica ao lado do log: lincon_<data>.trace.json
+        atexit.register(tracer.write, get_log_file().with_suffix(".trace.json"))
+
+    if args.daemon or args.submit or args.jobs:
+        import daemon
+        socket_path = args.socket or daemon.DEFAULT_SOCKET
+
+        if args.daemon:
+            options = {}
+            if args.max_jobs is not None:
+                options["max_jobs"] = args.max_jobs
+            if args.bandwidth_budget is not None:
+                options["bandwidth_budget"] = args.bandwidth_budget
+            daemon.run_daemon(socket_path, **options)
+        elif args.submit:
+            with open(args.submit, 'r') as f:
+                request = dict(json.load(f), action="submit")
+            print(json.dumps(daemon.send_request(request, socket_path), indent=2))
+        else:
+            print(json.dumps(daemon.send_request({"action": "metrics"}, socket_path), indent=2))
+        return
+
+    if args.plan:
+        from plan import build_plan, print_plan
+        with open(args.plan, 'r') as f:
+            job = json.load(f)
+        result = build_plan(job["kind"], job["data"], args.window)
+        print_plan(result, get_console())
+        if args.apply:
+            job["data"] = result["data"]
+            with open(args.plan, 'w') as f:
+                json.dump(job, f, indent=4)
+        # Código 2 sinaliza que a migração não cabe na janela/disco
+        raise SystemExit(0 if result["fits"] else 2)
+
+    if args.run:
+        from dataclasses import asdict
+        from api import request_from_job, run, run_fanout, run_containers, JsonLinesSink
+        with open(args.run, 'r') as f:
+            job = json.load(f)
+        sink = JsonLinesSink() if args.json_events else None
+        # Lista de jobs com a mesma origem: coleta uma vez para todos (fan-out)
+        if isinstance(job, list):
+            results = run_fanout([request_from_job(item) for item in job], sink=sink)
+        elif args.containers:
+            results = run_containers(request_from_job(job), job.get("containers"), sink=sink)
+        else:
+            results = [run(request_from_job(job), sink=sink)]
+        if not args.json_events:
+            output = [asdict(result) for result in results]
+            print(json.dumps(output if isinstance(job, list) or args.containers else output[0], indent=2))
+        raise SystemExit(0 if all(result.success for result in results) else 1)
+
+    if args.push:
+        import os
+        from utils.registry import push_image
+        image, reference = args.push
+        metrics = push_image(
+            image, reference,
+            username=os.environ.get("LINCON_REGISTRY_USER"),
+            password=os.environ.get("LINCON_REGISTRY_PASSWORD"),
+            insecure=args.insecure_registry,
+        )
+        print(json.dumps(metrics, indent=2))
+        return
+
+    # Verifica os componentes em segundo plano enquanto o idioma é escolhido
+    status_cache.refresh_async()
     language = select_language()
     show_menu(language)
 
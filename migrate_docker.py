@@ -6,14 +6,30 @@ from rich.progress import track
 from lang.translations import translations
 from utils.migration_state import MigrationState
 from utils.system_info import check_docker
+from utils import fingerprint
+from utils import registry
+from utils.exceptions import MigrationError
+from utils.profiler import tracer
+from utils import events
+import api
+from utils import planner
+from utils import adaptive_compression
+from utils import fanout
+from utils import validation
+from utils import package_transfer
+from utils import source_containers
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import subprocess
+import contextvars
 import os
 import shutil
 from pathlib import Path
 import tempfile
+import shlex
 import signal
 import logging
+import time
 
 logger = logging.getLogger('lincon')
 
@@ -21,18 +37,20 @@ console = Console()
 current_language = "pt-br"
 
 def display_message(title, message):
-    """Exibe uma mensagem em um painel"""
+    """Exibe uma mensagem em um painel (ou a envia como evento à API)"""
     title_text = translations[current_language].get(title, title)
     message_text = translations[current_language].get(message, message)
-    console.print(Panel(message_text, title=title_text))
+    if not events.emit_message(title, message, message_text):
+        console.print(Panel(message_text, title=title_text))
 
 def check_dependencies():
     """Verifica se as dependências necessárias estão instaladas"""
     # Verifica Docker
     if not check_docker():
         display_message("TITLE_ERROR", "MSG_NO_DOCKER")
-        console.print("\n[yellow]Para instalar o Docker, execute:[/yellow]")
-        console.print("[cyan]curl -fsSL https://get.docker.com -o get-docker.sh && sudo sh get-docker.sh[/cyan]")
+        if not events.active():
+            console.print("\n[yellow]Para instalar o Docker, execute:[/yellow]")
+            console.print("[cyan]curl -fsSL https://get.docker.com -o get-docker.sh && sudo sh get-docker.sh[/cyan]")
         return False
 
     # Verifica/instala sshpass
@@ -55,6 +73,7 @@ def user_input():
     data["target"] = Prompt.ask("Host de Origem")
     data["port"] = Prompt.ask("Porta SSH", default="22")
     data["passwordSSH"] = Prompt.ask("Senha SSH", password=True)
+    data["source_container"] = select_source_container(build_ssh_command(data))
     
     # Configuração de rede
     table = Table(show_header=False)
@@ -83,8 +102,33 @@ def user_input():
     # Configuração de volumes
     data["volumes"] = Prompt.ask("Volumes extras (ex: /host/path:/container/path)", default="")
     
+    # Publicação opcional em um registry
+    data["registry"] = Prompt.ask("Publicar imagem no registry (ex: registry.local:5000/app:latest, vazio para pular)", default="")
+    if data["registry"]:
+        data["registry_user"] = Prompt.ask("Usuário do registry", default="")
+        data["registry_password"] = Prompt.ask("Senha do registry", password=True, default="") if data["registry_user"] else ""
+        data["registry_insecure"] = Confirm.ask("Registry sem TLS (http)?", default=False)
+    
     return data
 
+def select_source_container(ssh_command):
+    """Oferece migrar um único container quando a origem é um host de containers"""
+    containers = source_containers.detect(ssh_command)
+    if not containers:
+        return ""
+
+    table = Table(show_header=False)
+    table.add_row("[0] Host inteiro")
+    for i, container in enumerate(containers, 1):
+        table.add_row(f"[{i}] {container['kind']}: {container['name']} "
+                      f"({container['image'] or container['id']}, {container['state']})")
+
+    console.print(Panel("A origem tem containers. Migrar o host inteiro ou um container?", title="Containers na Origem"))
+    console.print(table)
+
+    choice = Prompt.ask("", choices=[str(i) for i in range(len(containers) + 1)], default="0")
+    return containers[int(choice) - 1]["id"] if choice != "0" else ""
+
 def validate_parameters(data):
     """Valida os parâmetros fornecidos"""
     required_fields = ["container_name", "target", "port", "passwordSSH", "network"]
@@ -96,37 +140,86 @@ def validate_parameters(data):
             
     return True
 
-def collect_fs(ssh_command):
+EXCLUDED_PATHS = [
+    "/proc/*", "/sys/*", "/dev/*", "/tmp/*", "/run/*",
+    "/mnt/*", "/media/*", "/lost+found", "/var/cache/apt/archives/*",
+    "/boot/*", "/lib/modules/*"
+]
+
+def collect_fs(ssh_command, paths=(".",), stdout=subprocess.PIPE, excluded_paths=EXCLUDED_PATHS):
     """Coleta o sistema de arquivos via SSH"""
-    excluded_paths = [
-        "/proc/*", "/sys/*", "/dev/*", "/tmp/*", "/run/*",
-        "/mnt/*", "/media/*", "/lost+found", "/var/cache/apt/archives/*",
-        "/boot/*", "/lib/modules/*"
-    ]
-    
     tar_command = ["tar", "czpf", "-", "--numeric-owner", "--anchored"]
+    # Os membros se chamam ./proc/...: o padrão ancorado precisa do mesmo prefixo
     for path in excluded_paths:
-        tar_command.extend(["--exclude", path])
-    tar_command.append(".")
+        tar_command.extend(["--exclude", shlex.quote("." + path)])
+    tar_command.extend(shlex.quote(path) for path in paths)
     
     ssh_command.extend(["cd / &&"] + tar_command)
-    return subprocess.Popen(ssh_command, stdout=subprocess.PIPE)
+    return tracer.watch(subprocess.Popen(ssh_command, stdout=stdout), "collect_fs")
+
+def collect_archive(ssh_command, archive, paths=(".",), adaptive=False):
+    """Grava a coleta de `paths` em `archive`
+
+    Com o agente adaptativo o arquivo é um tar sem compressão (o ADD do
+    Docker detecta o formato pelo conteúdo). Retorna as estatísticas do
+    agente ({} no caminho gzip) ou None se a coleta falhou.
+    """
+    with open(archive, 'wb') as f:
+        if adaptive:
+            return adaptive_compression.collect_to_file(ssh_command, EXCLUDED_PATHS, f, paths)
+        process = collect_fs(list(ssh_command), paths, stdout=f)
+        return {} if process.wait() == 0 else None
+
+def use_adaptive(data, ssh_command):
+    """Usa a compressão adaptativa quando pedida e a origem tem python3"""
+    if data.get("compression", "adaptive") != "adaptive":
+        return False
+    if adaptive_compression.has_python(ssh_command):
+        return True
+    logger.info("Origem sem python3, usando tar czpf")
+    return False
+
+def record_compression(data, stats_list):
+    """Exibe e guarda nas métricas o resultado da compressão adaptativa"""
+    if not stats_list:
+        return
+    compression = adaptive_compression.report(stats_list)
+    if not events.emit("compression", **compression):
+        console.print(f"[cyan]Compressão adaptativa:[/cyan] {adaptive_compression.format_report(compression)}")
+    data["metrics"]["compression"] = compression
+    data["transferred_bytes"] = compression["sent_bytes"]
 
-def create_dockerfile(base_os="ubuntu:20.04"):
-    """Cria um Dockerfile básico"""
+def create_dockerfile(base_os="ubuntu:20.04", archives=("filesystem.tar.gz",), installer="apt", packages_file=None,
+                      repos_archive=None):
+    """Cria um Dockerfile básico
+
+    Com `packages_file` (transferência por pacotes) os pacotes da origem são
+    instalados na imagem base, com os repositórios de `repos_archive`,
+    antes dos arquivos transferidos.
+    """
+    add_lines = "\n".join(f"ADD {archive} /" for archive in archives)
+    if packages_file:
+        install = package_transfer.install_lines(installer, packages_file, repos_archive)
+        add_lines = f"# Pacotes da origem\n{install}\n\n{add_lines}"
+    if installer == "apt":
+        dependencies = """RUN apt-get update && apt-get install -y \\
+    openssh-server \\
+    sudo \\
+    && rm -rf /var/lib/apt/lists/*"""
+    else:
+        prepare, install, clean = package_transfer.INSTALLERS[installer]
+        # Imagens rpm não geram as chaves do sshd na instalação
+        dependencies = f"RUN {prepare}{install} openssh-server sudo && {clean} && ssh-keygen -A"
     dockerfile_content = f"""FROM {base_os}
 
 # Copia o sistema de arquivos
-ADD filesystem.tar.gz /
+{add_lines}
 
 # Instala dependências básicas
-RUN apt-get update && apt-get install -y \\
-    openssh-server \\
-    sudo \\
-    && rm -rf /var/lib/apt/lists/*
+{dependencies}
 
 # Configura SSH
-RUN mkdir /var/run/sshd
+RUN mkdir -p /var/run/sshd
 RUN echo 'root:lincon123' | chpasswd
 RUN sed -i 's/#PermitRootLogin prohibit-password/PermitRootLogin yes/' /etc/ssh/sshd_config
 
@@ -138,112 +231,437 @@ CMD ["/usr/sbin/sshd", "-D"]
 """
     return dockerfile_content
 
-def convert(data):
-    """Converte e cria o container Docker"""
+def build_ssh_command(data):
+    """Monta o comando SSH para o host de origem"""
+    return [
+        "sshpass", "-p", data["passwordSSH"],
+        "ssh", "-p", data["port"],
+        "-o", "StrictHostKeyChecking=no",
+        "-o", "ConnectTimeout=10",
+        f"root@{data['target']}"
+    ]
+
+def image_exists(image):
+    """Verifica se a imagem existe no daemon Docker local"""
+    return subprocess.run(["docker", "image", "inspect", image], capture_output=True).returncode == 0
+
+def build_image(image, context_dir, archives, metrics, dockerfile=None):
+    """Gera o Dockerfile e constrói a imagem"""
+    display_message("TITLE_INFO", "MSG_CREATING_DOCKER_IMAGE")
+
+    with open(Path(context_dir) / "Dockerfile", 'w') as f:
+        f.write(dockerfile or create_dockerfile(archives=archives))
+
+    started = time.monotonic()
+    with tracer.span("docker_build", image=image):
+        built = tracer.run(["docker", "build", "-t", image, str(context_dir)], name="docker build").returncode == 0
+    metrics["extract_seconds"] = time.monotonic() - started
+    if not built:
+        display_message("TITLE_ERROR", "MSG_DOCKER_BUILD_FAILED")
+        return False
+
+    display_message("TITLE_SUCCESS", "MSG_DOCKER_IMAGE_CREATED")
+    return True
+
+def build_full(data, ssh_command, image, source=None):
+    """Coleta a raiz inteira em um único tarball e constrói a imagem
+
+    Com `source` (fan-out) o tar.gz é lido desse stream em vez da origem.
+    """
     with tempfile.TemporaryDirectory(prefix=f"{data['container_name']}_migration_") as temp_dir:
         temp_path = Path(temp_dir)
+        adaptive = data["metrics"]["codec"] == "adaptive"
+
+        # Coleta sistema de arquivos
+        started = time.monotonic()
+        filesystem_tar = temp_path / ("filesystem.tar" if adaptive else "filesystem.tar.gz")
+        with tracer.span("copy_loop"):
+            if source is not None:
+                with open(filesystem_tar, 'wb') as f:
+                    shutil.copyfileobj(source, f, fanout.CHUNK_SIZE)
+                stats = {}
+            else:
+                stats = collect_archive(ssh_command, filesystem_tar, adaptive=adaptive)
         
-        display_message("TITLE_INFO", "MSG_COLLECTING_FS")
+        if stats is None:
+            display_message("TITLE_ERROR", "MSG_SSH_CONNECTION_FAILED")
+            return False
+            
+        if filesystem_tar.stat().st_size == 0:
+            display_message("TITLE_ERROR", "MSG_FS_COLLECTION_EMPTY")
+            return False
+        data["transferred_bytes"] = filesystem_tar.stat().st_size
+        record_compression(data, [stats] if adaptive else [])
+        data["metrics"]["transfer_seconds"] = time.monotonic() - started
+
+        return build_image(image, temp_path, [filesystem_tar.name], data["metrics"])
+
+def build_packages(data, ssh_command, image, base):
+    """Transfere só o que difere dos pacotes e reconstrói sobre a imagem base da distro"""
+    display_message("TITLE_INFO", "MSG_PACKAGE_ANALYSIS")
+    analysis = package_transfer.analyze(ssh_command, base, EXCLUDED_PATHS)
+    if analysis is None:
+        display_message("TITLE_WARNING", "MSG_PACKAGE_TRANSFER_FALLBACK")
+        data["metrics"]["engine"] = "tar"
+        return build_full(data, ssh_command, image)
+    logger.info(f"Transferência por pacotes ({base['image']}): {len(analysis['packages'])} pacotes, "
+                f"{analysis['files']} caminhos, {analysis['local']} pacotes locais")
+
+    specs = package_transfer.pinned(base["installer"], analysis["packages"])
+    with tempfile.TemporaryDirectory(prefix=f"{data['container_name']}_migration_") as temp_dir:
+        temp_path = Path(temp_dir)
+        with open(temp_path / "packages.txt", 'w') as f:
+            f.write("\n".join(specs) + "\n")
+
+        started = time.monotonic()
+        delta, repos = temp_path / "delta.tar.gz", temp_path / "repos.tar.gz"
+        with tracer.span("copy_loop"), open(delta, 'wb') as f, open(repos, 'wb') as r:
+            collected = (package_transfer.collect_delta(ssh_command, analysis, EXCLUDED_PATHS, f)
+                         and package_transfer.collect_repos(ssh_command, base, r))
+        if not collected:
+            display_message("TITLE_ERROR", "MSG_SSH_CONNECTION_FAILED")
+            return False
+        data["transferred_bytes"] = delta.stat().st_size + repos.stat().st_size
+        data["metrics"].update(
+            transfer_seconds=time.monotonic() - started,
+            base_image=base["image"], packages=len(specs), delta_paths=analysis["files"],
+        )
+
+        dockerfile = create_dockerfile(base["image"], [delta.name], base["installer"], "packages.txt", repos.name)
+        if not build_image(image, temp_path, [repos.name, delta.name], data["metrics"], dockerfile):
+            return False
+
+        # Pacotes que o destino não instalou: os arquivos deles vêm da origem
+        missing = package_transfer.missing_packages(image)
+        if not missing:
+            return True
+        display_message("TITLE_WARNING", "MSG_PACKAGES_UNRESOLVED")
+        logger.warning(f"{len(missing)} pacotes indisponíveis no destino, copiando da origem: {' '.join(missing)}")
+        data["metrics"]["unresolved_packages"] = missing
+        owned = temp_path / "owned.tar.gz"
+        with tracer.span("copy_loop"), open(owned, 'wb') as f:
+            names = [specs.get(spec, spec) for spec in missing]
+            collected = package_transfer.collect_owned(ssh_command, base, names, EXCLUDED_PATHS, f)
+        if not collected:
+            display_message("TITLE_WARNING", "MSG_PACKAGE_TRANSFER_FALLBACK")
+            data["metrics"] = {"engine": "tar", "codec": "gzip"}
+            return build_full(data, ssh_command, image)
+        data["transferred_bytes"] += owned.stat().st_size
+        # Os arquivos vêm do estado atual da origem, então já incluem as alterações
+        dockerfile = f"FROM {image}\nADD {owned.name} /\n"
+        return build_image(image, temp_path, [owned.name], data["metrics"], dockerfile)
+
+def build_container(data, ssh_command, image, container):
+    """Constrói a imagem a partir de um container da origem, sem coletar o host
+
+    Docker: commit + save sem as camadas já presentes no daemon local.
+    LXC: o rootfs do guest vira o tarball da imagem.
+    """
+    display_message("TITLE_INFO", "MSG_EXPORTING_CONTAINER")
+    started = time.monotonic()
+    if container["kind"] == "docker":
+        with tracer.span("docker_save", container=container["name"]):
+            stats = source_containers.transfer_image(ssh_command, container, image)
+        if stats is None:
+            display_message("TITLE_ERROR", "MSG_SSH_CONNECTION_FAILED")
+            return False
+        data["transferred_bytes"] = stats["bytes"]
+        data["metrics"] = {
+            "engine": "docker-save", "codec": "gzip", "layers": stats.get("layers", 0),
+            "skipped_layers": stats.get("skipped_layers", 0), "skipped_bytes": stats.get("skipped_bytes", 0),
+            "transfer_seconds": time.monotonic() - started,
+        }
+        # Mantém as portas publicadas na origem se nenhuma foi informada
+        if not data.get("ports") and data["network"] != "host":
+            data["ports"] = source_containers.port_bindings(ssh_command, container)
+        return True
+
+    command = source_containers.rootfs_command(ssh_command, container, EXCLUDED_PATHS)
+    if command is None:
+        display_message("TITLE_ERROR", "MSG_SOURCE_ROOTFS_UNAVAILABLE")
+        return False
+    with tempfile.TemporaryDirectory(prefix=f"{data['container_name']}_migration_") as temp_dir:
+        archive = Path(temp_dir) / "filesystem.tar.gz"
+        with tracer.span("copy_loop"), open(archive, 'wb') as f:
+            process = tracer.watch(subprocess.Popen(ssh_command + [command], stdout=f), "collect_fs")
+            collected = process.wait() == 0
+        if not collected or archive.stat().st_size == 0:
+            display_message("TITLE_ERROR", "MSG_FS_COLLECTION_EMPTY")
+            return False
+        data["transferred_bytes"] = archive.stat().st_size
+        data["metrics"] = {"engine": "tar-container", "codec": "gzip", "transfer_seconds": time.monotonic() - started}
+        return build_image(image, temp_dir, [archive.name], data["metrics"])
+
+def collect_subtrees(ssh_command, subtrees, root_files, archives_dir, adaptive=False):
+    """Coleta em paralelo as subárvores indicadas, um tarball por subárvore
+
+    Retorna a lista de estatísticas das coletas, ou None se alguma falhou.
+    """
+    def collect(subtree):
+        archive = archives_dir / fingerprint.archive_name(subtree)
+        partial = archive.with_name(archive.name + ".partial")
+        with tracer.span("collect_subtree", subtree=subtree) as span:
+            stats = collect_archive(ssh_command, partial, fingerprint.subtree_paths(subtree, root_files), adaptive)
+            span.set(bytes=partial.stat().st_size)
+        if stats is None:
+            partial.unlink()
+            return None
+        partial.replace(archive)
+        return stats
+
+    # Cada worker roda numa cópia do contexto (migração dos logs, sink de eventos)
+    with ThreadPoolExecutor(max_workers=fingerprint.MAX_WORKERS) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, collect, subtree) for subtree in subtrees]
+        results = [future.result() for future in futures]
+    return None if None in results else results
+
+def build_incremental(data, ssh_command, image, current):
+    """Reaproveita imagem ou tarballs da última migração conforme o fingerprint
+
+    Retorna True se a imagem está pronta para uso.
+    """
+    previous = fingerprint.load_fingerprint(data["target"], data["container_name"])
+
+    if previous.get("root") == current["root"] and image_exists(image):
+        display_message("TITLE_INFO", "MSG_SOURCE_UNCHANGED")
+        data["transferred_bytes"] = 0
+        return True
+
+    archives_dir = fingerprint.cache_dir(data["target"], data["container_name"])
+    changed = fingerprint.changed_subtrees(previous, current, archives_dir)
+    logger.info(f"Subárvores a coletar: {', '.join(changed) or 'nenhuma'}")
+    # Coleta parcial não serve para calibrar a razão de compressão
+    data["metrics"]["engine"] = "tar" if len(changed) == len(current["subtrees"]) else "tar-incremental"
+
+    started = time.monotonic()
+    adaptive = data["metrics"]["codec"] == "adaptive"
+    stats_list = collect_subtrees(ssh_command, changed, current["root_files"], archives_dir, adaptive)
+    if stats_list is None:
+        display_message("TITLE_ERROR", "MSG_SSH_CONNECTION_FAILED")
+        return False
+    fingerprint.prune_cache(archives_dir, current)
+    fingerprint.trim_cache(archives_dir)
+
+    archives = [fingerprint.archive_name(subtree) for subtree in sorted(current["subtrees"])]
+    if not archives or all((archives_dir / archive).stat().st_size == 0 for archive in archives):
+        display_message("TITLE_ERROR", "MSG_FS_COLLECTION_EMPTY")
+        return False
+    data["transferred_bytes"] = sum(
+        (archives_dir / fingerprint.archive_name(subtree)).stat().st_size for subtree in changed
+    )
+    record_compression(data, stats_list if adaptive else [])
+    data["metrics"]["transfer_seconds"] = time.monotonic() - started
+
+    return build_image(image, archives_dir, archives, data["metrics"])
+
+def existing_container(name):
+    """Imagem do container local chamado `name`, ou None se ele não existe"""
+    result = subprocess.run(
+        ["docker", "container", "inspect", "-f", "{{.Config.Image}}", name],
+        capture_output=True, text=True
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def run_container(data, image):
+    """Executa o container a partir da imagem migrada"""
+    display_message("TITLE_INFO", "MSG_STARTING_DOCKER_CONTAINER")
+    
+    run_command = ["docker", "run", "-d", "--name", data['container_name']]
+    
+    # Adiciona configuração de rede
+    if data["network"] == "host":
+        run_command.extend(["--network", "host"])
+    elif data["network"] != "bridge":
+        run_command.extend(["--network", data["network"]])
+    
+    # Adiciona mapeamento de portas
+    if data.get("ports") and data["network"] != "host":
+        for port_map in data["ports"].split(","):
+            if ":" in port_map.strip():
+                run_command.extend(["-p", port_map.strip()])
+    
+    # Adiciona volumes
+    if data.get("volumes"):
+        for volume in data["volumes"].split(","):
+            if ":" in volume.strip():
+                run_command.extend(["-v", volume.strip()])
+    
+    run_command.append(image)
+    
+    if tracer.run(run_command, name="docker run").returncode == 0:
+        display_message("TITLE_SUCCESS", "MSG_DOCKER_CONTAINER_STARTED")
+        if events.emit("container", name=data["container_name"], image=image,
+                       network=data["network"], ports=data.get("ports", "")):
+            return True
+        
+        # Mostra informações do container
+        console.print(f"\n[green]Container criado com sucesso![/green]")
+        console.print(f"[cyan]Nome:[/cyan] {data['container_name']}")
+        console.print(f"[cyan]Imagem:[/cyan] {image}")
+        console.print(f"[cyan]Rede:[/cyan] {data['network']}")
+        
+        if data["network"] != "host" and data.get("ports"):
+            console.print(f"[cyan]Portas:[/cyan] {data['ports']}")
         
-        ssh_command = [
-            "sshpass", "-p", data["passwordSSH"],
-            "ssh", "-p", data["port"],
-            "-o", "StrictHostKeyChecking=no",
-            "-o", "ConnectTimeout=10",
-            f"root@{data['target']}"
-        ]
+        console.print("\n[yellow]Para acessar o container:[/yellow]")
+        console.print(f"[white]docker exec -it {data['container_name']} /bin/bash[/white]")
         
+        return True
+    else:
+        display_message("TITLE_ERROR", "MSG_DOCKER_CONTAINER_FAILED")
+        return False
+
+def record_metrics(data, ssh_command):
+    """Guarda as métricas da migração no histórico usado pelo planner"""
+    source_bytes = 0
+    # Com um container da origem o inventário seria o do host inteiro
+    if not data.get("source_container"):
         try:
-            # Coleta sistema de arquivos
-            process = collect_fs(ssh_command)
-            filesystem_tar = temp_path / "filesystem.tar.gz"
-            
-            with open(filesystem_tar, 'wb') as f:
-                for chunk in process.stdout:
-                    f.write(chunk)
-            
-            if process.wait() != 0:
-                display_message("TITLE_ERROR", "MSG_SSH_CONNECTION_FAILED")
-                return False
-                
-            if filesystem_tar.stat().st_size == 0:
-                display_message("TITLE_ERROR", "MSG_FS_COLLECTION_EMPTY")
-                return False
-            
-            display_message("TITLE_INFO", "MSG_CREATING_DOCKER_IMAGE")
-            
-            # Cria Dockerfile
-            dockerfile_path = temp_path / "Dockerfile"
-            with open(dockerfile_path, 'w') as f:
-                f.write(create_dockerfile())
-            
-            # Constrói imagem Docker
-            build_command = [
-                "docker", "build", "-t", f"lincon-migrated:{data['container_name']}", 
-                str(temp_path)
-            ]
-            
-            if subprocess.run(build_command).returncode != 0:
-                display_message("TITLE_ERROR", "MSG_DOCKER_BUILD_FAILED")
-                return False
-            
-            display_message("TITLE_SUCCESS", "MSG_DOCKER_IMAGE_CREATED")
-            
-            # Executa container
-            display_message("TITLE_INFO", "MSG_STARTING_DOCKER_CONTAINER")
-            
-            run_command = ["docker", "run", "-d", "--name", data['container_name']]
-            
-            # Adiciona configuração de rede
-            if data["network"] == "host":
-                run_command.extend(["--network", "host"])
-            elif data["network"] != "bridge":
-                run_command.extend(["--network", data["network"]])
-            
-            # Adiciona mapeamento de portas
-            if data.get("ports") and data["network"] != "host":
-                for port_map in data["ports"].split(","):
-                    if ":" in port_map.strip():
-                        run_command.extend(["-p", port_map.strip()])
-            
-            # Adiciona volumes
-            if data.get("volumes"):
-                for volume in data["volumes"].split(","):
-                    if ":" in volume.strip():
-                        run_command.extend(["-v", volume.strip()])
-            
-            run_command.append(f"lincon-migrated:{data['container_name']}")
-            
-            if subprocess.run(run_command).returncode == 0:
-                display_message("TITLE_SUCCESS", "MSG_DOCKER_CONTAINER_STARTED")
-                
-                # Mostra informações do container
-                console.print(f"\n[green]Container criado com sucesso![/green]")
-                console.print(f"[cyan]Nome:[/cyan] {data['container_name']}")
-                console.print(f"[cyan]Imagem:[/cyan] lincon-migrated:{data['container_name']}")
-                console.print(f"[cyan]Rede:[/cyan] {data['network']}")
-                
-                if data["network"] != "host" and data.get("ports"):
-                    console.print(f"[cyan]Portas:[/cyan] {data['ports']}")
-                
-                console.print("\n[yellow]Para acessar o container:[/yellow]")
-                console.print(f"[white]docker exec -it {data['container_name']} /bin/bash[/white]")
-                
-                return True
+            source_bytes = planner.inventory(ssh_command, sample=False)["source_bytes"]
+        except (subprocess.CalledProcessError, IndexError, ValueError):
+            pass
+    data["metrics"].update(transferred_bytes=data.get("transferred_bytes", 0), source_bytes=source_bytes)
+    planner.record_migration("docker", data, data["metrics"])
+
+def publish_image(data, image):
+    """Publica a imagem migrada no registry informado"""
+    display_message("TITLE_INFO", "MSG_PUSHING_IMAGE")
+    try:
+        with tracer.span("push", reference=data["registry"]):
+            metrics = registry.push_image(
+                image, data["registry"],
+                username=data.get("registry_user") or None,
+                password=data.get("registry_password") or None,
+                insecure=data.get("registry_insecure", False),
+            )
+    except (MigrationError, OSError) as e:
+        # O container já está rodando; o push pode ser repetido com `lincon --push`
+        logger.error(f"Falha no push para {data['registry']}: {e}")
+        display_message("TITLE_WARNING", "MSG_PUSH_FAILED")
+        return False
+
+    data["push_metrics"] = metrics
+    display_message("TITLE_SUCCESS", "MSG_IMAGE_PUSHED")
+    if events.emit("published", **metrics):
+        return True
+    console.print(f"[cyan]Registry:[/cyan] {metrics['reference']}")
+    console.print(
+        f"[cyan]Push:[/cyan] {metrics['pushed_bytes'] / 1024 ** 2:.1f} MB em {metrics['elapsed']:.1f}s "
+        f"({metrics['throughput'] / 1024 ** 2:.1f} MB/s, {metrics['skipped_blobs']}/{metrics['blobs']} blobs já existentes)"
+    )
+    return True
+
+def convert(data, source=None):
+    """Converte e cria o container Docker
+
+    `source` é o stream do tar.gz da origem quando a coleta é compartilhada
+    entre vários destinos (fan-out).
+    """
+    image = f"lincon-migrated:{data['container_name']}"
+    display_message("TITLE_INFO", "MSG_COLLECTING_FS")
+    
+    ssh_command = build_ssh_command(data)
+    # Origem que é um host de containers: migra só o container pedido
+    container = None
+    if source is None and data.get("source_container"):
+        container = source_containers.find(ssh_command, data["source_container"])
+        if container is None:
+            display_message("TITLE_ERROR", "MSG_SOURCE_CONTAINER_NOT_FOUND")
+            return False
+        data["source_container_info"] = container
+
+    if container:
+        data["metrics"] = {}
+    elif source is not None:
+        data["metrics"] = {"engine": "tar-fanout", "codec": "gzip"}
+    else:
+        data["metrics"] = {"engine": "tar", "codec": "adaptive" if use_adaptive(data, ssh_command) else "gzip"}
+    
+    try:
+        # Transferência por pacotes, se pedida e a distribuição for suportada
+        base = None
+        if source is None and not container and data.get("transfer") == "packages":
+            base = package_transfer.detect_base(ssh_command)
+            if base:
+                data["metrics"] = {"engine": "packages", "codec": "gzip"}
             else:
-                display_message("TITLE_ERROR", "MSG_DOCKER_CONTAINER_FAILED")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Erro durante conversão: {e}")
-            display_message("TITLE_ERROR", str(e))
+                display_message("TITLE_WARNING", "MSG_PACKAGE_TRANSFER_FALLBACK")
+
+        # Um container com o mesmo nome só é substituído se veio de uma
+        # migração anterior (mesma imagem); outro faria o `docker run` falhar
+        previous = existing_container(data["container_name"])
+        if previous not in (None, image):
+            display_message("TITLE_ERROR", "MSG_DOCKER_CONTAINER_EXISTS")
             return False
 
+        # Fingerprint da origem decide entre reaproveitar, coletar parte ou tudo
+        current = None
+        if source is None and not (base or container):
+            try:
+                with tracer.span("fingerprint"):
+                    current = fingerprint.compute_fingerprint(ssh_command)
+            except (subprocess.CalledProcessError, IndexError) as e:
+                logger.warning(f"Fingerprint indisponível, coletando tudo: {e}")
+
+        if container:
+            built = build_container(data, ssh_command, image, container)
+        elif base:
+            built = build_packages(data, ssh_command, image, base)
+        elif current:
+            built = build_incremental(data, ssh_command, image, current)
+        else:
+            built = build_full(data, ssh_command, image, source)
+        if not built:
+            return False
+
+        # O container da migração anterior é substituído pelo da imagem nova
+        if previous:
+            subprocess.run(["docker", "rm", "-f", data["container_name"]], capture_output=True)
+        started = time.monotonic()
+        if not run_container(data, image):
+            return False
+        if data.get("validate"):
+            validate_container(data, ssh_command, started)
+
+        if data.get("registry"):
+            publish_image(data, image)
+
+        if current:
+            fingerprint.save_fingerprint(data["target"], data["container_name"], current, image)
+        record_metrics(data, ssh_command)
+        return True
+            
+    except Exception as e:
+        logger.error(f"Erro durante conversão: {e}")
+        display_message("TITLE_ERROR", str(e))
+        return False
+
+def validate_container(data, ssh_command, started):
+    """Roda as mesmas sondas na origem e no container e guarda o relatório"""
+    display_message("TITLE_INFO", "MSG_VALIDATING")
+    with tracer.span("validate"):
+        report = validation.validate(
+            source_containers.shell_command(ssh_command, data.get("source_container_info")),
+            ["docker", "exec", "-i", data["container_name"], "sh", "-s"],
+            data["target"], started
+        )
+    validation.save_report("docker", data["container_name"], report)
+    data["metrics"]["validation"] = report
+    if not events.emit("validation", **report):
+        for line in validation.format_report(report):
+            console.print(f"  {line}")
+    if validation.passed(report):
+        display_message("TITLE_SUCCESS", "MSG_VALIDATION_OK")
+    else:
+        display_message("TITLE_WARNING", "MSG_VALIDATION_REGRESSION")
+
 def confirm_migration(data):
     """Confirma os detalhes da migração com o usuário"""
     details = "Detalhes da Migração Docker:\n"
     details += f"  Nome do Container: {data['container_name']}\n"
     details += f"  Host de Origem: {data['target']}:{data['port']}\n"
+    if data.get("source_container"):
+        details += f"  Container da Origem: {data['source_container'][:12]}\n"
     details += f"  Rede: {data['network']}\n"
     
     if data.get("ports"):
@@ -287,14 +705,8 @@ def migrate_docker():
         state_manager.save_state(data, "cancelled")
         return False
     
-    state_manager.save_state(data, "converting")
-    if convert(data):
-        state_manager.save_state(data, "completed")
-        state_manager.clear_state()
-        return True
-    else:
-        state_manager.save_state(data, "failed")
-        return False
+    # A interface é só mais um cliente do núcleo da API
+    return api.execute("docker", data, state_manager)
 
 if __name__ == "__main__":
     migrate_docker()
@@ -5,14 +5,31 @@ from rich.prompt import Prompt, Confirm
 from rich.progress import track
 from lang.translations import translations
 from utils.migration_state import MigrationState
+from utils import replication
+from utils.placement import PlacementEngine, estimate_inventory
+from utils.profiler import tracer
+from utils import events
+import api
+from utils import planner
+from utils import adaptive_compression
+from utils import extractor
+from utils import data_channel
+from utils import fanout
+from utils import validation
+from utils import source_containers
 from datetime import datetime
 import subprocess
 import os
 import shutil
 from pathlib import Path
 import tempfile
+import tarfile
+import threading
+import contextvars
+import shlex
 import signal
 import logging
+import time
 
 logger = logging.getLogger('lincon')
 
@@ -20,10 +37,11 @@ console = Console()
 current_language = "pt-br"
 
 def display_message(title, message):
-    """Exibe uma mensagem em um painel"""
+    """Exibe uma mensagem em um painel (ou a envia como evento à API)"""
     title_text = translations[current_language].get(title, title)
     message_text = translations[current_language].get(message, message)
-    console.print(Panel(message_text, title=title_text))
+    if not events.emit_message(title, message, message_text):
+        console.print(Panel(message_text, title=title_text))
 
 def check_dependencies():
     """Verifica se as dependências necessárias estão instaladas"""
@@ -81,8 +99,8 @@ def select_bridge():
         display_message("TITLE_ERROR", "MSG_NO_BRIDGE")
         return None
 
-def select_storage():
-    """Seleciona um storage"""
+def select_storage_manual():
+    """Seleciona um storage a partir do `pvesm status` local"""
     try:
         result = subprocess.run(["pvesm", "status"], capture_output=True, text=True, check=True)
         storages = []
@@ -116,6 +134,58 @@ def select_storage():
         display_message("TITLE_ERROR", "MSG_PVESM_STATUS_FAILED")
         return None
 
+def select_storage(rootsize_bytes=0, inventory_bytes=0):
+    """Seleciona storage e node, sugerindo os mais adequados primeiro
+
+    Retorna (storage, node); node é None quando a placement não está
+    disponível e o storage foi escolhido pela lista do `pvesm status`.
+    """
+    engine = PlacementEngine()
+    storages = engine.collect()
+    if not storages:
+        # Sem pvesh (ou sem resposta) volta para a lista do pvesm status
+        return select_storage_manual(), None
+    candidates = engine.rank(storages, rootsize_bytes, inventory_bytes, engine.local_node())
+
+    if not candidates:
+        display_message("TITLE_ERROR", "MSG_NO_SUITABLE_STORAGE")
+        return None, None
+
+    table = Table(show_header=False)
+    for i, c in enumerate(candidates, 1):
+        free_gb = c["avail"] / 1024 ** 3
+        table.add_row(
+            f"[{i}] {c['storage']} ({c['type']}) @ {c['node']}",
+            f"{free_gb:.1f} GB livres",
+            f"io {c['load']:.0%}",
+            f"score {c['score']:.2f}"
+        )
+
+    console.print(Panel(translations[current_language]["MSG_STORAGE_PROMPT"]))
+    console.print(table)
+
+    choice = Prompt.ask("", choices=[str(i) for i in range(1, len(candidates) + 1)], default="1")
+    selected = candidates[int(choice) - 1]
+    return selected["storage"], selected["node"]
+
+def rootsize_to_bytes(rootsize):
+    """Converte o tamanho do disco (GB) para bytes; 0 se inválido"""
+    try:
+        return int(float(rootsize) * 1024 ** 3)
+    except (TypeError, ValueError):
+        return 0
+
+def auto_place(data, ssh_command):
+    """Escolhe automaticamente storage e node (modo batch)"""
+    rootsize_bytes = rootsize_to_bytes(data["rootsize"])
+    candidates = PlacementEngine().place(rootsize_bytes, estimate_inventory(ssh_command))
+    if not candidates:
+        return False
+    data["storage"] = candidates[0]["storage"]
+    data["node"] = candidates[0]["node"]
+    logger.info(f"Placement automática: {data['storage']} no node {data['node']}")
+    return True
+
 def select_ip_config():
     """Seleciona a configuração de IP"""
     table = Table(show_header=False)
@@ -134,6 +204,37 @@ def select_ip_config():
         gateway = Prompt.ask(translations[current_language]["MSG_GATEWAY"])
         return ip, gateway
 
+def build_ssh_command(data):
+    """Monta o comando SSH para o host de origem"""
+    command = [
+        "sshpass", "-p", data["passwordSSH"],
+        "ssh", "-p", data["port"],
+        "-o", "StrictHostKeyChecking=no",
+        "-o", "ConnectTimeout=10",
+        f"root@{data['target']}"
+    ]
+    if data.get("channel") == "ssh-aead":
+        return data_channel.fast_ssh_command(command)
+    return command
+
+def node_command(data):
+    """Prefixo para executar comandos no node de destino escolhido"""
+    node = data.get("node")
+    if not node or node == PlacementEngine().local_node():
+        return []
+    # Nodes de um cluster Proxmox têm SSH de root entre si
+    return ["ssh", "-o", "BatchMode=yes", f"root@{node}"]
+
+def on_node(remote, command):
+    """Comando a executar no node de destino (`remote` vindo de node_command)
+
+    O ssh junta os argumentos em uma linha de shell remota, então cada um
+    é quoted para chegar intacto ao `pct`.
+    """
+    if not remote:
+        return list(command)
+    return list(remote) + [shlex.quote(str(argument)) for argument in command]
+
 def user_input():
     """Coleta todos os dados necessários do usuário"""
     data = {}
@@ -143,6 +244,7 @@ def user_input():
     data["target"] = Prompt.ask(translations[current_language]["TITLE_TARGET"])
     data["port"] = Prompt.ask(translations[current_language]["TITLE_SSH_PORT"])
     data["passwordSSH"] = Prompt.ask(translations[current_language]["TITLE_SSH_PASS"], password=True)
+    data["source_container"] = select_source_container(build_ssh_command(data))
     
     data["bridge"] = select_bridge()
     if not data["bridge"]:
@@ -153,7 +255,9 @@ def user_input():
     data["rootsize"] = Prompt.ask(translations[current_language]["TITLE_ROOTSIZE"])
     data["memory"] = Prompt.ask(translations[current_language]["TITLE_MEMORY"])
     
-    data["storage"] = select_storage()
+    rootsize_bytes = rootsize_to_bytes(data["rootsize"])
+    inventory_bytes = estimate_inventory(build_ssh_command(data))
+    data["storage"], data["node"] = select_storage(rootsize_bytes, inventory_bytes)
     if not data["storage"]:
         return None
         
@@ -161,6 +265,24 @@ def user_input():
     
     return data
 
+def select_source_container(ssh_command):
+    """Oferece migrar um único container quando a origem é um host de containers"""
+    containers = source_containers.detect(ssh_command)
+    if not containers:
+        return ""
+
+    table = Table(show_header=False)
+    table.add_row(f"[0] {translations[current_language]['LBL_WHOLE_HOST']}")
+    for i, container in enumerate(containers, 1):
+        table.add_row(f"[{i}] {container['kind']}: {container['name']} "
+                      f"({container['image'] or container['id']}, {container['state']})")
+
+    console.print(Panel(translations[current_language]["MSG_SOURCE_CONTAINERS_PROMPT"]))
+    console.print(table)
+
+    choice = Prompt.ask("", choices=[str(i) for i in range(len(containers) + 1)], default="0")
+    return containers[int(choice) - 1]["id"] if choice != "0" else ""
+
 def validate_parameters(data):
     """Valida os parâmetros fornecidos"""
     required_fields = ["name", "target", "port", "id", "rootsize", "ip", 
@@ -177,41 +299,404 @@ def validate_parameters(data):
         
     return True
 
-def collect_fs(ssh_command):
+EXCLUDED_PATHS = [
+    "/proc/*", "/sys/*", "/dev/*", "/tmp/*", "/run/*",
+    "/mnt/*", "/media/*", "/lost+found", "/var/cache/apt/archives/*"
+]
+
+def use_adaptive(data, ssh_command):
+    """Usa a compressão adaptativa quando pedida e a origem tem python3"""
+    # O canal TCP transporta o tar czpf
+    if data.get("compression", "adaptive") != "adaptive" or data.get("channel") == "tcp":
+        return False
+    if adaptive_compression.has_python(ssh_command):
+        return True
+    logger.info("Origem sem python3, usando tar czpf")
+    return False
+
+def tar_command(excluded_paths=EXCLUDED_PATHS):
+    """Comando tar da coleta (executado em /)"""
+    command = ["tar", "czpf", "-", "--numeric-owner", "--anchored"]
+    # Os membros se chamam ./proc/...: o padrão ancorado precisa do mesmo prefixo
+    for path in excluded_paths:
+        command.extend(["--exclude", shlex.quote("." + path)])
+    command.append(".")
+    return command
+
+def collect_fs(ssh_command, excluded_paths=EXCLUDED_PATHS):
     """Coleta o sistema de arquivos via SSH"""
-    excluded_paths = [
-        "/proc/*", "/sys/*", "/dev/*", "/tmp/*", "/run/*",
-        "/mnt/*", "/media/*", "/lost+found", "/var/cache/apt/archives/*"
+    ssh_command.extend(["cd / &&"] + tar_command(excluded_paths))
+    return tracer.watch(subprocess.Popen(ssh_command, stdout=subprocess.PIPE), "collect_fs")
+
+def open_data_channel(data, ssh_command):
+    """Canal TCP para a coleta quando pedido ("channel": "tcp"); None usa o SSH"""
+    if data.get("channel") != "tcp":
+        return None
+    return data_channel.open_channel(
+        list(ssh_command), "cd / && " + " ".join(tar_command()),
+        data.get("channel_host") or data["target"], int(data.get("channel_streams", 1))
+    )
+
+def record_metrics(data, ssh_command):
+    """Guarda as métricas da migração no histórico usado pelo planner"""
+    source_bytes = 0
+    # Com um container da origem o inventário seria o do host inteiro
+    if not data.get("source_container"):
+        try:
+            source_bytes = planner.inventory(ssh_command, sample=False)["source_bytes"]
+        except (subprocess.CalledProcessError, IndexError, ValueError):
+            pass
+    data["metrics"].update(transferred_bytes=data.get("transferred_bytes", 0), source_bytes=source_bytes)
+    planner.record_migration("lxc", data, data["metrics"])
+
+def convert_native(data, ssh_command, engine):
+    """Cria o container replicando a raiz com zfs/btrfs send/receive
+
+    Retorna None quando a replicação de um CT novo falha: o chamador segue
+    pelo caminho tar.
+    """
+    display_message("TITLE_INFO", "MSG_NATIVE_REPLICATION")
+
+    started = time.monotonic()
+    resync = (Path("/etc/pve/lxc") / f"{data['id']}.conf").exists()
+    if resync and not replication.is_replica(data, engine):
+        # Como o `pct create`, não sobrescreve um CT existente
+        display_message("TITLE_ERROR", "MSG_CT_ID_IN_USE")
+        return False
+    with tracer.span("replicate", fs=engine["fs"]):
+        replicated = replication.replicate(data, ssh_command, engine)
+    if not replicated:
+        display_message("TITLE_WARNING" if not resync else "TITLE_ERROR", "MSG_NATIVE_REPLICATION_FAILED")
+        return False if resync else None
+    data["metrics"] = {"engine": engine["fs"], "transfer_seconds": time.monotonic() - started}
+    record_metrics(data, ssh_command)
+
+    display_message("TITLE_SUCCESS", "MSG_CT_CREATED")
+
+    # Sem `pct create` a senha precisa ser definida com o container rodando
+    start_container(data, ssh_command, set_password=True)
+    return True
+
+def validate_container(data, ssh_command, remote, started):
+    """Roda as mesmas sondas na origem e no container e guarda o relatório"""
+    display_message("TITLE_INFO", "MSG_VALIDATING")
+    with tracer.span("validate"):
+        report = validation.validate(
+            source_containers.shell_command(ssh_command, data.get("source_container_info")),
+            on_node(remote, ["pct", "exec", data["id"], "--", "sh", "-s"]),
+            data["target"], started,
+            target_host=None if data["ip"] == "dhcp" else data["ip"]
+        )
+    validation.save_report("lxc", data["name"], report)
+    data.setdefault("metrics", {})["validation"] = report
+    if not events.emit("validation", **report):
+        for line in validation.format_report(report):
+            console.print(f"  {line}")
+    if validation.passed(report):
+        display_message("TITLE_SUCCESS", "MSG_VALIDATION_OK")
+    else:
+        display_message("TITLE_WARNING", "MSG_VALIDATION_REGRESSION")
+
+def set_root_password(data, remote=(), running=True):
+    """Define a senha de root do CT; avisa e retorna False se não conseguiu
+
+    A senha vai sempre pelo stdin do chpasswd (não aparece na lista de
+    processos nem no shell remoto): com `pct exec` no CT rodando ou, se
+    isso falhar ou o CT não iniciou, com o chpasswd do node editando o
+    rootfs montado por `pct mount`.
+    """
+    ct_id = data["id"]
+    password = f"root:{data['passwordCT']}\n"
+    done = running and subprocess.run(
+        on_node(remote, ["pct", "exec", ct_id, "--", "chpasswd"]),
+        input=password, text=True, capture_output=True
+    ).returncode == 0
+    if not done and subprocess.run(on_node(remote, ["pct", "mount", ct_id]), capture_output=True).returncode == 0:
+        try:
+            done = subprocess.run(
+                on_node(remote, ["chpasswd", "-R", f"/var/lib/lxc/{ct_id}/rootfs"]),
+                input=password, text=True, capture_output=True
+            ).returncode == 0
+        finally:
+            subprocess.run(on_node(remote, ["pct", "unmount", ct_id]), capture_output=True)
+    if not done:
+        display_message("TITLE_WARNING", "MSG_CT_PASSWORD_NOT_SET")
+    return done
+
+def start_container(data, ssh_command, remote=(), set_password=False):
+    """Inicia o container e, com "validate", compara com a origem"""
+    display_message("TITLE_INFO", "MSG_STARTING_CT")
+    started = time.monotonic()
+    if tracer.run(on_node(remote, ["pct", "start", data["id"]]), name="pct start").returncode != 0:
+        display_message("TITLE_WARNING", "MSG_CT_START_FAILED")
+        # A senha pedida vale também para quem for investigar o CT parado
+        if set_password:
+            set_root_password(data, remote, running=False)
+        return
+    if set_password:
+        set_root_password(data, remote)
+    display_message("TITLE_SUCCESS", "MSG_CT_STARTED")
+    if data.get("validate"):
+        validate_container(data, ssh_command, remote, started)
+
+def collect_to_file(data, ssh_command, path, source=None):
+    """Coleta a raiz em `path` (tar adaptativo ou tar.gz) e preenche as métricas
+
+    Com `source` (fan-out) o tar.gz já coletado é lido desse stream.
+    Retorna False se a conexão ou a coleta falhou.
+    """
+    started = time.monotonic()
+    collected = source is not None or path.endswith(".tar")
+    channel = None if collected else open_data_channel(data, ssh_command)
+    if source is not None:
+        with tracer.span("copy_loop") as span, open(path, 'wb') as f:
+            shutil.copyfileobj(source, f, fanout.CHUNK_SIZE)
+            span.set(bytes=f.tell())
+        data["transferred_bytes"] = os.path.getsize(path)
+        data["metrics"] = {"engine": "tar-fanout", "codec": "gzip"}
+    elif path.endswith(".tar"):
+        with open(path, 'wb') as f:
+            stats = adaptive_compression.collect_to_file(ssh_command, EXCLUDED_PATHS, f)
+        if stats is None:
+            return False
+        compression = adaptive_compression.report([stats])
+        if not events.emit("compression", **compression):
+            console.print(f"[cyan]Compressão adaptativa:[/cyan] {adaptive_compression.format_report(compression)}")
+        data["transferred_bytes"] = compression["sent_bytes"]
+        data["metrics"] = {"engine": "tar", "codec": "adaptive", "compression": compression}
+    elif channel:
+        with open(path, 'wb') as f:
+            stats = channel.receive(f)
+        if stats is None:
+            return False
+        logger.info(f"Canal de dados: {stats['mbps']} Mbit/s em {stats['streams']} conexões")
+        data["transferred_bytes"] = stats["bytes"]
+        # Engine própria: a calibração do planner usa só o tar pelo SSH
+        data["metrics"] = {"engine": "tar-tcp", "codec": "gzip", "streams": stats["streams"]}
+    else:
+        process = collect_fs(ssh_command)
+        with tracer.span("copy_loop") as span, open(path, 'wb') as f:
+            for chunk in process.stdout:
+                f.write(chunk)
+            span.set(bytes=f.tell())
+        if process.wait() != 0:
+            return False
+        data["transferred_bytes"] = os.path.getsize(path)
+        data["metrics"] = {"engine": "tar", "codec": "gzip"}
+    data["metrics"]["transfer_seconds"] = time.monotonic() - started
+    return True
+
+def collect_container(data, ssh_command, path, container):
+    """Coleta em `path` o rootfs de um container da origem
+
+    Docker vem do `docker export`; LXC, do rootfs do guest.
+    """
+    display_message("TITLE_INFO", "MSG_EXPORTING_CONTAINER")
+    command = source_containers.rootfs_command(ssh_command, container, EXCLUDED_PATHS)
+    if command is None:
+        display_message("TITLE_ERROR", "MSG_SOURCE_ROOTFS_UNAVAILABLE")
+        return False
+    started = time.monotonic()
+    with tracer.span("copy_loop") as span, open(path, 'wb') as f:
+        process = tracer.watch(subprocess.Popen(ssh_command + [command], stdout=f), "collect_fs")
+        collected = process.wait() == 0
+        span.set(bytes=os.path.getsize(path))
+    if not collected:
+        return False
+    data["transferred_bytes"] = os.path.getsize(path)
+    data["metrics"] = {
+        "engine": "docker-export" if container["kind"] == "docker" else "tar-container",
+        "codec": "gzip", "transfer_seconds": time.monotonic() - started,
+    }
+    return True
+
+def create_options(data):
+    """Opções do `pct create` comuns aos caminhos de criação"""
+    if data["ip"] == "dhcp":
+        net_param = f"name=eth0,bridge={data['bridge']},ip=dhcp"
+    else:
+        net_param = f"name=eth0,bridge={data['bridge']},ip={data['ip']}/24,gw={data['gateway']}"
+    return [
+        "--description", f"LXC Migrated: {data['name']} (from {data['target']})",
+        "--hostname", data["name"],
+        "--features", "nesting=1",
+        "--unprivileged", "0",
+        "--memory", data["memory"],
+        "--nameserver", "8.8.8.8",
+        "--net0", net_param,
+        "--rootfs", f"{data['storage']}:{data['rootsize']}",
+        "--onboot", "1",
+        "--cmode", "shell"
     ]
-    
-    tar_command = ["tar", "czpf", "-", "--numeric-owner", "--anchored"]
-    for path in excluded_paths:
-        tar_command.extend(["--exclude", path])
-    tar_command.append(".")
-    
-    ssh_command.extend(["cd / &&"] + tar_command)
-    return subprocess.Popen(ssh_command, stdout=subprocess.PIPE)
 
-def convert(data):
-    """Converte e cria o container"""
-    with tempfile.NamedTemporaryFile(prefix=f"{data['name']}_migration_", suffix=".tar.gz") as temp_file:
+# ID do /etc/os-release -> ostype do Proxmox
+OSTYPES = {
+    "debian": "debian", "devuan": "devuan", "ubuntu": "ubuntu", "centos": "centos",
+    "rhel": "centos", "rocky": "centos", "almalinux": "centos", "fedora": "fedora",
+    "opensuse": "opensuse", "opensuse-leap": "opensuse", "arch": "archlinux",
+    "alpine": "alpine", "gentoo": "gentoo", "nixos": "nixos",
+}
+
+def detect_ostype(rootfs):
+    """ostype do Proxmox a partir do os-release extraído (unmanaged se desconhecido)"""
+    try:
+        with open(Path(rootfs) / "etc" / "os-release", 'r') as f:
+            for line in f:
+                if line.startswith("ID="):
+                    return OSTYPES.get(line[3:].strip().strip('"'), "unmanaged")
+    except OSError:
+        pass
+    return "unmanaged"
+
+def stream_extract(data, ssh_command, rootfs):
+    """Coleta a origem e extrai o stream direto em `rootfs`, sem tarball temporário"""
+    if use_adaptive(data, list(ssh_command)):
+        # O agente entrega frames: uma thread os decodifica para um pipe
+        read_fd, write_fd = os.pipe()
+        result = {}
+
+        def decode():
+            # Se a extração parar, o pipe quebra: collect_to_file mata o ssh
+            try:
+                with os.fdopen(write_fd, 'wb') as out:
+                    result["stats"] = adaptive_compression.collect_to_file(ssh_command, EXCLUDED_PATHS, out)
+            except OSError:
+                result["stats"] = None
+
+        context = contextvars.copy_context()
+        decoder = threading.Thread(target=context.run, args=(decode,), daemon=True)
+        decoder.start()
+        try:
+            with os.fdopen(read_fd, 'rb') as stream:
+                stats = extractor.extract(stream, rootfs)
+        finally:
+            decoder.join()
+        if result.get("stats") is None:
+            return None
+        compression = adaptive_compression.report([result["stats"]])
+        if not events.emit("compression", **compression):
+            console.print(f"[cyan]Compressão adaptativa:[/cyan] {adaptive_compression.format_report(compression)}")
+        data["metrics"] = {"engine": "tar-parallel", "codec": "adaptive", "compression": compression}
+        data["transferred_bytes"] = compression["sent_bytes"]
+    else:
+        process = collect_fs(list(ssh_command))
+        try:
+            stats = extractor.extract(process.stdout, rootfs)
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+        if returncode != 0:
+            return None
+        data["metrics"] = {"engine": "tar-parallel", "codec": "gzip"}
+        data["transferred_bytes"] = stats["stream_bytes"]
+    return stats
+
+def convert_parallel(data, ssh_command):
+    """Cria o container vazio e extrai a origem no rootfs com o extrator paralelo
+
+    Coleta e extração acontecem ao mesmo tempo; o ostype é definido depois
+    da extração e a senha com o container rodando (como na replicação).
+    """
+    display_message("TITLE_INFO", "MSG_CREATING_CT")
+    ct_id = data["id"]
+    with tempfile.NamedTemporaryFile(prefix=f"{data['name']}_empty_", suffix=".tar") as template:
+        # Template com apenas a raiz: o pct create só aloca o volume
+        with tarfile.open(fileobj=template, mode="w") as tar:
+            root = tarfile.TarInfo(".")
+            root.type, root.mode = tarfile.DIRTYPE, 0o755
+            tar.addfile(root)
+        template.flush()
+        create_command = ["pct", "create", ct_id, template.name, "--ostype", "unmanaged"] + create_options(data)
+        if tracer.run(create_command, name="pct create").returncode != 0:
+            display_message("TITLE_ERROR", "MSG_CT_FAILED")
+            return False
+
+    display_message("TITLE_INFO", "MSG_PARALLEL_EXTRACTION")
+    rootfs = f"/var/lib/lxc/{ct_id}/rootfs"
+    started = time.monotonic()
+    stats = None
+    try:
+        subprocess.run(["pct", "mount", ct_id], check=True, capture_output=True)
+        try:
+            with tracer.span("parallel_extract") as span:
+                stats = stream_extract(data, ssh_command, rootfs)
+                span.set(**(stats or {}))
+            ostype = detect_ostype(rootfs)
+        finally:
+            subprocess.run(["pct", "unmount", ct_id], capture_output=True)
+    finally:
+        # Coleta ou extração falhou: não deixa um CT com o rootfs pela metade
+        if stats is None:
+            subprocess.run(["pct", "destroy", ct_id], capture_output=True)
+
+    if stats is None:
+        display_message("TITLE_ERROR", "MSG_SSH_CONNECTION_FAILED")
+        return False
+    data["metrics"]["transfer_seconds"] = time.monotonic() - started
+    data["metrics"]["extract_files"] = stats["files"]
+    logger.info(f"Extração paralela: {stats['files']} arquivos, {stats['directories']} diretórios em {stats['seconds']}s")
+
+    subprocess.run(["pct", "set", ct_id, "--ostype", ostype], capture_output=True)
+    display_message("TITLE_SUCCESS", "MSG_CT_CREATED")
+    record_metrics(data, ssh_command)
+
+    start_container(data, ssh_command, set_password=True)
+    return True
+
+def convert(data, source=None):
+    """Converte e cria o container
+
+    `source` é o stream do tar.gz da origem quando a coleta é compartilhada
+    entre vários destinos (fan-out).
+    """
+    ssh_command = build_ssh_command(data)
+    # Origem que é um host de containers: migra só o container pedido
+    container = None
+    if source is None and data.get("source_container"):
+        container = source_containers.find(ssh_command, data["source_container"])
+        if container is None:
+            display_message("TITLE_ERROR", "MSG_SOURCE_CONTAINER_NOT_FOUND")
+            return False
+        # Sem init o CT criado do `docker export` não inicia
+        if container["kind"] == "docker" and not source_containers.has_init(ssh_command, container):
+            display_message("TITLE_ERROR", "MSG_SOURCE_CONTAINER_NO_INIT")
+            return False
+        data["source_container_info"] = container
+
+    # O agente adaptativo entrega um tar sem compressão, aceito pelo pct create
+    suffix = ".tar" if source is None and not container and use_adaptive(data, list(ssh_command)) else ".tar.gz"
+    with tempfile.NamedTemporaryFile(prefix=f"{data['name']}_migration_", suffix=suffix) as temp_file:
         display_message("TITLE_INFO", "MSG_COLLECTING_FS")
         
-        ssh_command = [
-            "sshpass", "-p", data["passwordSSH"],
-            "ssh", "-p", data["port"],
-            "-o", "StrictHostKeyChecking=no",
-            "-o", "ConnectTimeout=10",
-            f"root@{data['target']}"
-        ]
-        
         try:
-            process = collect_fs(ssh_command)
-            with open(temp_file.name, 'wb') as f:
-                for chunk in process.stdout:
-                    f.write(chunk)
-            
-            if process.wait() != 0:
+            # Modo batch: storage "auto" é escolhido pela placement
+            if data.get("storage") in (None, "", "auto") and not auto_place(data, ssh_command):
+                display_message("TITLE_ERROR", "MSG_NO_SUITABLE_STORAGE")
+                return False
+
+            remote = node_command(data)
+
+            # Origem e storage com o mesmo fs: replica com send/receive nativo
+            # "engine": "tar" (escolha do --plan) dispensa a replicação
+            native = data.get("engine", "auto") != "tar" and not (remote or source is not None or container)
+            engine = replication.select_engine(ssh_command, data["storage"]) if native else None
+            if engine:
+                converted = convert_native(data, ssh_command, engine)
+                if converted is not None:
+                    return converted
+
+            # Extração paralela direto no rootfs (precisa do volume neste node)
+            if data.get("extractor") == "parallel" and not remote and source is None and not container:
+                return convert_parallel(data, ssh_command)
+
+            if container:
+                collected = collect_container(data, list(ssh_command), temp_file.name, container)
+            else:
+                collected = collect_to_file(data, list(ssh_command), temp_file.name, source)
+            if not collected:
                 display_message("TITLE_ERROR", "MSG_SSH_CONNECTION_FAILED")
                 return False
                 
@@ -221,35 +706,27 @@ def convert(data):
             
             display_message("TITLE_INFO", "MSG_CREATING_CT")
             
-            # Prepara parâmetros do pct create
-            if data["ip"] == "dhcp":
-                net_param = f"name=eth0,bridge={data['bridge']},ip=dhcp"
-            else:
-                net_param = f"name=eth0,bridge={data['bridge']},ip={data['ip']}/24,gw={data['gateway']}"
-            
-            create_command = [
-                "pct", "create", data["id"], temp_file.name,
-                "--description", f"LXC Migrated: {data['name']} (from {data['target']})",
-                "--hostname", data["name"],
-                "--features", "nesting=1",
-                "--unprivileged", "0",
-                "--memory", data["memory"],
-                "--nameserver", "8.8.8.8",
-                "--net0", net_param,
-                "--rootfs", f"{data['storage']}:{data['rootsize']}",
-                "--password", data["passwordCT"],
-                "--onboot", "1",
-                "--cmode", "shell"
-            ]
+            template = temp_file.name
+            if remote:
+                # O pct create roda no node escolhido, então o template vai até lá
+                template = f"/var/tmp/{os.path.basename(temp_file.name)}"
+                subprocess.run(["scp", "-o", "BatchMode=yes", temp_file.name,
+                                f"{remote[-1]}:{template}"], check=True)
+
+            # Senha via chpasswd depois do start, fora da linha de comando
+            create_command = on_node(remote, ["pct", "create", data["id"], template] + create_options(data))
             
-            if subprocess.run(create_command).returncode == 0:
+            started = time.monotonic()
+            created = tracer.run(create_command, name="pct create").returncode == 0
+            data["metrics"]["extract_seconds"] = time.monotonic() - started
+            if remote:
+                subprocess.run(on_node(remote, ["rm", "-f", template]))
+
+            if created:
                 display_message("TITLE_SUCCESS", "MSG_CT_CREATED")
+                record_metrics(data, ssh_command)
                 
-                display_message("TITLE_INFO", "MSG_STARTING_CT")
-                if subprocess.run(["pct", "start", data["id"]]).returncode == 0:
-                    display_message("TITLE_SUCCESS", "MSG_CT_STARTED")
-                else:
-                    display_message("TITLE_WARNING", "MSG_CT_START_FAILED")
+                start_container(data, ssh_command, remote, set_password=True)
                 return True
             else:
                 display_message("TITLE_ERROR", "MSG_CT_FAILED")
@@ -265,6 +742,8 @@ def confirm_migration(data):
     details += f"  {translations[current_language]['LBL_CT_ID']}: {data['id']}\n"
     details += f"  {translations[current_language]['LBL_CT_NAME']}: {data['name']}\n"
     details += f"  {translations[current_language]['LBL_TARGET_HOST']}: {data['target']}:{data['port']}\n"
+    if data.get("source_container"):
+        details += f"  {translations[current_language]['LBL_SOURCE_CONTAINER']}: {data['source_container'][:12]}\n"
     details += f"  {translations[current_language]['LBL_BRIDGE']}: {data['bridge']}\n"
     details += f"  {translations[current_language]['LBL_IP_CONFIG']}: {data['ip']}"
     
@@ -280,7 +759,12 @@ def confirm_migration(data):
 def check_incomplete_migrations():
     """Verifica se existem migrações incompletas e permite continuar"""
     state_manager = MigrationState()
-    incomplete = state_manager.get_incomplete_migrations()
+    # Jobs do daemon (e as execuções deles, `<job>_run`) são retomados pelo próprio daemon
+    incomplete = [
+        m for m in state_manager.get_incomplete_migrations()
+        if 'job' not in m.get('data', {}) and 'targets' not in m.get('data', {})
+        and not m.get('migration_id', '').endswith('_run')
+    ]
     
     if not incomplete:
         return None, None
@@ -355,14 +839,8 @@ def migrate_lxc():
             state_manager.save_state(data, "cancelled")
             return False
     
-    state_manager.save_state(data, "converting")
-    if convert(data):
-        state_manager.save_state(data, "completed")
-        state_manager.clear_state()  # Remove o arquivo de estado após sucesso
-        return True
-    else:
-        state_manager.save_state(data, "failed")
-        return False
+    # A interface é só mais um cliente do núcleo da API
+    return api.execute("lxc", data, state_manager)
 
 if __name__ == "__main__":
     migrate_lxc()
@@ -0,0 +1,101 @@
+import subprocess
+import logging
+
+from utils import planner, replication, adaptive_compression
+from utils.placement import THIN_TYPES
+from utils.system_info import get_storage_status, get_docker_root_free
+
+logger = logging.getLogger('lincon')
+
+def _human_bytes(value):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if abs(value) < 1024 or unit == "TB":
+            return f"{value:.1f} {unit}"
+        value /= 1024
+
+def _human_time(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s"
+
+def _destination(kind, data, ssh_command):
+    """Retorna (motor nativo aplicável, storage thin?, espaço livre em bytes)"""
+    try:
+        if kind == "docker":
+            return None, True, get_docker_root_free()
+        storage = get_storage_status().get(data.get("storage"), {})
+        engine = replication.select_engine(ssh_command, data["storage"])
+        return (engine or {}).get("fs"), storage.get("type") in THIN_TYPES, storage.get("avail")
+    except (subprocess.CalledProcessError, FileNotFoundError, OSError, KeyError) as e:
+        logger.warning(f"Não foi possível consultar o destino: {e}")
+        return None, True, None
+
+def build_plan(kind, data, window_minutes=None):
+    """Monta o plano de uma migração sem transferir nada"""
+    if kind == "lxc":
+        from migrate_lxc import build_ssh_command, rootsize_to_bytes
+        rootsize_bytes = rootsize_to_bytes(data.get("rootsize"))
+    else:
+        from migrate_docker import build_ssh_command
+        rootsize_bytes = 0
+
+    ssh_command = build_ssh_command(data)
+    info = planner.inventory(ssh_command)
+    calibration = planner.calibrate(
+        planner.load_history(), planner.destination_key(kind, data), data.get("target")
+    )
+    native_engine, thin, free_bytes = _destination(kind, data, ssh_command)
+    # Mesmas condições de use_adaptive na migração
+    codecs = ["gzip"]
+    if data.get("channel") != "tcp" and adaptive_compression.has_python(list(ssh_command)):
+        codecs.append("adaptive")
+
+    predictions = planner.plan(
+        kind, info["source_bytes"], calibration, native_engine,
+        ratio=info["sample_ratio"], thin=thin, rootsize_bytes=rootsize_bytes, codecs=codecs
+    )
+    window_seconds = window_minutes * 60 if window_minutes else None
+    choice, fits = planner.choose(predictions, window_seconds, free_bytes)
+    return {
+        "data": planner.apply_choice(kind, data, choice),
+        "inventory": info,
+        "calibration": calibration,
+        "free_bytes": free_bytes,
+        "window_seconds": window_seconds,
+        "predictions": predictions,
+        "choice": choice,
+        "fits": fits,
+    }
+
+def print_plan(result, console):
+    """Mostra o plano em tabela"""
+    from rich.table import Table
+
+    info = result["inventory"]
+    calibration = result["calibration"]
+    ratio = info["sample_ratio"] or calibration["gzip_ratio"]
+    console.print(
+        f"[cyan]Origem:[/cyan] {_human_bytes(info['source_bytes'])}, {info['files']} inodes, "
+        f"razão gzip {ratio:.2f} ({'amostrada' if info['sample_ratio'] else 'histórico'})"
+    )
+    console.print(
+        f"[cyan]Calibração:[/cyan] link {_human_bytes(calibration['link_speed'])}/s, "
+        f"extração {_human_bytes(calibration['extract_rate'])}/s ({calibration['samples']} migrações no histórico)"
+    )
+
+    table = Table(show_header=True)
+    for column in ("Motor", "Codec", "Rede", "Transferência", "Extração", "Total", "Disco"):
+        table.add_column(column)
+    for p in sorted(result["predictions"], key=lambda p: p["total_seconds"]):
+        marker = " *" if p is result["choice"] else ""
+        table.add_row(
+            p["engine"] + marker, p["codec"] or "-", _human_bytes(p["wire_bytes"]),
+            _human_time(p["transfer_seconds"]), _human_time(p["extract_seconds"]),
+            _human_time(p["total_seconds"]), _human_bytes(p["disk_bytes"])
+        )
+    console.print(table)
+
+    if result["fits"]:
+        console.print(f"[green]Recomendado: {result['choice']['engine']} {result['choice']['codec'] or ''}[/green]")
+    else:
+        console.print("[red]Nenhuma opção cabe na janela de manutenção ou no espaço livre do destino[/red]")
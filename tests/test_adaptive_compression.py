@@ -0,0 +1,77 @@
+"""Frames do agente adaptativo: codificação e decodificação de ida e volta"""
+import io
+import os
+import shutil
+import struct
+import tarfile
+import zlib
+
+import pytest
+
+from utils import adaptive_compression
+
+def agent_namespace(**overrides):
+    """Classes e funções do agente remoto, sem executar o `main()`"""
+    namespace = {"__name__": "agent"}
+    exec(adaptive_compression.REMOTE_AGENT.rsplit("main()", 1)[0], namespace)
+    namespace.update(overrides)
+    return namespace
+
+def test_frame_writer_roundtrip_with_stored_and_compressed_frames():
+    agent = agent_namespace(FRAME_SIZE=1024)
+    encoded = io.BytesIO()
+    writer = agent["FrameWriter"](encoded, 6)
+    text, noise = b"linha de log repetida\n" * 400, os.urandom(5000)
+    writer.write(text)
+    # Escolha do chamador: conteúdo já comprimido vai cru
+    writer.set_compress(False)
+    writer.write(noise)
+    writer.set_compress(True)
+    # Aleatório com compressão ligada: o deflate não ganha e o frame vai cru
+    writer.write(noise[:900] + text[:200])
+    writer.close()
+
+    kinds, rest = [], encoded.getvalue()
+    while rest:
+        kinds.append(rest[:1])
+        rest = rest[5 + struct.unpack(">I", rest[1:5])[0]:]
+    assert {b"Z", b"R"} <= set(kinds) and kinds[-1] == b"E"
+
+    encoded.seek(0)
+    decoded = io.BytesIO()
+    stats = adaptive_compression.decode(encoded, decoded)
+    assert decoded.getvalue() == text + noise + noise[:900] + text[:200]
+    assert stats["raw_in"] == len(decoded.getvalue())
+    assert stats["stored_raw"] + stats["compressed_in"] == stats["raw_in"]
+
+def test_decode_rejects_unknown_and_truncated_frames():
+    with pytest.raises(ValueError):
+        adaptive_compression.decode(io.BytesIO(b"X" + struct.pack(">I", 0)), io.BytesIO())
+    payload = zlib.compress(b"abc")
+    truncated = b"Z" + struct.pack(">I", len(payload)) + payload[:-1]
+    with pytest.raises(EOFError):
+        adaptive_compression.decode(io.BytesIO(truncated), io.BytesIO())
+
+@pytest.mark.skipif(not shutil.which("python3"), reason="python3 indisponível")
+def test_agent_roundtrip(tmp_path):
+    root = tmp_path / "root"
+    (root / "etc").mkdir(parents=True)
+    (root / "etc" / "config").write_text("chave = valor\n" * 5000)
+    (root / "var" / "cache").mkdir(parents=True)
+    (root / "var" / "cache" / "pacote.gz").write_bytes(os.urandom(300 * 1024))
+    (root / "var" / "cache" / "ignorado").write_text("x")
+    os.symlink("config", root / "etc" / "link")
+
+    # Sem ssh: o agente roda no python3 local
+    out = io.BytesIO()
+    stats = adaptive_compression.collect_to_file([], [str(root / "var" / "cache" / "ignorado")], out, paths=[str(root)])
+    assert stats is not None and stats["stored_raw"] and stats["compressed_in"]
+
+    out.seek(0)
+    with tarfile.open(fileobj=out) as tar:
+        prefix = str(root).lstrip("/") + "/"
+        members = {member.name[len(prefix):]: member for member in tar if member.name.startswith(prefix)}
+        assert tar.extractfile(members["etc/config"]).read() == (root / "etc" / "config").read_bytes()
+        assert tar.extractfile(members["var/cache/pacote.gz"]).read() == (root / "var" / "cache" / "pacote.gz").read_bytes()
+        assert members["etc/link"].issym() and members["etc/link"].linkname == "config"
+        assert "var/cache/ignorado" not in members
@@ -0,0 +1,45 @@
+"""Exclusões do tar da coleta aplicadas aos membros reais do arquivo"""
+import subprocess
+import tarfile
+
+import pytest
+
+from utils import source_containers
+
+pytest.importorskip("rich")
+import migrate_lxc
+
+def make_tree(root):
+    for path in ("proc/self/status", "sys/kernel/x", "dev/null", "run/lock",
+                 "var/cache/apt/archives/a.deb", "etc/hostname", "var/lib/dpkg/status"):
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text("x")
+
+def members(command, tmp_path):
+    archive = tmp_path / "out.tar.gz"
+    with open(archive, "wb") as out:
+        subprocess.run(["sh", "-c", command], stdout=out, check=True)
+    with tarfile.open(archive) as tar:
+        return set(tar.getnames())
+
+def test_tar_command_skips_excluded_paths(tmp_path):
+    root = tmp_path / "root"
+    make_tree(root)
+    names = members(f"cd {root} && " + " ".join(migrate_lxc.tar_command()), tmp_path)
+
+    assert "./etc/hostname" in names and "./var/lib/dpkg/status" in names
+    # O diretório fica (ponto de montagem), o conteúdo não
+    assert "./proc" in names
+    for excluded in ("./proc/self/status", "./sys/kernel/x", "./dev/null", "./run/lock",
+                     "./var/cache/apt/archives/a.deb"):
+        assert excluded not in names
+
+def test_container_rootfs_command_skips_excluded_paths(tmp_path, monkeypatch):
+    root = tmp_path / "root"
+    make_tree(root)
+    monkeypatch.setattr(source_containers, "rootfs", lambda ssh_command, container: str(root))
+    command = source_containers.rootfs_command([], {"kind": "lxc", "id": "web"}, migrate_lxc.EXCLUDED_PATHS)
+    names = members(command, tmp_path)
+
+    assert "./etc/hostname" in names
+    assert "./proc/self/status" not in names and "./sys/kernel/x" not in names
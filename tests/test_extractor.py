@@ -0,0 +1,107 @@
+"""Ida e volta: tar gerado pelo tarfile extraído pelo extrator paralelo"""
+import gzip
+import io
+import os
+import stat
+import tarfile
+
+import pytest
+
+from utils import extractor
+from utils.exceptions import MigrationError
+
+LONG_DIR = "/".join(["diretorio_com_nome_comprido_" + str(i) for i in range(6)])
+
+def make_tree(root):
+    (root / "etc").mkdir(parents=True)
+    (root / "etc" / "hostname").write_text("web\n")
+    (root / "etc" / "shadow").write_text("root:*:19000::::::\n")
+    os.chmod(root / "etc" / "shadow", 0o640)
+    (root / "empty").write_bytes(b"")
+    (root / "big.bin").write_bytes(os.urandom(3000))
+    # Caminho > 255 bytes e nome > 100: GNU longname ou pax path
+    (root / LONG_DIR).mkdir(parents=True)
+    (root / LONG_DIR / ("arquivo_" * 15 + ".txt")).write_text("longo")
+    (root / "usr" / "bin").mkdir(parents=True)
+    (root / "usr" / "bin" / "python3.11").write_text("#!binario")
+    os.chmod(root / "usr" / "bin" / "python3.11", 0o755)
+    os.symlink("python3.11", root / "usr" / "bin" / "python3")
+    os.symlink("/etc/hostname", root / "etc" / "absolute_link")
+    os.symlink("../" + LONG_DIR + "/" + "arquivo_" * 15 + ".txt", root / "usr" / "long_link")
+    os.link(root / "etc" / "hostname", root / "usr" / "hostname_hardlink")
+    (root / "ação_ñ.txt").write_text("unicode")
+    os.mkfifo(root / "fifo")
+    os.utime(root / "etc" / "hostname", (1_600_000_000, 1_600_000_000))
+    os.chmod(root / "etc", 0o750)
+
+def archive(root, fmt, compress=False):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w", format=fmt) as tar:
+        tar.add(root, arcname=".")
+    data = buffer.getvalue()
+    return io.BytesIO(gzip.compress(data) if compress else data)
+
+def snapshot(root):
+    """Tipo, permissões, mtime, conteúdo/alvo e grupos de hardlink de cada caminho"""
+    entries, inodes = {}, {}
+    for directory, names, files in os.walk(root):
+        for name in names + files:
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root)
+            info = os.lstat(path)
+            if stat.S_ISLNK(info.st_mode):
+                entry = ("link", os.readlink(path))
+            elif stat.S_ISREG(info.st_mode):
+                with open(path, "rb") as f:
+                    entry = ("file", f.read(), stat.S_IMODE(info.st_mode), int(info.st_mtime))
+                inodes.setdefault(info.st_ino, []).append(relative)
+            else:
+                entry = (stat.S_IFMT(info.st_mode), stat.S_IMODE(info.st_mode))
+            entries[relative] = entry
+    return entries, sorted(sorted(paths) for paths in inodes.values() if len(paths) > 1)
+
+@pytest.mark.parametrize("fmt", [tarfile.GNU_FORMAT, tarfile.PAX_FORMAT])
+@pytest.mark.parametrize("compress", [False, True])
+def test_roundtrip(tmp_path, monkeypatch, fmt, compress):
+    # Arquivo acima do limiar vai pela escrita em blocos da thread de leitura
+    monkeypatch.setattr(extractor, "INLINE_THRESHOLD", 1024)
+    monkeypatch.setattr(extractor, "CHUNK_SIZE", 700)
+    source, target = tmp_path / "source", tmp_path / "target"
+    make_tree(source)
+
+    stats = extractor.extract(archive(source, fmt, compress), target, workers=4)
+
+    assert snapshot(target) == snapshot(source)
+    assert stats["errors"] == 0
+    assert stat.S_IMODE(os.stat(target / "etc").st_mode) == 0o750
+
+def test_pax_headers_override_ustar_fields(tmp_path):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w", format=tarfile.PAX_FORMAT) as tar:
+        info = tarfile.TarInfo("./dados.txt")
+        info.size, info.mtime = 5, 1_700_000_000.5
+        info.pax_headers = {"path": "./renomeado_pelo_pax.txt"}
+        tar.addfile(info, io.BytesIO(b"12345"))
+    buffer.seek(0)
+
+    extractor.extract(buffer, tmp_path / "target", workers=1)
+    extracted = tmp_path / "target" / "renomeado_pelo_pax.txt"
+    assert extracted.read_bytes() == b"12345"
+    assert os.stat(extracted).st_mtime == pytest.approx(1_700_000_000.5)
+
+def test_rejects_paths_outside_root(tmp_path):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        info = tarfile.TarInfo("../fora.txt")
+        info.size = 1
+        tar.addfile(info, io.BytesIO(b"x"))
+        info = tarfile.TarInfo("dentro.txt")
+        info.size = 1
+        tar.addfile(info, io.BytesIO(b"y"))
+    buffer.seek(0)
+
+    with pytest.raises(MigrationError):
+        extractor.extract(buffer, tmp_path / "target", workers=1)
+    assert not (tmp_path / "fora.txt").exists()
+    # O leitor segue alinhado: a entrada seguinte é extraída
+    assert (tmp_path / "target" / "dentro.txt").read_bytes() == b"y"
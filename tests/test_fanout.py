@@ -0,0 +1,98 @@
+"""Fan-out com streams em memória: backpressure, falhas e o `finish`"""
+import hashlib
+import io
+import os
+import time
+
+import pytest
+
+from utils import fanout
+
+DATA = os.urandom(200 * 1024)
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(fanout, "CHUNK_SIZE", 4096)
+    monkeypatch.setattr(fanout, "MAX_PENDING", 2)
+
+def digest_into(results, name, delay=0.0):
+    def consume(reader):
+        digest = hashlib.sha256()
+        while True:
+            chunk = reader.read(1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+            time.sleep(delay)
+        results[name] = digest.hexdigest()
+        return True
+    return consume
+
+def test_every_consumer_gets_the_whole_stream():
+    digests = {}
+    results, stats = fanout.tee(io.BytesIO(DATA), {name: digest_into(digests, name) for name in ("a", "b", "c")})
+
+    assert results == {"a": True, "b": True, "c": True}
+    assert set(digests.values()) == {hashlib.sha256(DATA).hexdigest()}
+    assert stats["bytes"] == len(DATA)
+    assert stats["delivered"] == {"a": len(DATA), "b": len(DATA), "c": len(DATA)}
+
+def test_slow_consumer_applies_backpressure():
+    digests = {}
+    data = DATA[:64 * 1024]
+    results, stats = fanout.tee(io.BytesIO(data), {
+        "fast": digest_into(digests, "fast"),
+        "slow": digest_into(digests, "slow", delay=0.002),
+    })
+
+    assert results == {"fast": True, "slow": True}
+    assert digests["fast"] == digests["slow"] == hashlib.sha256(data).hexdigest()
+    # Fila de 2 blocos: a leitura da origem esperou pelo consumidor lento
+    assert stats["blocked_seconds"]["slow"] > 0
+
+def test_consumer_failing_mid_stream_is_dropped():
+    digests = {}
+
+    def broken(reader):
+        reader.read(10 * 1024)
+        raise OSError("destino caiu")
+
+    results, stats = fanout.tee(io.BytesIO(DATA), {"ok": digest_into(digests, "ok"), "broken": broken})
+
+    assert results == {"ok": True, "broken": False}
+    assert digests["ok"] == hashlib.sha256(DATA).hexdigest()
+    assert stats["delivered"]["broken"] < len(DATA)
+
+def test_finish_runs_before_consumers_see_eof():
+    events = []
+
+    def consume(reader):
+        while reader.read(4096):
+            pass
+        events.append("eof")
+        return True
+
+    def finish():
+        events.append("finish")
+        return True
+
+    results, _ = fanout.tee(io.BytesIO(DATA), {"a": consume}, finish=finish)
+    assert results == {"a": True}
+    assert events == ["finish", "eof"]
+
+def test_finish_failure_fails_the_consumers():
+    digests = {}
+    results, _ = fanout.tee(io.BytesIO(DATA), {"a": digest_into(digests, "a")}, finish=lambda: False)
+
+    assert results == {"a": False}
+    assert "a" not in digests
+
+def test_finish_skipped_when_no_consumer_is_left():
+    called = []
+
+    def broken(reader):
+        raise OSError("destino caiu")
+
+    results, _ = fanout.tee(io.BytesIO(DATA), {"broken": broken}, finish=lambda: called.append(True))
+    assert results == {"broken": False}
+    assert called == []
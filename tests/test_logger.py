@@ -0,0 +1,42 @@
+"""Retenção da pasta logs/ sem apagar o log aberto pelo processo"""
+import logging
+import os
+import time
+
+from utils import logger
+
+def age(path, days):
+    old = time.time() - days * 86400
+    os.utime(path, (old, old))
+
+def test_prune_logs_removes_old_files(tmp_path):
+    (tmp_path / "migrations").mkdir()
+    old_log, new_log = tmp_path / "lincon_old.log", tmp_path / "lincon_new.log"
+    old_migration = tmp_path / "migrations" / "m1.jsonl"
+    for path in (old_log, new_log, old_migration):
+        path.write_text("x")
+    age(old_log, 30)
+    age(old_migration, 30)
+
+    logger.prune_logs(tmp_path)
+    assert not old_log.exists() and not old_migration.exists()
+    assert new_log.exists()
+
+def test_handler_keeps_its_own_files(tmp_path, monkeypatch):
+    current = tmp_path / "lincon_current.log"
+    handler = logger.RetentionFileHandler(current, tmp_path, maxBytes=1024, backupCount=2)
+    try:
+        stale = tmp_path / "lincon_stale.log"
+        for path in (current, tmp_path / "lincon_current.log.1", stale):
+            path.write_text("x")
+            age(path, 30)
+        # Processo de longa duração: o próprio log passou da retenção
+        monkeypatch.setattr(logger, "PRUNE_INTERVAL", 0)
+        handler.emit(logging.makeLogRecord({"msg": "ainda aqui"}))
+
+        assert current.exists() and (tmp_path / "lincon_current.log.1").exists()
+        assert not stale.exists()
+        handler.flush()
+        assert "ainda aqui" in current.read_text()
+    finally:
+        handler.close()
@@ -0,0 +1,62 @@
+"""Manifesto compacto: ordenação, formato em disco, diff e listagem do find"""
+import io
+import os
+import stat
+import subprocess
+
+from utils import fingerprint, manifest
+
+def build(paths):
+    builder = manifest.ManifestBuilder()
+    for i, path in enumerate(paths):
+        builder.add(path, i, i * 1_000_000_000, stat.S_IFREG | 0o644)
+    return builder.build()
+
+def test_builder_keeps_sorted_input():
+    built = build(["/a", "/a/b", "/b"])
+    assert [entry.path for entry in built] == [b"/a", b"/a/b", b"/b"]
+
+def test_unsorted_input_is_merged_from_runs(monkeypatch):
+    # Blocos de 3 entradas: o merge precisa intercalar vários blocos
+    monkeypatch.setattr(manifest, "SORT_RUN", 3)
+    paths = ["/usr/lib/x", "/etc/b", "/var/a", "/bin/sh", "/etc/a", "/usr/bin", "/a"]
+    built = build(paths)
+    assert [entry.path.decode() for entry in built] == sorted(paths)
+    # Os metadados acompanham o caminho
+    assert {entry.path.decode(): entry.size for entry in built} == {path: i for i, path in enumerate(paths)}
+
+def test_save_and_load_roundtrip(tmp_path):
+    built = build(["/etc/hostname", "/etc/hosts", "/usr/bin/env"])
+    built.save(tmp_path / "m.lcmf")
+    loaded = manifest.Manifest.load(tmp_path / "m.lcmf")
+    try:
+        assert list(loaded) == list(built)
+    finally:
+        loaded.close()
+
+def test_diff_reports_added_removed_changed():
+    old = build(["/a", "/b", "/c"])
+    builder = manifest.ManifestBuilder()
+    builder.add("/a", 0, 0, stat.S_IFREG | 0o644)
+    builder.add("/c", 99, 0, stat.S_IFREG | 0o644)
+    builder.add("/d", 0, 0, stat.S_IFREG | 0o644)
+    changes = list(manifest.diff(old, builder.build()))
+    assert changes == [("removed", b"/b"), ("changed", b"/c"), ("added", b"/d")]
+
+def test_from_stream_reads_find_listing(tmp_path):
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "dir" / "file\nwith newline").write_bytes(b"12345")
+    os.symlink("dir", tmp_path / "link")
+    listing = subprocess.run(["sh", "-c", manifest.manifest_command(str(tmp_path))],
+                             capture_output=True, check=True).stdout
+    entries = {entry.path: entry for entry in manifest.from_stream(io.BytesIO(listing), chunk_size=7)}
+
+    root = str(tmp_path).encode()
+    assert entries[root + b"/dir/file\nwith newline"].size == 5
+    assert stat.S_ISDIR(entries[root + b"/dir"].mode)
+    assert stat.S_ISLNK(entries[root + b"/link"].mode)
+
+def test_fingerprint_digest_uses_manifest_listing():
+    command = fingerprint._digest_command("etc")
+    assert command == manifest.manifest_command("/etc", "") + " | sha256sum"
+    assert "-maxdepth 1" in fingerprint._digest_command(fingerprint.ROOT_FILES)
@@ -0,0 +1,113 @@
+"""Escolha de storage com um `pvesh` simulado (sem cluster real)"""
+import json
+import subprocess
+
+import pytest
+
+from utils import placement
+
+GB = 1024 ** 3
+
+def storage(node, name, kind, avail, total=100 * GB, load=0.0, content="rootdir,images", active=True):
+    return {"node": node, "storage": name, "type": kind, "content": content, "active": active,
+            "shared": False, "total": total, "used": total - avail, "avail": avail, "load": load}
+
+class FakeRunner:
+    """Responde aos comandos do Proxmox a partir de um dicionário de caminhos"""
+    def __init__(self, responses, pct_list=None):
+        self.responses = responses
+        self.pct_list = pct_list
+        self.commands = []
+
+    def __call__(self, command):
+        self.commands.append(command)
+        if command[0] == "pct":
+            if self.pct_list is None:
+                raise FileNotFoundError("pct")
+            return self.pct_list
+        path = command[2]
+        if path not in self.responses:
+            raise subprocess.CalledProcessError(2, command)
+        return json.dumps(self.responses[path])
+
+def test_rank_thin_needs_inventory_thick_needs_rootsize():
+    engine = placement.PlacementEngine(runner=FakeRunner({}))
+    storages = [storage("pve1", "zfs", "zfspool", 20 * GB), storage("pve1", "lvm", "lvm", 20 * GB)]
+    ranked = engine.rank(storages, rootsize_bytes=50 * GB, inventory_bytes=10 * GB)
+
+    assert [c["storage"] for c in ranked] == ["zfs"]
+    assert ranked[0]["thin"] and ranked[0]["required"] == 10 * GB
+
+def test_rank_requires_headroom():
+    engine = placement.PlacementEngine(runner=FakeRunner({}))
+    required = 10 * GB
+    tight = storage("pve1", "tight", "lvm", int(required * 1.05))
+    roomy = storage("pve1", "roomy", "lvm", int(required * placement.HEADROOM) + 1)
+    ranked = engine.rank([tight, roomy], rootsize_bytes=required, inventory_bytes=GB)
+    assert [c["storage"] for c in ranked] == ["roomy"]
+
+def test_rank_skips_inactive_and_non_rootdir():
+    engine = placement.PlacementEngine(runner=FakeRunner({}))
+    storages = [storage("pve1", "off", "zfspool", 50 * GB, active=False),
+                storage("pve1", "iso", "dir", 50 * GB, content="iso,vztmpl")]
+    assert engine.rank(storages, GB, GB) == []
+
+def test_rank_prefers_local_node_on_tie():
+    engine = placement.PlacementEngine(runner=FakeRunner({}))
+    storages = [storage("pve2", "zfs", "zfspool", 50 * GB), storage("pve1", "zfs", "zfspool", 50 * GB)]
+    ranked = engine.rank(storages, GB, GB, local_node="pve1")
+
+    assert [c["node"] for c in ranked] == ["pve1", "pve2"]
+    assert ranked[0]["score"] - ranked[1]["score"] == pytest.approx(placement.LOCAL_BONUS)
+
+def test_rank_orders_by_speed_and_load():
+    engine = placement.PlacementEngine(runner=FakeRunner({}))
+    storages = [storage("pve1", "nfs", "nfs", 50 * GB),
+                storage("pve1", "busy", "zfspool", 50 * GB, load=0.5),
+                storage("pve1", "idle", "zfspool", 50 * GB)]
+    ranked = engine.rank(storages, GB, GB)
+    assert [c["storage"] for c in ranked] == ["idle", "busy", "nfs"]
+
+def cluster_responses():
+    def pvesh_storage(name, avail):
+        return {"storage": name, "type": "zfspool", "content": "rootdir", "active": 1,
+                "total": 100 * GB, "used": 100 * GB - avail, "avail": avail}
+    return {
+        "/cluster/status": [{"type": "cluster", "name": "lab"},
+                            {"type": "node", "name": "pve1", "local": 1},
+                            {"type": "node", "name": "pve2", "local": 0}],
+        "/nodes": [{"node": "pve1", "status": "online"}, {"node": "pve2", "status": "online"},
+                   {"node": "pve3", "status": "offline"}],
+        "/nodes/pve1/storage": [pvesh_storage("local-zfs", 30 * GB)],
+        "/nodes/pve2/storage": [pvesh_storage("big-zfs", 90 * GB)],
+        "/nodes/pve1/rrddata": [{"iowait": 0.2}, {"iowait": None}],
+        "/nodes/pve2/rrddata": [],
+    }
+
+def test_place_uses_whole_cluster():
+    runner = FakeRunner(cluster_responses())
+    ranked = placement.PlacementEngine(runner=runner).place(GB, GB)
+
+    assert [(c["node"], c["storage"]) for c in ranked] == [("pve2", "big-zfs"), ("pve1", "local-zfs")]
+    assert ranked[1]["load"] == 0.2
+    # Node offline não é consultado
+    assert not any("/nodes/pve3/storage" in command for command in runner.commands)
+
+def test_place_local_only():
+    ranked = placement.PlacementEngine(runner=FakeRunner(cluster_responses())).place(GB, GB, local_only=True)
+    assert [(c["node"], c["storage"]) for c in ranked] == [("pve1", "local-zfs")]
+
+def test_used_ids_from_cluster_resources():
+    runner = FakeRunner({"/cluster/resources": [{"vmid": 100, "type": "lxc"}, {"vmid": "101", "type": "qemu"}]})
+    assert placement.PlacementEngine(runner=runner).used_ids() == {100, 101}
+
+def test_used_ids_falls_back_to_pct_list():
+    pct_list = ("VMID       Status     Lock         Name\n"
+                "100        running                 web\n"
+                "105        stopped                 db\n")
+    runner = FakeRunner({}, pct_list=pct_list)
+    assert placement.PlacementEngine(runner=runner).used_ids() == {100, 105}
+    assert runner.commands[-1] == ["pct", "list"]
+
+def test_used_ids_without_pvesh_or_pct():
+    assert placement.PlacementEngine(runner=FakeRunner({})).used_ids() == set()
@@ -0,0 +1,18 @@
+"""Calibração do planejador a partir do histórico de migrações"""
+from utils import planner
+
+MB = 1024 ** 2
+
+def entry(engine, target, speed, codec="gzip"):
+    return {"engine": engine, "codec": codec, "target": target, "destination": "pve1",
+            "transferred_bytes": speed * 10, "transfer_seconds": 10, "source_bytes": speed * 30}
+
+def test_link_speed_uses_only_full_tar_migrations():
+    history = [entry("tar", "10.0.0.5", 50 * MB), entry("tar", "10.0.0.5", 60 * MB),
+               entry("zfs", "10.0.0.5", 5000 * MB), entry("tar-incremental", "10.0.0.5", 2 * MB)]
+    assert planner.calibrate(history, "pve1", "10.0.0.5")["link_speed"] == 55 * MB
+
+def test_link_speed_falls_back_to_other_sources_then_default():
+    history = [entry("tar", "10.0.0.9", 40 * MB), entry("zfs", "10.0.0.5", 5000 * MB)]
+    assert planner.calibrate(history, "pve1", "10.0.0.5")["link_speed"] == 40 * MB
+    assert planner.calibrate([entry("zfs", "10.0.0.5", 5000 * MB)], "pve1")["link_speed"] == planner.DEFAULT_LINK_SPEED
@@ -0,0 +1,28 @@
+"""cProfile do --profile-python cobrindo as threads criadas na execução"""
+import json
+import pstats
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.profiler import Tracer
+
+def only_in_workers():
+    return sum(i * i for i in range(10000))
+
+def test_python_profile_includes_worker_threads(tmp_path):
+    tracer = Tracer()
+    tracer.enable(python_profile=True)
+    try:
+        thread = threading.Thread(target=only_in_workers)
+        thread.start()
+        thread.join()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(lambda _: only_in_workers(), range(4)))
+    finally:
+        path = tracer.write(tmp_path / "lincon.trace.json")
+
+    profile = json.loads(path.read_text())["pythonProfile"]
+    stats = pstats.Stats(profile["file"])
+    assert any(function == "only_in_workers" for _, _, function in stats.stats)
+    assert "only_in_workers" in profile["top"]
+    assert threading.getprofile() is None
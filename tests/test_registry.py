@@ -0,0 +1,167 @@
+"""Push em chunks contra um registry HTTP simulado (http.server local)"""
+import hashlib
+import json
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import registry
+from utils.exceptions import MigrationError
+
+REPOSITORY = "lab/app"
+
+class FakeRegistry(ThreadingHTTPServer):
+    """Blobs, uploads e manifestos em memória; pode derrubar PATCHs"""
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RegistryHandler)
+        self.blobs = {}
+        self.uploads = {}
+        self.manifests = {}
+        self.requests = []
+        self.fail_patches = set()
+        self.patches = 0
+
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.server_address[1]}"
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, headers=None, body=b""):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def route(self):
+        self.server.requests.append((self.command, self.path.split("?")[0]))
+        path, _, query = self.path.partition("?")
+        prefix = f"/v2/{REPOSITORY}"
+        if not path.startswith(prefix):
+            return self.reply(404)
+        path = path[len(prefix):]
+        upload = re.fullmatch(r"/blobs/uploads/(\w+)", path)
+        return path, query, upload.group(1) if upload else None
+
+    def do_HEAD(self):
+        path, _, _ = self.route()
+        digest = path.rsplit("/", 1)[-1]
+        self.reply(200 if digest in self.server.blobs else 404)
+
+    def do_POST(self):
+        self.route()
+        upload = uuid.uuid4().hex
+        self.server.uploads[upload] = b""
+        self.reply(202, {"Location": f"/v2/{REPOSITORY}/blobs/uploads/{upload}"})
+
+    def do_GET(self):
+        _, _, upload = self.route()
+        if upload not in self.server.uploads:
+            return self.reply(404)
+        # Como o distribution: o fim do Range é inclusivo
+        self.reply(204, {"Range": f"0-{max(len(self.server.uploads[upload]) - 1, 0)}"})
+
+    def do_PATCH(self):
+        _, _, upload = self.route()
+        data = self.body()
+        self.server.patches += 1
+        if self.server.patches in self.server.fail_patches:
+            return self.reply(500)
+        start = int(self.headers["Content-Range"].split("-")[0])
+        if start != len(self.server.uploads[upload]):
+            return self.reply(416)
+        self.server.uploads[upload] += data
+        self.reply(202, {"Location": f"/v2/{REPOSITORY}/blobs/uploads/{upload}"})
+
+    def do_PUT(self):
+        path, query, upload = self.route()
+        if upload:
+            data = self.server.uploads.pop(upload)
+            digest = query.split("digest=")[1].replace("%3A", ":")
+            if digest != "sha256:" + hashlib.sha256(data).hexdigest():
+                return self.reply(400)
+            self.server.blobs[digest] = data
+            return self.reply(201)
+        self.server.manifests[path.rsplit("/", 1)[-1]] = json.loads(self.body())
+        self.reply(201)
+
+@pytest.fixture
+def fake_registry(monkeypatch, tmp_path):
+    server = FakeRegistry()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    monkeypatch.setattr(registry, "_uploads_dir", lambda: tmp_path)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def blob(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return {"path": path, "digest": "sha256:" + hashlib.sha256(content).hexdigest(), "size": len(content)}
+
+def client(server):
+    return registry.RegistryClient(server.address, REPOSITORY, insecure=True)
+
+def test_upload_in_chunks(fake_registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, "CHUNK_SIZE", 4)
+    layer = blob(tmp_path, "layer", b"0123456789")
+    sent = client(fake_registry).upload_blob(layer["path"], layer["digest"], tmp_path / "progress.json")
+
+    assert sent == 10
+    assert fake_registry.blobs[layer["digest"]] == b"0123456789"
+    assert [method for method, _ in fake_registry.requests].count("PATCH") == 3
+    assert not (tmp_path / "progress.json").exists()
+
+def test_resume_after_interrupted_upload(fake_registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, "CHUNK_SIZE", 1)
+    layer = blob(tmp_path, "layer", b"abcde")
+    progress = tmp_path / "progress.json"
+    # Só o byte 0 chega antes da queda: o registry responde Range "0-0"
+    fake_registry.fail_patches = {2}
+    with pytest.raises(MigrationError):
+        client(fake_registry).upload_blob(layer["path"], layer["digest"], progress)
+    assert json.loads(progress.read_text())["offset"] == 1
+
+    sent = client(fake_registry).upload_blob(layer["path"], layer["digest"], progress)
+    assert sent == 4
+    assert fake_registry.blobs[layer["digest"]] == b"abcde"
+    assert [method for method, _ in fake_registry.requests].count("POST") == 1
+
+def test_resume_with_offset_refused_restarts(fake_registry, tmp_path):
+    layer = blob(tmp_path, "layer", b"abcde")
+    progress = tmp_path / "progress.json"
+    # Upload aberto sem nenhum byte: o distribution também responde "0-0"
+    fake_registry.uploads["empty"] = b""
+    location = f"http://{fake_registry.address}/v2/{REPOSITORY}/blobs/uploads/empty"
+    progress.write_text(json.dumps({"location": location, "offset": 0}))
+
+    sent = client(fake_registry).upload_blob(layer["path"], layer["digest"], progress)
+    assert sent == 5
+    assert fake_registry.blobs[layer["digest"]] == b"abcde"
+
+def test_push_skips_existing_blobs(fake_registry, tmp_path, monkeypatch):
+    config = blob(tmp_path, "config", b'{"architecture": "amd64"}')
+    layers = [blob(tmp_path, "base", b"base layer"), blob(tmp_path, "app", b"app layer")]
+    fake_registry.blobs[layers[0]["digest"]] = b"base layer"
+    monkeypatch.setattr(registry, "export_image", lambda image, work_dir: (config, layers))
+
+    metrics = registry.push_image("app:1", f"{fake_registry.address}/{REPOSITORY}:1",
+                                  insecure=True, work_dir=tmp_path / "work")
+
+    assert metrics["skipped_blobs"] == 1
+    assert metrics["pushed_bytes"] == config["size"] + layers[1]["size"]
+    assert [method for method, _ in fake_registry.requests].count("POST") == 2
+    manifest = fake_registry.manifests["1"]
+    assert [layer["digest"] for layer in manifest["layers"]] == [layer["digest"] for layer in layers]
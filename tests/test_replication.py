@@ -0,0 +1,121 @@
+"""Replicação send/receive com pools em arquivo (precisa de root e zfs/btrfs)"""
+import os
+import shutil
+import subprocess
+import uuid
+
+import pytest
+
+from utils import replication
+
+# Origem "remota": os comandos rodam no shell local, como o sshd faria
+LOCAL_SHELL = ["sh", "-c", 'eval "$*"', "sh"]
+
+needs_root = pytest.mark.skipif(os.geteuid() != 0, reason="precisa de root")
+
+def run(*command):
+    subprocess.run(command, check=True, capture_output=True)
+
+@pytest.fixture
+def zfs_pools(tmp_path):
+    if not shutil.which("zpool"):
+        pytest.skip("zfs indisponível")
+    suffix = uuid.uuid4().hex[:6]
+    pools = [f"lincon_src_{suffix}", f"lincon_dst_{suffix}"]
+    for pool in pools:
+        image = tmp_path / f"{pool}.img"
+        run("truncate", "-s", "128M", str(image))
+        run("zpool", "create", "-m", str(tmp_path / pool), pool, str(image))
+    run("zfs", "create", f"{pools[0]}/root")
+    yield pools, tmp_path
+    for pool in pools:
+        subprocess.run(["zpool", "destroy", "-f", pool], capture_output=True)
+
+@pytest.fixture
+def btrfs_mounts(tmp_path):
+    if not shutil.which("mkfs.btrfs"):
+        pytest.skip("btrfs-progs indisponível")
+    mounts = []
+    for name in ("src", "dst"):
+        image, mount = tmp_path / f"{name}.img", tmp_path / name
+        run("truncate", "-s", "256M", str(image))
+        run("mkfs.btrfs", "-q", str(image))
+        mount.mkdir()
+        run("mount", "-o", "loop", str(image), str(mount))
+        mounts.append(mount)
+    run("btrfs", "subvolume", "create", str(mounts[0] / "root"))
+    yield mounts
+    for mount in mounts:
+        subprocess.run(["umount", str(mount)], capture_output=True)
+
+@needs_root
+def test_zfs_full_then_incremental(zfs_pools):
+    (source, target), base = zfs_pools
+    engine = {"fs": "zfs", "source": f"{source}/root", "pool": target}
+    (base / source / "root" / "etc").mkdir()
+    (base / source / "root" / "etc" / "hostname").write_text("web\n")
+
+    volume, previous = replication._replicate_zfs(LOCAL_SHELL, engine, "9001", "lincon-1", None)
+    assert volume == "subvol-9001-disk-0" and previous is None
+    received = base / target / volume
+    assert (received / "etc" / "hostname").read_text() == "web\n"
+
+    (base / source / "root" / "etc" / "hostname").write_text("web2\n")
+    volume, previous = replication._replicate_zfs(LOCAL_SHELL, engine, "9001", "lincon-2", "lincon-1")
+    assert previous == "lincon-1"
+    assert (received / "etc" / "hostname").read_text() == "web2\n"
+
+@needs_root
+def test_btrfs_full_then_incremental(btrfs_mounts):
+    source, target = btrfs_mounts
+    engine = {"fs": "btrfs", "source": "root", "root": str(source / "root"), "path": str(target)}
+    (source / "root" / "hostname").write_text("web\n")
+
+    volume, previous = replication._replicate_btrfs(LOCAL_SHELL, engine, "9001", "lincon-1", None)
+    assert previous is None
+    images = target / "images" / "9001"
+    assert (target / "images" / volume / "hostname").read_text() == "web\n"
+    assert (images / ".lincon-1").exists()
+
+    (source / "root" / "hostname").write_text("web2\n")
+    volume, previous = replication._replicate_btrfs(LOCAL_SHELL, engine, "9001", "lincon-2", "lincon-1")
+    assert previous == "lincon-1"
+    assert (target / "images" / volume / "hostname").read_text() == "web2\n"
+    # A base antiga é descartada; a nova fica para o próximo incremental
+    assert not (images / ".lincon-1").exists() and (images / ".lincon-2").exists()
+
+def test_failed_replication_returns_false(tmp_path, monkeypatch):
+    # Falha no snapshot da origem não derruba a migração: o chamador segue pelo tar
+    monkeypatch.setattr(replication, "_state_file", lambda ct_id: tmp_path / f"{ct_id}.json")
+    data = {"id": "9002", "name": "web", "target": "10.0.0.5", "rootsize": "8"}
+    engine = {"fs": "zfs", "source": "rpool/ROOT/none", "pool": "lincon_missing"}
+    assert replication.replicate(data, ["sh", "-c", "exit 1", "sh"], engine) is False
+
+def fake_shell(output):
+    """Shell "remoto" que ignora o comando e imprime `output`"""
+    return ["sh", "-c", f"printf '{output}'", "sh"]
+
+def test_nested_volumes_lists_children_only():
+    shell = fake_shell("rpool/ROOT/debian\\nrpool/ROOT/debian/var\\n")
+    assert replication.nested_volumes(shell, "zfs", "rpool/ROOT/debian") == ["rpool/ROOT/debian/var"]
+    shell = fake_shell("ID 257 gen 9 top level 5 path @/.lincon-20250101000000\\n"
+                       "ID 258 gen 9 top level 5 path @/var/lib/machines\\n")
+    assert replication.nested_volumes(shell, "btrfs", "@") == ["@/var/lib/machines"]
+    assert replication.nested_volumes(["sh", "-c", "exit 1", "sh"], "zfs", "rpool") is None
+
+def test_is_replica_requires_matching_source_and_target(tmp_path, monkeypatch):
+    monkeypatch.setattr(replication, "_state_file", lambda ct_id: tmp_path / f"{ct_id}.json")
+    engine = {"fs": "zfs", "source": "rpool/ROOT/debian", "pool": "tank"}
+    data = {"id": "9003", "target": "10.0.0.5"}
+    assert not replication.is_replica(data, engine)
+    replication.save_replication_state("9003", {"fs": "zfs", "snapshot": "lincon-1",
+                                                "source": "rpool/ROOT/debian", "target": "10.0.0.6"})
+    assert not replication.is_replica(data, engine)
+    assert replication.is_replica(dict(data, target="10.0.0.6"), engine)
+
+@needs_root
+def test_zfs_child_datasets_are_detected(zfs_pools):
+    (source, _), _ = zfs_pools
+    assert replication.nested_volumes(LOCAL_SHELL, "zfs", f"{source}/root") == []
+    run("zfs", "create", f"{source}/root/var")
+    assert replication.nested_volumes(LOCAL_SHELL, "zfs", f"{source}/root") == [f"{source}/root/var"]
@@ -0,0 +1,334 @@
+import json
+import shlex
+import struct
+import subprocess
+import zlib
+import logging
+
+from utils.profiler import tracer
+
+logger = logging.getLogger('lincon')
+
+# Agente executado na origem com `python3 - <args>` (script pelo stdin).
+# Gera um tar em frames: cada frame é cru ('R') ou deflate ('Z'), e o
+# último ('E') traz as estatísticas em JSON. Compatível com Python 3.5+.
+REMOTE_AGENT = r'''
+import fnmatch, json, os, struct, sys, tarfile, time, zlib
+
+FRAME_SIZE = 256 * 1024
+SAMPLE_EVERY = 16
+ENTROPY_SAMPLE = 64 * 1024
+ENTROPY_MIN_SIZE = 128 * 1024
+INCOMPRESSIBLE_RATIO = 0.9
+RETUNE_EVERY = 32
+
+SKIP_EXTENSIONS = {
+    ".gz", ".tgz", ".xz", ".txz", ".zst", ".bz2", ".tbz2", ".lz4", ".lzma", ".br",
+    ".zip", ".jar", ".war", ".ear", ".whl", ".apk", ".deb", ".rpm", ".7z", ".rar",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".heic", ".avif",
+    ".mp3", ".mp4", ".m4a", ".mkv", ".avi", ".mov", ".webm", ".ogg", ".flac", ".opus",
+    ".woff", ".woff2", ".squashfs",
+}
+MAGIC = (
+    b"\x1f\x8b", b"\x28\xb5\x2f\xfd", b"\xfd7zXZ\x00", b"BZh", b"PK\x03\x04",
+    b"\x89PNG", b"\xff\xd8\xff", b"7z\xbc\xaf", b"Rar!", b"\x04\x22\x4d\x18",
+)
+
+class FrameWriter:
+    def __init__(self, out, level):
+        self.out = out
+        self.level = level
+        self.compress = True
+        self.buffer = bytearray()
+        self.frames = 0
+        self.stats = {
+            "raw_in": 0, "stored_raw": 0, "compressed_in": 0, "compressed_out": 0,
+            "compress_cpu": 0.0, "write_wait": 0.0, "level_changes": [],
+            "sample_in": 0, "sample_out": 0, "sample_cpu": 0.0,
+        }
+        self.window_cpu = 0.0
+        self.window_wait = 0.0
+
+    def set_compress(self, compress):
+        if compress != self.compress:
+            self.flush()
+            self.compress = compress
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= FRAME_SIZE:
+            self.flush()
+        return len(data)
+
+    def _emit(self, kind, payload):
+        started = time.perf_counter()
+        self.out.write(kind + struct.pack(">I", len(payload)))
+        self.out.write(payload)
+        waited = time.perf_counter() - started
+        self.stats["write_wait"] += waited
+        self.window_wait += waited
+
+    def flush(self):
+        if not self.buffer:
+            return
+        data = bytes(self.buffer)
+        self.buffer = bytearray()
+        self.frames += 1
+        self.stats["raw_in"] += len(data)
+
+        if self.frames % SAMPLE_EVERY == 0:
+            # Amostra do baseline: quanto custaria o gzip -6 fixo neste frame
+            started = time.process_time()
+            sample = zlib.compress(data, 6)
+            self.stats["sample_cpu"] += time.process_time() - started
+            self.stats["sample_in"] += len(data)
+            self.stats["sample_out"] += len(sample)
+
+        if self.compress:
+            started = time.process_time()
+            payload = zlib.compress(data, self.level)
+            spent = time.process_time() - started
+            self.stats["compress_cpu"] += spent
+            self.window_cpu += spent
+            if len(payload) < len(data):
+                self.stats["compressed_in"] += len(data)
+                self.stats["compressed_out"] += len(payload)
+                self._emit(b"Z", payload)
+            else:
+                self.stats["stored_raw"] += len(data)
+                self._emit(b"R", data)
+        else:
+            self.stats["stored_raw"] += len(data)
+            self._emit(b"R", data)
+
+        if self.frames % RETUNE_EVERY == 0:
+            self.retune()
+
+    def retune(self):
+        # Bloqueado na escrita: a rede é o gargalo, vale comprimir mais.
+        # Gastando mais CPU que esperando: a CPU é o gargalo, comprimir menos.
+        level = self.level
+        if self.window_wait > 2 * self.window_cpu and level < 9:
+            level += 1
+        elif self.window_cpu > 2 * self.window_wait and level > 1:
+            level -= 1
+        if level != self.level:
+            self.stats["level_changes"].append([self.stats["raw_in"], level])
+            self.level = level
+        self.window_cpu = self.window_wait = 0.0
+
+    def close(self):
+        self.flush()
+        self.stats["final_level"] = self.level
+        self._emit(b"E", json.dumps(self.stats).encode())
+        self.out.flush()
+
+class Padded(object):
+    """Entrega exatamente `size` bytes do arquivo, como o GNU tar
+
+    O cabeçalho do membro já foi escrito com o tamanho do stat; se o arquivo
+    encolheu (log rotacionado) ou a leitura falhou no meio, o restante é
+    preenchido com zeros para o stream não perder o alinhamento.
+    """
+    def __init__(self, f, path, size):
+        self.f = f
+        self.path = path
+        self.remaining = size
+
+    def read(self, size):
+        size = min(size, self.remaining)
+        data = b""
+        if self.f is not None:
+            try:
+                data = self.f.read(size)
+            except OSError as e:
+                sys.stderr.write("lincon: erro lendo {}: {}\n".format(self.path, e))
+            if len(data) < size:
+                sys.stderr.write("lincon: {} encolheu, completando com zeros\n".format(self.path))
+                self.f = None
+        data += b"\0" * (size - len(data))
+        self.remaining -= size
+        return data
+
+def incompressible(path, size):
+    if os.path.splitext(path)[1].lower() in SKIP_EXTENSIONS:
+        return True
+    try:
+        with open(path, "rb") as f:
+            head = f.read(8)
+            if head.startswith(MAGIC):
+                return True
+            if size < ENTROPY_MIN_SIZE:
+                return False
+            # Estimativa de entropia: deflate rápido de um trecho do meio
+            f.seek(size // 2)
+            sample = f.read(ENTROPY_SAMPLE)
+    except OSError:
+        return False
+    return len(zlib.compress(sample, 1)) > INCOMPRESSIBLE_RATIO * len(sample)
+
+def excluded(path, excludes):
+    return any(fnmatch.fnmatch(path, pattern) for pattern in excludes)
+
+def walk(root, excludes):
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        yield path
+        if os.path.isdir(path) and not os.path.islink(path):
+            try:
+                names = sorted(os.listdir(path), reverse=True)
+            except OSError:
+                continue
+            for name in names:
+                child = os.path.join(path, name)
+                if not excluded("/" + os.path.relpath(child, "/"), excludes):
+                    stack.append(child)
+
+def main():
+    args = sys.argv[1:]
+    level = int(args.pop(0))
+    excludes = []
+    while args and args[0] == "--exclude":
+        args.pop(0)
+        excludes.append(args.pop(0))
+    os.chdir("/")
+
+    writer = FrameWriter(sys.stdout.buffer, level)
+    with tarfile.open(fileobj=writer, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+        for root in args:
+            for path in walk(root, excludes):
+                try:
+                    info = tar.gettarinfo(path, path)
+                except OSError:
+                    continue
+                if info is None:
+                    continue
+                info.uname = info.gname = ""
+                if info.isreg():
+                    writer.set_compress(not incompressible(path, info.size))
+                    try:
+                        f = open(path, "rb")
+                    except OSError as e:
+                        sys.stderr.write("lincon: ignorando {}: {}\n".format(path, e))
+                        continue
+                    with f:
+                        tar.addfile(info, Padded(f, path, info.size))
+                else:
+                    writer.set_compress(True)
+                    tar.addfile(info)
+    writer.close()
+
+main()
+'''
+
+DEFAULT_LEVEL = 6
+
+# Campos somados quando várias coletas (ex.: subárvores) compõem uma migração
+_SUMMED = (
+    "raw_in", "stored_raw", "compressed_in", "compressed_out", "compress_cpu",
+    "write_wait", "sample_in", "sample_out", "sample_cpu",
+)
+
+def has_python(ssh_command):
+    """Verifica se a origem tem python3 (>= 3.5) para executar o agente"""
+    check = "python3 -c 'import sys; sys.exit(sys.version_info < (3, 5))'"
+    return subprocess.run(ssh_command + [check], capture_output=True).returncode == 0
+
+def collect(ssh_command, excluded_paths, paths=(".",), level=DEFAULT_LEVEL):
+    """Inicia o agente adaptativo na origem; o stdout deve ir para `decode`"""
+    command = ssh_command + ["python3", "-", str(level)]
+    for path in excluded_paths:
+        command.extend(["--exclude", shlex.quote(path)])
+    command.extend(shlex.quote(path) for path in paths)
+
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    process.stdin.write(REMOTE_AGENT.encode())
+    process.stdin.close()
+    return process
+
+def _read_exact(stream, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("Stream adaptativo interrompido")
+        data += chunk
+    return bytes(data)
+
+def decode(stream, out):
+    """Converte os frames do agente em um tar comum gravado em `out`
+
+    Retorna as estatísticas enviadas pelo agente no frame final.
+    """
+    while True:
+        header = _read_exact(stream, 5)
+        kind, length = header[:1], struct.unpack(">I", header[1:])[0]
+        payload = _read_exact(stream, length)
+
+        if kind == b"R":
+            out.write(payload)
+        elif kind == b"Z":
+            out.write(zlib.decompress(payload))
+        elif kind == b"E":
+            return json.loads(payload)
+        else:
+            raise ValueError(f"Frame desconhecido no stream adaptativo: {kind!r}")
+
+def collect_to_file(ssh_command, excluded_paths, out, paths=(".",)):
+    """Coleta com o agente adaptativo gravando um tar sem compressão em `out`
+
+    Retorna as estatísticas do agente, ou None se a coleta falhou.
+    """
+    process = tracer.watch(collect(list(ssh_command), excluded_paths, paths), "collect_fs")
+    try:
+        with tracer.span("decode_frames") as span:
+            stats = decode(process.stdout, out)
+            span.set(bytes=stats["raw_in"])
+    except (EOFError, ValueError, zlib.error, OSError) as e:
+        # OSError: `out` fechado do outro lado (extração direta interrompida)
+        logger.error(f"Coleta adaptativa falhou: {e}")
+        process.kill()
+        process.wait()
+        return None
+    if process.wait() != 0:
+        return None
+    return stats
+
+def report(stats_list):
+    """Compara o resultado com o baseline de gzip -6 fixo (estimado por amostragem)"""
+    stats = {field: sum(s[field] for s in stats_list) for field in _SUMMED}
+    raw = stats["raw_in"] or 1
+    sent = stats["stored_raw"] + stats["compressed_out"]
+    result = {
+        "raw_bytes": stats["raw_in"],
+        "sent_bytes": sent,
+        "ratio": round(sent / raw, 3),
+        "stored_raw_fraction": round(stats["stored_raw"] / raw, 3),
+        "compress_cpu_seconds": round(stats["compress_cpu"], 2),
+        "final_levels": [s.get("final_level") for s in stats_list],
+        "level_changes": sum(len(s["level_changes"]) for s in stats_list),
+    }
+    if stats["sample_in"]:
+        scale = stats["raw_in"] / stats["sample_in"]
+        baseline_cpu = stats["sample_cpu"] * scale
+        result.update(
+            baseline_ratio=round(stats["sample_out"] / stats["sample_in"], 3),
+            baseline_cpu_seconds=round(baseline_cpu, 2),
+            cpu_saved_seconds=round(baseline_cpu - stats["compress_cpu"], 2),
+        )
+    return result
+
+def format_report(result):
+    """Resumo de uma linha para exibir ao fim da coleta"""
+    text = (
+        f"{result['raw_bytes'] / 1024 ** 2:.1f} MB lidos, {result['sent_bytes'] / 1024 ** 2:.1f} MB na rede "
+        f"(razão {result['ratio']:.2f}, {result['stored_raw_fraction']:.0%} sem compressão), "
+        f"CPU de compressão {result['compress_cpu_seconds']:.1f}s"
+    )
+    if "baseline_ratio" in result:
+        text += (
+            f"; gzip fixo estimado: razão {result['baseline_ratio']:.2f}, "
+            f"CPU {result['baseline_cpu_seconds']:.1f}s ({result['cpu_saved_seconds']:.1f}s economizados)"
+        )
+    return text
@@ -0,0 +1,228 @@
+"""Canal de dados TCP separado do SSH
+
+O SSH continua fazendo a autenticação e o controle: ele inicia na origem
+um agente que escuta uma porta, aceita só conexões que apresentam um
+token de uso único e envia o stdout do comando remoto (ex.: o tar) por
+uma ou mais conexões TCP, sem a cifra do SSH no caminho dos dados. Para
+redes de migração confiáveis; sem alcance até a porta, `open_channel`
+retorna None e o chamador usa o SSH.
+"""
+import shlex
+import select
+import secrets
+import socket
+import struct
+import subprocess
+import time
+import logging
+
+from utils.profiler import tracer
+
+logger = logging.getLogger('lincon')
+
+# Buffers grandes para a janela TCP não limitar links de 10G+ com RTT alto
+SOCKET_BUFFER = 8 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+CONNECT_TIMEOUT = 10
+IO_TIMEOUT = 300
+
+# Cifras AEAD rápidas (AES-NI / ChaCha20) para o SSH quando o canal TCP não é usado
+FAST_CIPHERS = "aes128-gcm@openssh.com,aes256-gcm@openssh.com,chacha20-poly1305@openssh.com"
+
+FRAME = struct.Struct(">I")
+
+# Agente executado na origem com `python3 - <comando> <porta>` (script pelo
+# stdin, então o token não aparece no `ps`). Os blocos do stdout do comando
+# vão em rodízio pelas conexões, cada um com o tamanho na frente; um bloco
+# vazio em cada conexão marca o fim. Compatível com Python 3.5+.
+REMOTE_AGENT = r'''
+import hmac, socket, struct, subprocess, sys
+
+TOKEN = b"%(token)s"
+STREAMS = %(streams)d
+CHUNK_SIZE = %(chunk)d
+SOCKET_BUFFER = %(buffer)d
+ACCEPT_TIMEOUT = %(accept_timeout)d
+
+def read_token(conn):
+    data = b""
+    while len(data) < len(TOKEN):
+        part = conn.recv(len(TOKEN) - len(data))
+        if not part:
+            break
+        data += part
+    return hmac.compare_digest(data, TOKEN)
+
+def main():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER)
+    server.bind(("", int(sys.argv[2])))
+    server.listen(STREAMS)
+    server.settimeout(ACCEPT_TIMEOUT)
+    sys.stdout.write("PORT %%d\n" %% server.getsockname()[1])
+    sys.stdout.flush()
+
+    conns = []
+    try:
+        while len(conns) < STREAMS:
+            conn, _ = server.accept()
+            conn.settimeout(ACCEPT_TIMEOUT)
+            if read_token(conn):
+                conn.settimeout(None)
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                conns.append(conn)
+            else:
+                conn.close()
+    except socket.timeout:
+        sys.exit(3)
+    server.close()
+
+    process = subprocess.Popen(sys.argv[1], shell=True, cwd="/", stdout=subprocess.PIPE)
+    sequence = 0
+    while True:
+        data = process.stdout.read(CHUNK_SIZE)
+        if not data:
+            break
+        conn = conns[sequence %% STREAMS]
+        conn.sendall(struct.pack(">I", len(data)))
+        conn.sendall(data)
+        sequence += 1
+    for conn in conns:
+        try:
+            conn.sendall(struct.pack(">I", 0))
+            conn.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        conn.close()
+    sys.exit(process.wait())
+
+main()
+'''
+
+def fast_ssh_command(ssh_command):
+    """Mesmo comando SSH restrito a cifras AEAD rápidas e sem compressão"""
+    index = ssh_command.index("ssh") + 1
+    return ssh_command[:index] + ["-c", FAST_CIPHERS, "-o", "Compression=no"] + ssh_command[index:]
+
+def _read_line(stream, timeout):
+    """Primeira linha do agente, ou None se ele não responder a tempo"""
+    ready, _, _ = select.select([stream], [], [], timeout)
+    return stream.readline().decode(errors="replace").strip() if ready else None
+
+def _connect(host, port, token):
+    family, kind, proto, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+    sock = socket.socket(family, kind, proto)
+    try:
+        # Antes do connect, para valer na negociação da janela
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER)
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(address)
+        sock.sendall(token)
+        sock.settimeout(IO_TIMEOUT)
+        return sock
+    except OSError:
+        sock.close()
+        raise
+
+class DataChannel:
+    """Conexões abertas com o agente; `receive` grava o stream em um arquivo"""
+
+    def __init__(self, process, sockets):
+        self.process = process
+        self.sockets = sockets
+
+    def _read_exact(self, sock, view):
+        received = 0
+        while received < len(view):
+            count = sock.recv_into(view[received:])
+            if not count:
+                raise EOFError("Canal de dados fechado antes do fim")
+            received += count
+
+    def receive(self, out):
+        """Grava o stream em `out` na ordem de envio
+
+        Os blocos chegam em rodízio, então a conexão de cada bloco é
+        conhecida e a leitura em sequência basta (o kernel continua
+        recebendo nas outras enquanto isso). Retorna as estatísticas, ou
+        None se a transferência ou o comando remoto falhou.
+        """
+        header = bytearray(FRAME.size)
+        buffer = memoryview(bytearray(CHUNK_SIZE))
+        received = 0
+        sequence = 0
+        started = time.monotonic()
+        try:
+            with tracer.span("data_channel", streams=len(self.sockets)) as span:
+                while True:
+                    sock = self.sockets[sequence % len(self.sockets)]
+                    self._read_exact(sock, memoryview(header))
+                    length, = FRAME.unpack(header)
+                    if not length:
+                        # Fim: as outras conexões também têm o bloco vazio
+                        for other in self.sockets:
+                            if other is not sock:
+                                self._read_exact(other, memoryview(header))
+                        break
+                    self._read_exact(sock, buffer[:length])
+                    out.write(buffer[:length])
+                    received += length
+                    sequence += 1
+                span.set(bytes=received)
+        except (OSError, EOFError) as e:
+            logger.error(f"Falha no canal de dados: {e}")
+            self.process.kill()
+            return None
+        finally:
+            for sock in self.sockets:
+                sock.close()
+
+        code = self.process.wait()
+        if code != 0:
+            logger.error(f"Comando remoto do canal de dados terminou com código {code}")
+            return None
+        seconds = time.monotonic() - started
+        return {
+            "bytes": received,
+            "seconds": round(seconds, 2),
+            "streams": len(self.sockets),
+            "mbps": round(received * 8 / 1e6 / seconds, 1) if seconds else 0,
+        }
+
+def open_channel(ssh_command, remote_command, host, streams=1, port=0):
+    """Inicia o agente na origem e conecta `streams` sockets a ele
+
+    `port` 0 deixa a origem escolher uma porta livre. Retorna None (sem
+    nada em execução) se a origem não tem python3 ou a porta não é
+    alcançável; o chamador deve então coletar pelo SSH.
+    """
+    token = secrets.token_hex(16)
+    script = REMOTE_AGENT % {
+        "token": token, "streams": streams, "chunk": CHUNK_SIZE,
+        "buffer": SOCKET_BUFFER, "accept_timeout": CONNECT_TIMEOUT * 3,
+    }
+    command = ssh_command + ["python3", "-", shlex.quote(remote_command), str(port)]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    process.stdin.write(script.encode())
+    process.stdin.close()
+
+    line = _read_line(process.stdout, CONNECT_TIMEOUT * 3)
+    if not line or not line.startswith("PORT "):
+        logger.info("Agente do canal de dados não iniciou na origem, usando SSH")
+        process.kill()
+        process.wait()
+        return None
+
+    sockets = []
+    try:
+        for _ in range(streams):
+            sockets.append(_connect(host, int(line.split()[1]), token.encode()))
+    except OSError as e:
+        logger.info(f"Porta do canal de dados inalcançável ({e}), usando SSH")
+        for sock in sockets:
+            sock.close()
+        process.kill()
+        process.wait()
+        return None
+    return DataChannel(tracer.watch(process, "data_channel_agent"), sockets)
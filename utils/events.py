@@ -0,0 +1,89 @@
+import contextvars
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Destino dos eventos da migração corrente (None: saída no console rich).
+# Por ser um contextvar, cada migração da API, em thread ou task própria,
+# tem o seu sink.
+_sink = contextvars.ContextVar("lincon_event_sink", default=None)
+_migration_id = contextvars.ContextVar("lincon_migration_id", default=None)
+
+# Mensagens que marcam o início de uma etapa da migração
+STAGES = {
+    "MSG_COLLECTING_FS": "collect",
+    "MSG_NATIVE_REPLICATION": "replicate",
+    "MSG_PARALLEL_EXTRACTION": "collect",
+    "MSG_PACKAGE_ANALYSIS": "collect",
+    "MSG_EXPORTING_CONTAINER": "collect",
+    "MSG_CREATING_CT": "create",
+    "MSG_STARTING_CT": "start",
+    "MSG_CREATING_DOCKER_IMAGE": "build",
+    "MSG_PUSHING_IMAGE": "push",
+    "MSG_VALIDATING": "validate",
+}
+
+# Título das mensagens -> nível do evento
+LEVELS = {
+    "TITLE_ERROR": "error",
+    "TITLE_WARNING": "warning",
+    "TITLE_SUCCESS": "success",
+    "TITLE_INFO": "info",
+}
+
+@contextmanager
+def use_sink(sink, migration_id=None):
+    """Envia para `sink` os eventos emitidos dentro do bloco"""
+    sink_token = _sink.set(sink)
+    id_token = _migration_id.set(migration_id)
+    try:
+        yield
+    finally:
+        _sink.reset(sink_token)
+        _migration_id.reset(id_token)
+
+def active():
+    return _sink.get() is not None
+
+def emit(event_type, **fields):
+    """Entrega um evento ao sink corrente
+
+    Retorna False quando não há sink, para o chamador usar o console.
+    """
+    sink = _sink.get()
+    if sink is None:
+        return False
+    event = {"type": event_type, "time": time.time(), "migration_id": _migration_id.get()}
+    event.update(fields)
+    sink(event)
+    return True
+
+def emit_message(title, message, text):
+    """Converte uma mensagem do `display_message` em evento de etapa ou mensagem"""
+    if message in STAGES:
+        return emit("stage", stage=STAGES[message], key=message, text=text)
+    return emit("message", level=LEVELS.get(title, "info"), key=message, text=text)
+
+class JsonLinesSink:
+    """Escreve cada evento como uma linha JSON (stdout por padrão)"""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event, default=str)
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+class ListSink:
+    """Guarda os eventos em memória (útil para orquestradores e depuração)"""
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def __call__(self, event):
+        with self.lock:
+            self.events.append(event)
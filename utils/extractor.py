@@ -0,0 +1,426 @@
+import errno
+import gzip
+import io
+import os
+import stat
+import threading
+import contextvars
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.exceptions import MigrationError
+
+logger = logging.getLogger('lincon')
+
+DEFAULT_WORKERS = 8
+
+# Arquivos maiores que isso são gravados direto pela thread que lê o stream:
+# o custo deles é de banda, não de metadados
+INLINE_THRESHOLD = 1024 * 1024
+
+# Entradas aguardando um worker (limita a memória com arquivos em buffer)
+MAX_PENDING = 1024
+
+CHUNK_SIZE = 1024 * 1024
+
+# Leituras grandes do stream: com blocos pequenos a thread que decodifica
+# disputa o GIL com os workers a cada leitura
+STREAM_BUFFER = 4 * 1024 * 1024
+
+BLOCK = 512
+
+# O_NOFOLLOW: um symlink já existente no caminho nunca é seguido
+WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW | os.O_CLOEXEC
+
+# Tipos de entrada do tar (ustar/GNU/pax)
+REGULAR = {b"0", b"\0", b"7"}
+HARDLINK = b"1"
+SYMLINK = b"2"
+CHARDEV = b"3"
+BLOCKDEV = b"4"
+DIRECTORY = b"5"
+FIFO = b"6"
+GNU_LONGNAME = b"L"
+GNU_LONGLINK = b"K"
+GNU_SPARSE = b"S"
+PAX_HEADER = b"x"
+
+class Member:
+    """Entrada do tar já decodificada"""
+    __slots__ = ("name", "type", "mode", "uid", "gid", "size", "mtime",
+                 "linkname", "devmajor", "devminor", "xattrs")
+
+    def isdir(self):
+        return self.type == DIRECTORY
+
+    def isreg(self):
+        return self.type in REGULAR
+
+    def issym(self):
+        return self.type == SYMLINK
+
+    def islnk(self):
+        return self.type == HARDLINK
+
+    def isspecial(self):
+        return self.type in (CHARDEV, BLOCKDEV, FIFO)
+
+def _number(field):
+    """Número de um campo do cabeçalho: octal em ASCII ou base-256 (GNU)"""
+    if field[0] & 0x80:
+        value = int.from_bytes(field[1:], "big")
+        return value - (1 << (8 * len(field) - 8)) if field[0] & 0x40 else value
+    field = field.split(b"\0", 1)[0].strip()
+    return int(field, 8) if field else 0
+
+def _string(field):
+    return field.split(b"\0", 1)[0]
+
+def _pax_records(data):
+    """Registros `tamanho chave=valor\\n` de um cabeçalho pax"""
+    records, position = {}, 0
+    while position < len(data) and data[position:position + 1] != b"\0":
+        space = data.index(b" ", position)
+        length = int(data[position:space])
+        key, _, value = data[space + 1:position + length - 1].partition(b"=")
+        records[key.decode()] = value
+        position += length
+    return records
+
+class _CountingStream(io.RawIOBase):
+    """Conta os bytes lidos do stream original (comprimido ou não)"""
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = self.stream.readinto(buffer)
+        self.count += size or 0
+        return size
+
+class TarReader:
+    """Decodifica um stream tar (puro ou gzip) em uma única passada
+
+    O `tarfile` em modo stream lê blocos de 10 KB e recorta o buffer a cada
+    leitura; aqui os cabeçalhos são decodificados direto de um buffer grande.
+    """
+    def __init__(self, stream):
+        self.source = _CountingStream(stream)
+        stream = io.BufferedReader(self.source, buffer_size=STREAM_BUFFER)
+        if stream.peek(2)[:2] == b"\x1f\x8b":
+            stream = io.BufferedReader(gzip.GzipFile(fileobj=stream), buffer_size=STREAM_BUFFER)
+        self.stream = stream
+        self.unread = 0
+
+    def _read_exact(self, size):
+        data = self.stream.read(size)
+        if len(data) != size:
+            raise MigrationError("Stream tar truncado")
+        return data
+
+    def _skip(self, size):
+        left = size
+        while left:
+            left -= len(self._read_exact(min(left, CHUNK_SIZE)))
+
+    def _take(self, size):
+        """Lê do conteúdo da entrada corrente, descontando do que falta pular"""
+        data = self._read_exact(size)
+        self.unread = max(self.unread - size, 0)
+        return data
+
+    def read_data(self, size):
+        """Lê de uma vez o conteúdo da entrada corrente"""
+        data = self._take(size)
+        padding = -size % BLOCK
+        if padding:
+            self._take(padding)
+        return data
+
+    def copy_data(self, size, out):
+        """Copia em blocos o conteúdo da entrada corrente para `out`
+
+        Se a escrita falhar no meio, `unread` tem exatamente o que resta da
+        entrada e o iterador continua alinhado no próximo cabeçalho.
+        """
+        left = size
+        while left:
+            chunk = self._take(min(left, CHUNK_SIZE))
+            out.write(chunk)
+            left -= len(chunk)
+        padding = -size % BLOCK
+        if padding:
+            self._take(padding)
+
+    def __iter__(self):
+        long_name = long_link = None
+        pax = {}
+        while True:
+            header = self.stream.read(BLOCK)
+            if len(header) < BLOCK or header == bytes(BLOCK):
+                return
+
+            kind = header[156:157]
+            size = int(pax["size"]) if "size" in pax else _number(header[124:136])
+
+            if kind == GNU_LONGNAME:
+                long_name = _string(self.read_data(size))
+                continue
+            if kind == GNU_LONGLINK:
+                long_link = _string(self.read_data(size))
+                continue
+            if kind == PAX_HEADER:
+                pax = _pax_records(self.read_data(size))
+                continue
+            if kind == GNU_SPARSE:
+                raise MigrationError("Arquivos esparsos GNU não são suportados pelo extrator paralelo")
+
+            name = _string(header[0:100])
+            # Prefixo do ustar POSIX (o formato GNU usa esses bytes para outra coisa)
+            if header[257:263] == b"ustar\0" and header[345]:
+                name = _string(header[345:500]) + b"/" + name
+
+            member = Member()
+            member.type = kind
+            member.name = os.fsdecode(pax.get("path") or long_name or name)
+            member.linkname = os.fsdecode(pax.get("linkpath") or long_link or _string(header[157:257]))
+            member.mode = _number(header[100:108]) & 0o7777
+            member.uid = int(pax["uid"]) if "uid" in pax else _number(header[108:116])
+            member.gid = int(pax["gid"]) if "gid" in pax else _number(header[116:124])
+            member.mtime = float(pax["mtime"]) if "mtime" in pax else _number(header[136:148])
+            member.size = size
+            member.devmajor = _number(header[329:337]) if kind in (CHARDEV, BLOCKDEV) else 0
+            member.devminor = _number(header[337:345]) if kind in (CHARDEV, BLOCKDEV) else 0
+            member.xattrs = {
+                key[len("SCHILY.xattr."):]: value for key, value in pax.items()
+                if key.startswith("SCHILY.xattr.")
+            }
+            long_name = long_link = None
+            pax = {}
+
+            # Só arquivos regulares (e tipos desconhecidos) têm conteúdo no
+            # stream; `unread` inclui o preenchimento até o fim do bloco
+            has_data = kind not in (HARDLINK, SYMLINK, DIRECTORY, CHARDEV, BLOCKDEV, FIFO)
+            self.unread = size + (-size % BLOCK) if has_data else 0
+            yield member
+            if self.unread:
+                self._skip(self.unread)
+                self.unread = 0
+
+def _safe_path(root, name):
+    """Caminho de destino de um membro, recusando nomes que saem da raiz"""
+    name = os.path.normpath(name.lstrip("/"))
+    if name == ".":
+        return root
+    if name == ".." or name.startswith("../"):
+        raise ValueError(f"caminho fora da raiz: {name}")
+    return os.path.join(root, name)
+
+class Extractor:
+    """Extrai um stream tar criando as entradas a partir de um pool de threads
+
+    O stream é lido uma única vez, em ordem. Diretórios são criados na hora
+    (antes dos filhos); arquivos pequenos e nós de dispositivo vão para os
+    workers. Symlinks só são criados depois que todos os arquivos foram
+    gravados (nenhuma escrita passa por um link vindo do stream), depois
+    os hardlinks, e por fim os metadados dos diretórios (permissão, dono,
+    mtime), dos mais profundos para a raiz.
+    """
+    def __init__(self, root, workers=DEFAULT_WORKERS):
+        self.root = os.path.abspath(root)
+        self.workers = workers
+        self.set_owner = os.geteuid() == 0
+        self.directories = []
+        self.known_directories = set()
+        self.symlinks = []
+        self.hardlinks = []
+        self.errors = []
+        self.pending = threading.BoundedSemaphore(MAX_PENDING)
+        self.lock = threading.Lock()
+        self.stats = {"files": 0, "directories": 0, "links": 0, "bytes": 0}
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def _fail(self, member, error):
+        with self.lock:
+            self.errors.append(f"{member.name}: {error}")
+
+    def _remove_existing(self, path):
+        try:
+            mode = os.lstat(path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISDIR(mode):
+            os.unlink(path)
+
+    def _replacing(self, path, create):
+        """Cria uma entrada; se o caminho já existe (e não é diretório), substitui
+
+        O caso comum (raiz vazia) custa só a syscall de criação.
+        """
+        try:
+            return create()
+        except OSError as e:
+            if e.errno not in (errno.EEXIST, errno.ELOOP):
+                raise
+        self._remove_existing(path)
+        return create()
+
+    def _metadata(self, member, path):
+        """Dono, permissões, xattrs e mtime de um caminho (sem seguir symlinks)"""
+        if self.set_owner:
+            os.chown(path, member.uid, member.gid, follow_symlinks=False)
+        for key, value in member.xattrs.items():
+            try:
+                os.setxattr(path, key, value, follow_symlinks=False)
+            except OSError:
+                pass
+        if not member.issym():
+            # chmod depois do chown: o chown limpa setuid/setgid
+            os.chmod(path, member.mode)
+        os.utime(path, (member.mtime, member.mtime), follow_symlinks=False)
+
+    def _file_metadata(self, member, fd):
+        """Mesmo que `_metadata`, pelo descritor do arquivo recém-gravado"""
+        if self.set_owner:
+            os.fchown(fd, member.uid, member.gid)
+        for key, value in member.xattrs.items():
+            try:
+                os.setxattr(fd, key, value)
+            except OSError:
+                pass
+        os.fchmod(fd, member.mode)
+        os.utime(fd, (member.mtime, member.mtime))
+
+    def _open(self, path):
+        return self._replacing(path, lambda: os.open(path, WRITE_FLAGS, 0o600))
+
+    def _write_file(self, member, path, content):
+        try:
+            fd = self._open(path)
+            try:
+                view = memoryview(content)
+                while view:
+                    view = view[os.write(fd, view):]
+                self._file_metadata(member, fd)
+            finally:
+                os.close(fd)
+            self._count("files")
+        except (OSError, ValueError) as e:
+            self._fail(member, e)
+        finally:
+            self.pending.release()
+
+    def _write_inline(self, reader, member, path):
+        """Arquivo grande: copiado em blocos pela própria thread de leitura"""
+        with os.fdopen(self._open(path), "wb") as f:
+            reader.copy_data(member.size, f)
+            f.flush()
+            self._file_metadata(member, f.fileno())
+        self._count("files")
+
+    def _create_special(self, member, path):
+        try:
+            if member.issym():
+                self._replacing(path, lambda: os.symlink(member.linkname, path))
+            elif member.type == FIFO:
+                self._replacing(path, lambda: os.mkfifo(path))
+            else:
+                device = os.makedev(member.devmajor, member.devminor)
+                kind = stat.S_IFCHR if member.type == CHARDEV else stat.S_IFBLK
+                self._replacing(path, lambda: os.mknod(path, member.mode | kind, device))
+            self._metadata(member, path)
+            self._count("links" if member.issym() else "files")
+        except (OSError, ValueError) as e:
+            self._fail(member, e)
+        finally:
+            self.pending.release()
+
+    def _ensure_directory(self, path):
+        """Cria o diretório se preciso; os já vistos não custam um stat"""
+        if path in self.known_directories:
+            return
+        if not os.path.isdir(path):
+            self._remove_existing(path)
+            os.makedirs(path, exist_ok=True)
+        self.known_directories.add(path)
+
+    def _submit(self, executor, function, *args):
+        self.pending.acquire()
+        # Os logs dos workers continuam associados à migração corrente
+        executor.submit(contextvars.copy_context().run, function, *args)
+
+    def extract(self, stream):
+        """Extrai o tar (puro ou gzip) lido de `stream`; retorna estatísticas"""
+        started = time.monotonic()
+        os.makedirs(self.root, exist_ok=True)
+        reader = TarReader(stream)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for member in reader:
+                try:
+                    path = _safe_path(self.root, member.name)
+                    if member.isdir():
+                        self._ensure_directory(path)
+                        self.directories.append((member, path))
+                        self._count("directories")
+                        continue
+
+                    self._ensure_directory(os.path.dirname(path))
+                    if member.islnk():
+                        self.hardlinks.append((member, path, _safe_path(self.root, member.linkname)))
+                    elif member.issym():
+                        self.symlinks.append((member, path))
+                    elif member.isreg():
+                        self._count("bytes", member.size)
+                        if member.size > INLINE_THRESHOLD:
+                            self._write_inline(reader, member, path)
+                        else:
+                            content = reader.read_data(member.size)
+                            self._submit(executor, self._write_file, member, path, content)
+                    elif member.isspecial():
+                        self._submit(executor, self._create_special, member, path)
+                except (OSError, ValueError) as e:
+                    self._fail(member, e)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for member, path in self.symlinks:
+                self._submit(executor, self._create_special, member, path)
+
+        # Os alvos dos hardlinks já existem com todos os workers encerrados
+        for member, path, target in self.hardlinks:
+            try:
+                # O alvo não pode passar por um symlink que aponte para fora da raiz
+                if os.path.commonpath([self.root, os.path.realpath(os.path.dirname(target))]) != self.root:
+                    raise OSError(f"alvo fora da raiz: {member.linkname}")
+                self._replacing(path, lambda: os.link(target, path, follow_symlinks=False))
+                self._count("links")
+            except OSError as e:
+                self._fail(member, e)
+
+        # Diretórios por último e do mais profundo para a raiz: criar os
+        # filhos alteraria o mtime e uma permissão restrita impediria a escrita
+        for member, path in sorted(self.directories, key=lambda item: item[1], reverse=True):
+            try:
+                self._metadata(member, path)
+            except OSError as e:
+                self._fail(member, e)
+
+        self.stats["stream_bytes"] = reader.source.count
+        self.stats["seconds"] = round(time.monotonic() - started, 3)
+        self.stats["errors"] = len(self.errors)
+        for error in self.errors[:20]:
+            logger.warning(f"Extração: {error}")
+        if self.errors:
+            raise MigrationError(f"{len(self.errors)} entradas não puderam ser extraídas")
+        return self.stats
+
+def extract(stream, root, workers=DEFAULT_WORKERS):
+    """Extrai um stream tar em `root` com o pool de workers"""
+    return Extractor(root, workers).extract(stream)
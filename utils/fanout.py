@@ -0,0 +1,125 @@
+"""Fan-out: um stream de coleta entregue a vários consumidores
+
+Cada consumidor roda em uma thread e lê de uma fila limitada; a thread
+que lê a origem só avança quando todas as filas têm espaço, então o
+consumidor mais lento aplica backpressure (memória máxima: `MAX_PENDING`
+blocos por consumidor). Um consumidor que termina ou falha antes do fim
+do stream é desligado sem travar os demais.
+"""
+import io
+import queue
+import contextvars
+import threading
+import time
+import logging
+
+logger = logging.getLogger('lincon')
+
+CHUNK_SIZE = 1024 * 1024
+MAX_PENDING = 64
+
+# Fim do stream na fila de um consumidor
+_EOF = None
+
+# Fim do stream com a origem tendo falhado (o consumidor recebe um erro)
+_FAILED = object()
+
+class QueueReader(io.RawIOBase):
+    """Arquivo somente leitura alimentado pela fila de um consumidor"""
+
+    def __init__(self, pending):
+        self.pending = pending
+        self.buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        if not self.buffer:
+            chunk = self.pending.get()
+            if chunk is _EOF or chunk is _FAILED:
+                # Mantém o fim visível para leituras seguintes
+                self.pending.put(chunk)
+                if chunk is _FAILED:
+                    raise OSError("a coleta da origem falhou")
+                return 0
+            self.buffer = chunk
+        count = min(len(target), len(self.buffer))
+        target[:count] = self.buffer[:count]
+        self.buffer = self.buffer[count:]
+        return count
+
+class Consumer:
+    """Thread de um destino do fan-out e o seu resultado"""
+
+    def __init__(self, name, function):
+        self.name = name
+        self.pending = queue.Queue(MAX_PENDING)
+        self.reader = io.BufferedReader(QueueReader(self.pending), CHUNK_SIZE)
+        self.result = None
+        self.delivered = 0
+        self.blocked_seconds = 0.0
+        # Contexto de quem criou o fan-out (sink de eventos, migração dos logs)
+        context = contextvars.copy_context()
+        self.thread = threading.Thread(
+            target=context.run, args=(self._run, function), name=f"fanout-{name}", daemon=True
+        )
+
+    def _run(self, function):
+        try:
+            self.result = bool(function(self.reader))
+        except Exception as e:
+            logger.error(f"Destino {self.name} do fan-out falhou: {e}")
+            self.result = False
+
+    def put(self, chunk):
+        """Entrega um bloco; False se o consumidor já terminou (desligado)"""
+        started = time.monotonic()
+        while self.thread.is_alive():
+            try:
+                self.pending.put(chunk, timeout=0.5)
+                self.blocked_seconds += time.monotonic() - started
+                if chunk is not _EOF and chunk is not _FAILED:
+                    self.delivered += len(chunk)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+def tee(stream, consumers, finish=None):
+    """Lê `stream` uma vez e entrega cada bloco a todos os consumidores
+
+    `consumers` mapeia nome -> função que recebe um arquivo binário e
+    retorna verdadeiro em caso de sucesso. `finish()` é chamada no fim do
+    stream, antes dos consumidores verem o EOF: se retornar falso (ex.: a
+    coleta saiu com erro), a leitura deles falha em vez de terminar e
+    nenhum destino segue para o cutover. Retorna (resultados por nome,
+    estatísticas com bytes lidos, entregues e tempo bloqueado por consumidor).
+    """
+    running = [Consumer(name, function) for name, function in consumers.items()]
+    for consumer in running:
+        consumer.thread.start()
+
+    live = list(running)
+    total = 0
+    while live:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        live = [consumer for consumer in live if consumer.put(chunk)]
+    completed = True
+    if live and finish is not None:
+        completed = finish()
+    for consumer in live:
+        consumer.put(_EOF if completed else _FAILED)
+
+    for consumer in running:
+        consumer.thread.join()
+    results = {consumer.name: bool(consumer.result) for consumer in running}
+    stats = {
+        "bytes": total,
+        "delivered": {consumer.name: consumer.delivered for consumer in running},
+        "blocked_seconds": {consumer.name: round(consumer.blocked_seconds, 2) for consumer in running},
+    }
+    return results, stats
@@ -0,0 +1,189 @@
+import json
+import time
+import shutil
+import contextvars
+import hashlib
+import subprocess
+import logging
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import manifest
+
+logger = logging.getLogger('lincon')
+
+# Subárvore com as entradas que não são diretórios na raiz (ex.: /bin -> usr/bin)
+ROOT_FILES = "_root"
+
+# Diretórios da raiz que nunca são coletados (conteúdo virtual ou descartável)
+SKIPPED_TOPLEVEL = {
+    "proc", "sys", "dev", "tmp", "run", "mnt", "media", "lost+found", "boot"
+}
+
+MAX_WORKERS = 4
+
+# Limites da pasta cache/ (tarballs das últimas coletas de todas as origens)
+CACHE_MAX_BYTES = 20 * 1024 ** 3
+CACHE_MAX_AGE_DAYS = 30
+
+def _base_dir():
+    return Path(__file__).parent.parent
+
+def _key(target, name):
+    return f"{target}_{name}".replace("/", "_")
+
+def cache_dir(target, name):
+    """Diretório com os tarballs por subárvore da última coleta"""
+    path = _base_dir() / "cache" / _key(target, name)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def archive_name(subtree):
+    # tar.gz (czpf) ou tar (agente adaptativo): o ADD do Docker detecta pelo conteúdo
+    return f"{subtree}.tar"
+
+def list_subtrees(ssh_command):
+    """Retorna (diretórios da raiz, entradas da raiz que não são diretórios)"""
+    result = subprocess.run(
+        ssh_command + ["find / -mindepth 1 -maxdepth 1 -printf '%y %f\\n'"],
+        capture_output=True, text=True, check=True
+    )
+    directories, files = [], []
+    for line in result.stdout.splitlines():
+        kind, _, name = line.partition(" ")
+        if kind == "d":
+            if name not in SKIPPED_TOPLEVEL:
+                directories.append(name)
+        elif name:
+            files.append(name)
+    return sorted(directories), sorted(files)
+
+def subtree_paths(subtree, root_files):
+    """Caminhos (relativos a /) que compõem uma subárvore"""
+    if subtree == ROOT_FILES:
+        return [f"./{name}" for name in root_files]
+    return [f"./{subtree}"]
+
+def _digest_command(subtree):
+    """Comando remoto que gera o digest do manifesto da subárvore
+
+    A listagem é a do módulo `manifest` (caminho, tamanho, mtime, modo,
+    dono e tipo), resumida em sha256 na própria origem.
+    """
+    if subtree == ROOT_FILES:
+        listing = manifest.manifest_command("/", "-mindepth 1 -maxdepth 1 ! -type d")
+    else:
+        # Sem -xdev: o tar da coleta atravessa pontos de montagem, o manifesto também
+        listing = manifest.manifest_command(f"/{subtree}", "")
+    return f"{listing} | sha256sum"
+
+def _subtree_digest(ssh_command, subtree):
+    result = subprocess.run(
+        ssh_command + [_digest_command(subtree)],
+        capture_output=True, text=True, check=True
+    )
+    return result.stdout.split()[0]
+
+def compute_fingerprint(ssh_command):
+    """Calcula o fingerprint Merkle da origem
+
+    Cada subárvore da raiz tem seu manifesto ordenado e resumido em
+    sha256 no próprio host remoto, com várias subárvores em paralelo;
+    a raiz é o sha256 dos digests das subárvores.
+    """
+    directories, root_files = list_subtrees(ssh_command)
+    subtrees = directories + ([ROOT_FILES] if root_files else [])
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, _subtree_digest, ssh_command, subtree)
+            for subtree in subtrees
+        ]
+        digests = dict(zip(subtrees, (future.result() for future in futures)))
+
+    root = hashlib.sha256()
+    for subtree in sorted(digests):
+        root.update(f"{subtree}\t{digests[subtree]}\n".encode())
+
+    return {
+        "root": root.hexdigest(),
+        "subtrees": digests,
+        "root_files": root_files,
+    }
+
+def _fingerprint_file(target, name):
+    state_dir = _base_dir() / "state" / "fingerprints"
+    state_dir.mkdir(parents=True, exist_ok=True)
+    return state_dir / f"{_key(target, name)}.json"
+
+def load_fingerprint(target, name):
+    """Fingerprint da última migração bem-sucedida (vazio se não houver)"""
+    fingerprint_file = _fingerprint_file(target, name)
+    if fingerprint_file.exists():
+        with open(fingerprint_file, 'r') as f:
+            return json.load(f)
+    return {}
+
+def save_fingerprint(target, name, fingerprint, image):
+    """Registra o fingerprint de uma migração bem-sucedida"""
+    state = dict(fingerprint, image=image, timestamp=datetime.now().isoformat())
+    with open(_fingerprint_file(target, name), 'w') as f:
+        json.dump(state, f, indent=4)
+
+def changed_subtrees(previous, current, archives_dir):
+    """Subárvores que precisam ser coletadas novamente
+
+    Uma subárvore é reaproveitada só se o digest não mudou e o tarball
+    da coleta anterior ainda está no cache.
+    """
+    old = previous.get("subtrees", {})
+    changed = []
+    for subtree, digest in current["subtrees"].items():
+        cached = (archives_dir / archive_name(subtree)).exists()
+        if old.get(subtree) != digest or not cached:
+            changed.append(subtree)
+    # Entradas da raiz mudaram de lista: a subárvore especial é refeita
+    if ROOT_FILES in current["subtrees"] and previous.get("root_files") != current["root_files"]:
+        if ROOT_FILES not in changed:
+            changed.append(ROOT_FILES)
+    return sorted(changed)
+
+def prune_cache(archives_dir, current):
+    """Remove tarballs de subárvores que não existem mais na origem"""
+    valid = {archive_name(subtree) for subtree in current["subtrees"]}
+    for archive in archives_dir.glob("*.tar*"):
+        if archive.name not in valid:
+            archive.unlink()
+
+def _cache_usage(path):
+    """(bytes, último uso) de um diretório do cache"""
+    size, used = 0, path.stat().st_mtime
+    for archive in path.iterdir():
+        stat = archive.stat()
+        size += stat.st_size
+        used = max(used, stat.st_mtime)
+    return size, used
+
+def trim_cache(keep, max_bytes=CACHE_MAX_BYTES, days=CACHE_MAX_AGE_DAYS):
+    """Aplica a idade e o tamanho máximos à pasta cache/
+
+    Caches sem uso há mais de `days` dias são removidos e, acima de
+    `max_bytes`, os usados há mais tempo vão primeiro. `keep` (o cache da
+    migração corrente) é marcado como usado agora e nunca é removido.
+    """
+    keep.touch()
+    limit = time.time() - days * 86400
+    caches = []
+    for path in keep.parent.iterdir():
+        try:
+            caches.append((path,) + _cache_usage(path))
+        except OSError:
+            continue
+    total = sum(size for _, size, _ in caches)
+    for path, size, used in sorted(caches, key=lambda cache: cache[2]):
+        if path == keep or (used >= limit and total <= max_bytes):
+            continue
+        logger.info(f"Removendo cache de coleta {path.name} ({size} bytes)")
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
@@ -0,0 +1,176 @@
+import threading
+import uuid
+from datetime import datetime
+
+from utils.migration_state import MigrationState
+
+# Etapas de um job persistidas no estado da migração
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_EXPIRED = "expired"
+JOB_CANCELLED = "cancelled"
+
+FINAL_STEPS = (JOB_COMPLETED, JOB_FAILED, JOB_EXPIRED, JOB_CANCELLED)
+
+def _parse_time(value):
+    """Horário ISO como datetime local sem fuso (comparável com `datetime.now()`)"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def _job_sort_key(job):
+    """Maior prioridade primeiro; dentro da prioridade, deadline mais próximo"""
+    deadline = job["job"].get("deadline") or "9999"
+    return (-job["job"]["priority"], deadline, job["job"]["submitted_at"])
+
+class JobQueue:
+    """Fila de migrações persistida no diretório de estado
+
+    Cada job é um arquivo de estado de migração comum, com os metadados
+    do job guardados em `data["job"]`. Jobs que estavam rodando quando o
+    daemon parou voltam para a fila ao reiniciar.
+    """
+    def __init__(self):
+        self.lock = threading.Condition()
+        self.jobs = {}
+        self.states = {}
+        self._load_jobs()
+
+    def _load_jobs(self):
+        """Recarrega os jobs persistidos"""
+        for state in MigrationState().get_incomplete_migrations():
+            data = state.get("data", {})
+            if "job" not in data or state.get("step") in FINAL_STEPS:
+                continue
+            job_id = state["migration_id"]
+            data["job"]["step"] = JOB_QUEUED
+            data["job"]["started_at"] = None
+            self.jobs[job_id] = data
+            self.states[job_id] = MigrationState(job_id)
+            self.states[job_id].save_state(data, JOB_QUEUED)
+
+    def _save(self, job_id, step):
+        job = self.jobs[job_id]
+        job["job"]["step"] = step
+        self.states[job_id].save_state(job, step)
+
+    def submit(self, kind, data, priority=0, deadline=None, estimated_bytes=0, bandwidth=0):
+        """Enfileira uma migração e retorna o ID do job"""
+        if kind not in ("docker", "lxc"):
+            raise ValueError(f"Tipo de job inválido: {kind}")
+        if deadline:
+            # Deadline com fuso ("...+00:00") é guardado no horário local
+            deadline = _parse_time(deadline).isoformat()
+
+        job_id = f"job_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        job = dict(data)
+        job["job"] = {
+            "id": job_id,
+            "kind": kind,
+            "priority": int(priority),
+            "deadline": deadline,
+            "estimated_bytes": int(estimated_bytes),
+            "bandwidth": float(bandwidth),
+            "submitted_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "step": JOB_QUEUED,
+            "stage": None,
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+            self.states[job_id] = MigrationState(job_id)
+            self._save(job_id, JOB_QUEUED)
+            self.lock.notify_all()
+        return job_id
+
+    def cancel(self, job_id):
+        """Cancela um job que ainda não começou"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job["job"]["step"] != JOB_QUEUED:
+                return False
+            self._save(job_id, JOB_CANCELLED)
+            return True
+
+    def take_next(self, admit):
+        """Retorna o próximo job admitido por `admit(job)`, marcando-o como rodando
+
+        Jobs com deadline vencido são marcados como expirados. Retorna None
+        se nenhum job puder ser admitido agora.
+        """
+        now = datetime.now()
+        with self.lock:
+            queued = sorted(
+                (job for job in self.jobs.values() if job["job"]["step"] == JOB_QUEUED),
+                key=_job_sort_key
+            )
+            for job in queued:
+                job_id = job["job"]["id"]
+                deadline = _parse_time(job["job"]["deadline"])
+                if deadline and deadline < now:
+                    job["job"]["finished_at"] = now.isoformat()
+                    self._save(job_id, JOB_EXPIRED)
+                    continue
+                if admit(job):
+                    job["job"]["started_at"] = now.isoformat()
+                    self._save(job_id, JOB_RUNNING)
+                    return job
+            return None
+
+    def record_event(self, job_id, event):
+        """Acompanha os eventos da migração de um job (etapa e resultado)"""
+        with self.lock:
+            meta = self.jobs[job_id]["job"]
+            if event["type"] == "stage" and meta.get("stage") != event["stage"]:
+                meta["stage"] = event["stage"]
+                self._save(job_id, meta["step"])
+            elif event["type"] == "result":
+                meta["result"] = {key: value for key, value in event.items() if key not in ("type", "time")}
+
+    def finish(self, job_id, success, transferred_bytes=0):
+        """Registra o fim de um job"""
+        with self.lock:
+            job = self.jobs[job_id]
+            job["job"]["finished_at"] = datetime.now().isoformat()
+            job["job"]["transferred_bytes"] = transferred_bytes
+            self._save(job_id, JOB_COMPLETED if success else JOB_FAILED)
+            self.lock.notify_all()
+
+    def wait(self, timeout):
+        """Aguarda uma mudança na fila (novo job ou job finalizado)"""
+        with self.lock:
+            self.lock.wait(timeout)
+
+    def running(self):
+        with self.lock:
+            return [job for job in self.jobs.values() if job["job"]["step"] == JOB_RUNNING]
+
+    def list_jobs(self):
+        """Retorna os metadados de todos os jobs conhecidos"""
+        with self.lock:
+            return [dict(job["job"]) for job in sorted(self.jobs.values(), key=_job_sort_key)]
+
+    def metrics(self):
+        """Tempo na fila, tempo de execução e throughput de cada job"""
+        result = []
+        for meta in self.list_jobs():
+            submitted = _parse_time(meta["submitted_at"])
+            started = _parse_time(meta["started_at"])
+            finished = _parse_time(meta["finished_at"])
+            entry = {"id": meta["id"], "step": meta["step"], "priority": meta["priority"]}
+            if started:
+                entry["queue_wait"] = (started - submitted).total_seconds()
+            if started and finished and meta["step"] != JOB_EXPIRED:
+                run_time = (finished - started).total_seconds()
+                entry["run_time"] = run_time
+                transferred = meta.get("transferred_bytes", 0)
+                entry["transferred_bytes"] = transferred
+                entry["throughput"] = transferred / run_time if run_time > 0 else 0
+            result.append(entry)
+        return result
@@ -1,21 +1,178 @@
+import json
+import time
+import queue
+import atexit
 import logging
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 from datetime import datetime
 
+_logger = None
+_log_file = None
+_listener = None
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Rotação do log do processo e retenção da pasta logs/
+MAX_LOG_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+RETENTION_DAYS = 14
+
+# Intervalo entre as aplicações da retenção num processo de longa duração
+PRUNE_INTERVAL = 3600
+
+# Arquivos de migração abertos ao mesmo tempo pelo listener
+MAX_OPEN_MIGRATION_LOGS = 32
+
+# Migração corrente (cada migração da API roda em thread/task própria)
+_migration_id = contextvars.ContextVar("lincon_log_migration_id", default=None)
+
+def _log_dir():
+    return Path(__file__).parent.parent / "logs"
+
+def migration_log_file(migration_id):
+    """Log estruturado (JSON por linha) de uma migração"""
+    return _log_dir() / "migrations" / f"{migration_id}.jsonl"
+
+@contextmanager
+def use_migration(migration_id):
+    """Marca os logs emitidos dentro do bloco com o ID da migração"""
+    token = _migration_id.set(migration_id)
+    try:
+        yield
+    finally:
+        _migration_id.reset(token)
+
+class MigrationFilter(logging.Filter):
+    """Anota o registro com a migração corrente, na thread que fez o log"""
+    def filter(self, record):
+        record.migration_id = _migration_id.get()
+        return True
+
+class MigrationLogHandler(logging.Handler):
+    """Grava cada registro com migração no arquivo JSON dela
+
+    Roda só na thread do listener; mantém poucos arquivos abertos (LRU).
+    """
+    def __init__(self):
+        super().__init__()
+        self.files = OrderedDict()
+
+    def _file(self, migration_id):
+        f = self.files.pop(migration_id, None)
+        if f is None:
+            path = migration_log_file(migration_id)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            f = open(path, 'a')
+            if len(self.files) >= MAX_OPEN_MIGRATION_LOGS:
+                self.files.popitem(last=False)[1].close()
+        self.files[migration_id] = f
+        return f
+
+    def emit(self, record):
+        migration_id = getattr(record, "migration_id", None)
+        if not migration_id:
+            return
+        try:
+            entry = {
+                "time": record.created,
+                "level": record.levelname,
+                "logger": record.name,
+                "thread": record.threadName,
+                "migration_id": migration_id,
+                "message": record.getMessage(),
+            }
+            f = self._file(migration_id)
+            f.write(json.dumps(entry, default=str) + "\n")
+            f.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files.clear()
+        super().close()
+
+def prune_logs(log_dir, days=RETENTION_DAYS, keep=()):
+    """Remove logs, traces e logs de migração mais antigos que `days` dias
+
+    Os caminhos em `keep` (o log aberto pelo processo) nunca são removidos.
+    """
+    limit = time.time() - days * 86400
+    keep = {Path(path).resolve() for path in keep}
+    for path in list(log_dir.glob("lincon_*")) + list(log_dir.glob("migrations/*.jsonl")):
+        try:
+            if path.resolve() not in keep and path.stat().st_mtime < limit:
+                path.unlink()
+        except OSError:
+            pass
+
+class RetentionFileHandler(RotatingFileHandler):
+    """Log do processo que também aplica a retenção da pasta logs/
+
+    A retenção roda a cada `PRUNE_INTERVAL` segundos e em cada rotação, na
+    thread do listener: o daemon não acumula logs entre reinícios.
+    """
+    def __init__(self, filename, log_dir, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.log_dir = log_dir
+        self.pruned_at = time.time()
+
+    def _own_files(self):
+        """O arquivo aberto e os backups da rotação dele"""
+        return [self.baseFilename] + [f"{self.baseFilename}.{i}" for i in range(1, self.backupCount + 1)]
+
+    def emit(self, record):
+        if record.created - self.pruned_at >= PRUNE_INTERVAL:
+            self.pruned_at = record.created
+            prune_logs(self.log_dir, keep=self._own_files())
+        super().emit(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.pruned_at = time.time()
+        prune_logs(self.log_dir, keep=self._own_files())
+
 def setup_logging():
-    """Configura o sistema de logs"""
-    log_dir = Path(__file__).parent.parent / "logs"
+    """Configura o sistema de logs (uma única vez por processo)
+
+    As chamadas de log só enfileiram o registro; a escrita em disco e no
+    console fica com a thread do QueueListener.
+    """
+    global _logger, _log_file, _listener
+    if _logger is not None:
+        return _logger
+
+    log_dir = _log_dir()
     log_dir.mkdir(exist_ok=True)
-    
-    log_file = log_dir / f"lincon_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-    
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
-    
-    return logging.getLogger('lincon')
+    prune_logs(log_dir)
+
+    log_file = _log_file = log_dir / f"lincon_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = RetentionFileHandler(log_file, log_dir, maxBytes=MAX_LOG_BYTES, backupCount=LOG_BACKUPS)
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(MigrationFilter())
+    _listener = QueueListener(log_queue, file_handler, stream_handler, MigrationLogHandler())
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(queue_handler)
+
+    _logger = logging.getLogger('lincon')
+    return _logger
+
+def get_log_file():
+    """Caminho do arquivo de log do processo atual (None antes do setup)"""
+    return _log_file
@@ -0,0 +1,287 @@
+"""Manifesto compacto da árvore de arquivos da origem
+
+Em vez de um dict por arquivo, as entradas ficam em colunas `array`
+ordenadas pelo caminho (bytes, ordem do `LC_ALL=C sort`):
+
+    dir_index  uint32   índice do diretório, com a '/' final (prefixos internados)
+    name_end   uint64   fim do nome no blob de nomes
+    size       uint64
+    mtime_ns   int64
+    mode       uint32   permissões e tipo (S_IFREG, S_IFDIR, ...)
+    uid, gid   uint32
+    digest     uint64   hash opcional do conteúdo (0: não calculado)
+
+Custo por entrada: 44 bytes fixos + o nome (sem o diretório). Com nomes
+de ~15 bytes, 20 milhões de entradas ocupam ~1,2 GB em memória ou em
+disco. O formato em disco é o mesmo das colunas, então `load` mapeia o
+arquivo com mmap sem copiar nada, e `diff` percorre dois manifestos em
+ordem (merge), com memória extra constante e O(n + m) comparações
+(~1,5 µs por entrada em CPython: 20 milhões em ~30 s).
+
+Entradas fora de ordem são reordenadas por merge de blocos de `SORT_RUN`
+entradas: só os caminhos de um bloco são materializados por vez, mais um
+índice de 4 bytes por entrada.
+"""
+import heapq
+import mmap
+import stat
+import struct
+import subprocess
+import sys
+import logging
+from array import array
+from collections import namedtuple
+
+from utils.exceptions import MigrationError
+
+logger = logging.getLogger('lincon')
+
+MAGIC = b"LCMF"
+VERSION = 1
+
+# magic, versão, byteorder (0 little, 1 big), entradas, diretórios e
+# tamanhos dos blobs de diretórios e de nomes
+HEADER = struct.Struct("<4sBBxxQQQQ")
+
+# Colunas numéricas na ordem em que são gravadas
+COLUMNS = (
+    ("dir_index", "I"), ("name_end", "Q"), ("size", "Q"), ("mtime_ns", "q"),
+    ("mode", "I"), ("uid", "I"), ("gid", "I"), ("digest", "Q"),
+)
+
+Entry = namedtuple("Entry", "path size mtime_ns mode uid gid digest")
+
+# Entradas ordenadas em memória por vez ao reordenar um manifesto
+SORT_RUN = 1 << 20
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+def _parse_mtime(value):
+    """'1700000000.1234567890' (%T@ do find) -> nanossegundos, sem passar por float"""
+    seconds, _, fraction = value.partition(b".")
+    return int(seconds) * 1_000_000_000 + int((fraction + b"000000000")[:9])
+
+class Manifest:
+    """Manifesto imutável; as colunas são `array` ou memoryviews de um mmap"""
+
+    def __init__(self, directories, names, columns, mapped=None):
+        self.directories = directories
+        self.names = names
+        for name, _ in COLUMNS:
+            setattr(self, name, columns[name])
+        self._mapped = mapped
+
+    def __len__(self):
+        return len(self.size)
+
+    def _name(self, i):
+        start = self.name_end[i - 1] if i else 0
+        return bytes(self.names[start:self.name_end[i]])
+
+    def path(self, i):
+        """Caminho completo (bytes) da entrada i"""
+        return self.directories[self.dir_index[i]] + self._name(i)
+
+    def entry(self, i):
+        return Entry(self.path(i), self.size[i], self.mtime_ns[i], self.mode[i],
+                     self.uid[i], self.gid[i], self.digest[i])
+
+    def __iter__(self):
+        return (self.entry(i) for i in range(len(self)))
+
+    def nbytes(self):
+        """Bytes ocupados pelas colunas, nomes e diretórios"""
+        total = len(self.names) + sum(len(d) + 1 for d in self.directories)
+        for name, code in COLUMNS:
+            total += len(getattr(self, name)) * array(code).itemsize
+        return total
+
+    def save(self, path):
+        """Grava no formato binário que `load` mapeia"""
+        directories = b"\0".join(self.directories)
+        byteorder = 0 if sys.byteorder == "little" else 1
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, byteorder, len(self), len(self.directories),
+                                len(directories), len(self.names)))
+            for blob in [directories, self.names] + [getattr(self, name) for name, _ in COLUMNS]:
+                f.write(b"\0" * (_align(f.tell()) - f.tell()))
+                f.write(blob)
+
+    @classmethod
+    def load(cls, path):
+        """Abre um manifesto gravado com `save` via mmap (somente leitura)"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byteorder, count, dir_count, directories_size, names_size = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != VERSION:
+            mapped.close()
+            raise MigrationError(f"Manifesto inválido: {path}")
+        if byteorder != (0 if sys.byteorder == "little" else 1):
+            mapped.close()
+            raise MigrationError(f"Manifesto gravado em outra ordem de bytes: {path}")
+
+        view = memoryview(mapped)
+        offset = _align(HEADER.size)
+        # Só os diretórios (poucos) são copiados para a memória
+        directories = mapped[offset:offset + directories_size].split(b"\0") if dir_count else []
+        offset = _align(offset + directories_size)
+        names = view[offset:offset + names_size]
+        offset = _align(offset + names_size)
+
+        columns = {}
+        for name, code in COLUMNS:
+            size = count * array(code).itemsize
+            columns[name] = view[offset:offset + size].cast(code)
+            offset = _align(offset + size)
+        return cls(directories, names, columns, mapped)
+
+    def close(self):
+        if self._mapped is not None:
+            for name, _ in COLUMNS:
+                getattr(self, name).release()
+            self.names.release()
+            self._mapped.close()
+            self._mapped = None
+
+class ManifestBuilder:
+    """Monta um manifesto entrada a entrada (idealmente já em ordem)"""
+
+    def __init__(self):
+        self.directories = []
+        self._directory_ids = {}
+        self.names = bytearray()
+        self.columns = {name: array(code) for name, code in COLUMNS}
+        self._last = None
+        self.ordered = True
+
+    def add(self, path, size, mtime_ns, mode, uid=0, gid=0, digest=0):
+        if isinstance(path, str):
+            path = path.encode("utf-8", "surrogateescape")
+        if self._last is not None and path < self._last:
+            self.ordered = False
+        self._last = path
+
+        split = path.rfind(b"/") + 1
+        directory, name = path[:split], path[split:]
+        index = self._directory_ids.get(directory)
+        if index is None:
+            index = self._directory_ids[directory] = len(self.directories)
+            self.directories.append(directory)
+
+        self.names += name
+        columns = self.columns
+        columns["dir_index"].append(index)
+        columns["name_end"].append(len(self.names))
+        columns["size"].append(size)
+        columns["mtime_ns"].append(mtime_ns)
+        columns["mode"].append(mode)
+        columns["uid"].append(uid)
+        columns["gid"].append(gid)
+        columns["digest"].append(digest)
+
+    def build(self):
+        manifest = Manifest(self.directories, bytes(self.names), self.columns)
+        if self.ordered:
+            return manifest
+        logger.info("Manifesto fora de ordem, reordenando")
+        builder = ManifestBuilder()
+        for i in sorted_indices(manifest):
+            builder.add(*manifest.entry(i))
+        return builder.build()
+
+def sorted_indices(manifest, run_size=None):
+    """Índices de `manifest` em ordem de caminho, sem materializar todos os caminhos
+
+    Cada bloco de `run_size` entradas é ordenado em memória e guardado como
+    índices; o `heapq.merge` dos blocos mantém um caminho por bloco.
+    """
+    run_size = run_size or SORT_RUN
+    count = len(manifest)
+    runs = [
+        array("I", sorted(range(start, min(start + run_size, count)), key=manifest.path))
+        for start in range(0, count, run_size)
+    ]
+    merged = heapq.merge(*[((manifest.path(i), i) for i in run) for run in runs])
+    return (i for _, i in merged)
+
+# Uma entrada por registro separado por NUL (nomes podem ter '\n'); o
+# caminho vem primeiro para o `sort -z` ordenar por ele
+FIND_FORMAT = r"%p\t%s\t%T@\t%m\t%U\t%G\t%y\0"
+
+# Tipo do `find -printf %y` -> bits de tipo do st_mode
+TYPES = {
+    b"f": stat.S_IFREG, b"d": stat.S_IFDIR, b"l": stat.S_IFLNK, b"c": stat.S_IFCHR,
+    b"b": stat.S_IFBLK, b"p": stat.S_IFIFO, b"s": stat.S_IFSOCK,
+}
+
+def manifest_command(root="/", find_options="-xdev"):
+    """Comando remoto que lista `root` no formato lido por `from_stream`"""
+    return (
+        f"find '{root}' {find_options} -printf '{FIND_FORMAT}' 2>/dev/null"
+        " | LC_ALL=C sort -z"
+    )
+
+def from_stream(stream, chunk_size=1 << 20):
+    """Monta o manifesto lendo os registros do `find` direto do stream"""
+    builder = ManifestBuilder()
+    pending = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        records = (pending + chunk).split(b"\0")
+        pending = records.pop()
+        for record in records:
+            path, size, mtime, mode, uid, gid, kind = record.rsplit(b"\t", 6)
+            mode = int(mode, 8) | TYPES.get(kind, 0)
+            builder.add(path, int(size), _parse_mtime(mtime), mode, int(uid), int(gid))
+    if pending:
+        raise MigrationError("Manifesto truncado")
+    return builder.build()
+
+def collect(ssh_command, root="/"):
+    """Lista a origem via SSH e monta o manifesto sem guardar a saída inteira"""
+    process = subprocess.Popen(ssh_command + [manifest_command(root)], stdout=subprocess.PIPE)
+    try:
+        manifest = from_stream(process.stdout)
+    finally:
+        process.stdout.close()
+        process.wait()
+    if process.returncode != 0:
+        raise MigrationError(f"Falha ao listar {root} na origem")
+    return manifest
+
+def _same(old, i, new, j):
+    return (
+        old.size[i] == new.size[j] and old.mtime_ns[i] == new.mtime_ns[j]
+        and old.mode[i] == new.mode[j] and old.uid[i] == new.uid[j]
+        and old.gid[i] == new.gid[j]
+        and (not old.digest[i] or not new.digest[j] or old.digest[i] == new.digest[j])
+    )
+
+def diff(old, new):
+    """Gera (mudança, caminho) com mudança em 'added', 'removed' ou 'changed'
+
+    Merge dos dois manifestos ordenados: memória extra constante.
+    """
+    i = j = 0
+    old_count, new_count = len(old), len(new)
+    old_path = old.path(0) if old_count else None
+    new_path = new.path(0) if new_count else None
+    while i < old_count or j < new_count:
+        if j >= new_count or (i < old_count and old_path < new_path):
+            yield "removed", old_path
+            i += 1
+            old_path = old.path(i) if i < old_count else None
+        elif i >= old_count or new_path < old_path:
+            yield "added", new_path
+            j += 1
+            new_path = new.path(j) if j < new_count else None
+        else:
+            if not _same(old, i, new, j):
+                yield "changed", new_path
+            i += 1
+            j += 1
+            old_path = old.path(i) if i < old_count else None
+            new_path = new.path(j) if j < new_count else None
@@ -0,0 +1,274 @@
+"""Transferência por pacotes: só o que difere dos pacotes da distribuição
+
+Na origem, o banco do dpkg/rpm é verificado contra os checksums dos
+pacotes; vão para o destino apenas os arquivos alterados, os de
+configuração, os que não pertencem a nenhum pacote (e os de pacotes
+instalados localmente, que não existem no mirror) e a lista de pacotes.
+O destino recebe a configuração de repositórios da origem, reinstala os
+pacotes nas mesmas versões a partir de uma imagem base da mesma
+distribuição e aplica o tarball por cima. Pacotes que o destino não
+consegue instalar (repositório fora do ar, versão removida do mirror)
+têm os seus arquivos copiados da origem.
+"""
+import shlex
+import subprocess
+import logging
+
+from utils.profiler import tracer
+
+logger = logging.getLogger('lincon')
+
+# ID do os-release -> (imagem base, instalador); {major} e {version} vêm do VERSION_ID
+BASE_IMAGES = {
+    "debian": ("debian:{major}", "apt"),
+    "ubuntu": ("ubuntu:{version}", "apt"),
+    "rocky": ("rockylinux:{major}", "dnf"),
+    "almalinux": ("almalinux:{major}", "dnf"),
+    "centos": ("centos:{major}", "yum"),
+    "fedora": ("fedora:{major}", "dnf"),
+    "rhel": ("redhat/ubi{major}", "dnf"),
+    "opensuse-leap": ("opensuse/leap:{version}", "zypper"),
+}
+
+# Instalador -> (preparação, comando de instalação, limpeza)
+INSTALLERS = {
+    "apt": ("apt-get update && ", "DEBIAN_FRONTEND=noninteractive apt-get install -y --no-install-recommends --allow-downgrades",
+            "rm -rf /var/lib/apt/lists/*"),
+    "dnf": ("", "dnf install -y --setopt=install_weak_deps=False --setopt=skip_if_unavailable=True", "dnf clean all"),
+    "yum": ("", "yum install -y --setopt=skip_if_unavailable=1", "yum clean all"),
+    "zypper": ("", "zypper --non-interactive install --no-recommends", "zypper clean --all"),
+}
+
+# Banco de pacotes consultado na origem para cada instalador
+DATABASES = {"apt": "dpkg", "dnf": "rpm", "yum": "rpm", "zypper": "rpm"}
+
+# Versão fixada no formato de cada instalador
+PIN_FORMATS = {"apt": "{name}={version}", "dnf": "{name}-{version}", "yum": "{name}-{version}",
+               "zypper": "{name}={version}"}
+
+# Configuração de repositórios e chaves, aplicada antes da instalação para
+# que pacotes de terceiros (PPA, docker-ce, PGDG...) sejam encontrados
+REPO_PATHS = {
+    "dpkg": ["/etc/apt/sources.list", "/etc/apt/sources.list.d", "/etc/apt/trusted.gpg",
+             "/etc/apt/trusted.gpg.d", "/etc/apt/keyrings", "/usr/share/keyrings",
+             "/etc/apt/preferences", "/etc/apt/preferences.d", "/etc/apt/auth.conf", "/etc/apt/auth.conf.d"],
+    "rpm": ["/etc/yum.repos.d", "/etc/pki/rpm-gpg", "/etc/dnf/vars", "/etc/yum/vars",
+            "/etc/zypp/repos.d", "/etc/zypp/credentials.d"],
+}
+
+# Antes dos repositórios da origem: https precisa dos certificados da CA
+_BOOTSTRAP = {"apt": "apt-get update && apt-get install -y --no-install-recommends ca-certificates "
+                     "&& rm -rf /var/lib/apt/lists/*"}
+
+# Um repositório de terceiros fora do ar não impede a instalação dos demais
+_REFRESH = {"apt": "(apt-get update || true) && "}
+
+# Pacotes que o destino não instalou (um por linha, no formato fixado)
+MISSING_FILE = "/lincon-missing-packages.txt"
+
+# Recriados pela reinstalação no destino; copiar sobrescreveria o banco novo
+REGENERATED_PATHS = ["/var/lib/dpkg", "/var/lib/rpm", "/var/lib/apt/lists", "/var/cache/apt",
+                     "/var/cache/dnf", "/var/cache/yum", "/var/cache/zypp"]
+
+# Com usrmerge os pacotes listam /bin/x, mas o arquivo é encontrado em /usr/bin/x
+_USRMERGE = r'''awk '{print; if ($0 ~ "^/(bin|sbin|lib|lib32|lib64|libx32)/") print "/usr" $0}' '''
+
+# Pacotes instalados, alterados (md5 diferente), configuração e arquivos de
+# cada banco; $W é o diretório de trabalho do script
+_DATABASE_COMMANDS = {
+    "dpkg": r'''
+dpkg-query -W -f '${db:Status-Abbrev} ${binary:Package}\t${Version}\n' | awk '$1 == "ii" {print $2 "\t" $3}' | sort -u > $W/versions
+cut -f1 $W/versions > $W/installed
+# Sem listas do apt (apt-get clean/imagens mínimas) todo pacote pareceria local
+if ls /var/lib/apt/lists/*Packages* >/dev/null 2>&1; then
+    apt list --installed 2>/dev/null | awk -F/ '/,local\]/ {print $1}' | sort -u > $W/local
+else
+    : > $W/local
+fi
+comm -23 $W/installed $W/local > $W/packages
+dpkg --verify 2>/dev/null | awk '$1 ~ /^..5/ {print $NF}' > $W/delta
+dpkg-query -W -f '${Conffiles}\n' | awk 'NF >= 2 {print $1}' >> $W/delta
+cat /var/lib/dpkg/info/*.list | USRMERGE | sort -u > $W/owned
+for p in $(cat $W/local); do cat /var/lib/dpkg/info/$p.list /var/lib/dpkg/info/$p:*.list 2>/dev/null; done >> $W/delta
+''',
+    "rpm": r'''
+rpm -qa --qf '%{NAME}\t%{VERSION}-%{RELEASE}\n' | awk -F'\t' '$1 != "gpg-pubkey"' | sort -u > $W/versions
+cut -f1 $W/versions > $W/packages
+: > $W/local
+rpm -Va --nomtime --nodeps --noscripts 2>/dev/null | awk '$1 ~ /^..5/ {print $NF}' > $W/delta
+rpm -qac 2>/dev/null | grep '^/' >> $W/delta
+rpm -qal 2>/dev/null | USRMERGE | sort -u > $W/owned
+''',
+}
+
+# Caminhos de $W/delta -> lista do tar em $L; dentro de /bin, /lib... com
+# usrmerge passam a ser os de /usr
+_MERGED = r'''
+for d in bin sbin lib lib32 lib64 libx32; do [ -L /$d ] && echo $d; done > $W/merged
+awk 'FILENAME == ARGV[1] {merged[$1] = 1; next} {if (split($0, p, "/") > 2 && p[2] in merged) $0 = "/usr" $0; print}' \
+    $W/merged $W/delta | sort -u | sed 's|^|.|' > $L
+'''
+
+_ANALYZE_TAIL = r'''
+find / \( PRUNE \) -prune -o -print 2>/dev/null | sort > $W/all
+comm -23 $W/all $W/owned >> $W/delta
+''' + _MERGED + r'''
+echo "list=$L"
+echo "files=$(wc -l < $L)"
+echo "local=$(wc -l < $W/local)"
+echo "#packages"
+awk -F'\t' 'FILENAME == ARGV[1] {keep[$1] = 1; next} $1 in keep' $W/packages $W/versions
+rm -rf $W
+'''
+
+# Arquivos dos pacotes que o destino não instalou, direto para o tar
+_OWNED_SCRIPT = r'''
+export LC_ALL=C
+W=$(mktemp -d /var/tmp/lincon_owned.XXXXXX) || exit 1
+L=$W/list
+QUERY > $W/delta 2>/dev/null
+''' + _MERGED + r'''
+cd / && tar czpf - --numeric-owner --anchored --no-recursion --ignore-failed-read --warning=no-failed-read EXCLUDES -T $L
+status=$?
+rm -rf $W
+[ $status -le 1 ]
+'''
+
+# Consulta dos arquivos de cada pacote por banco
+_OWNED_QUERIES = {"dpkg": "dpkg -L", "rpm": "rpm -ql"}
+
+def _parse_os_release(text):
+    values = {}
+    for line in text.splitlines():
+        key, _, value = line.partition("=")
+        values[key.strip()] = value.strip().strip('"')
+    return values
+
+def detect_base(ssh_command):
+    """Imagem base equivalente à distribuição da origem, ou None se não suportada
+
+    Retorna {"id", "version", "image", "installer", "database"}.
+    """
+    result = subprocess.run(ssh_command + ["cat /etc/os-release"], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    release = _parse_os_release(result.stdout)
+    distro, version = release.get("ID", ""), release.get("VERSION_ID", "")
+
+    if distro not in BASE_IMAGES and "ubuntu" in release.get("ID_LIKE", "") and release.get("UBUNTU_CODENAME"):
+        # Derivadas do Ubuntu (Mint, Pop!_OS): a imagem pelo codinome
+        distro, version = "ubuntu", release["UBUNTU_CODENAME"]
+    if distro not in BASE_IMAGES or not version:
+        return None
+
+    image, installer = BASE_IMAGES[distro]
+    return {
+        "id": distro,
+        "version": version,
+        "image": image.format(major=version.split(".")[0], version=version),
+        "installer": installer,
+        "database": DATABASES[installer],
+    }
+
+def _prune_expression(excluded_paths):
+    """Expressão do find para pular os caminhos excluídos da coleta"""
+    paths = [path[:-2] if path.endswith("/*") else path for path in excluded_paths]
+    return " -o ".join(f"-path {shlex.quote(path)}" for path in paths)
+
+def analyze(ssh_command, base, excluded_paths):
+    """Verifica o banco de pacotes na origem e monta a lista de transferência
+
+    A lista fica em um arquivo temporário na origem (pode ter centenas de
+    milhares de caminhos). Retorna {"list", "files", "local", "packages"},
+    com os pacotes como pares (nome, versão), ou None se a análise falhou.
+    """
+    script = (
+        "export LC_ALL=C\n"
+        "L=$(mktemp /var/tmp/lincon_delta.XXXXXX) || exit 1\n"
+        "W=$(mktemp -d /var/tmp/lincon_pkg.XXXXXX) || exit 1\n"
+        + _DATABASE_COMMANDS[base["database"]].replace("USRMERGE", _USRMERGE)
+        + _ANALYZE_TAIL.replace("PRUNE", _prune_expression(list(excluded_paths) + REGENERATED_PATHS))
+    )
+    with tracer.span("package_analysis", database=base["database"]):
+        result = subprocess.run(ssh_command + ["sh", "-s"], input=script, capture_output=True, text=True)
+    header, _, packages = result.stdout.partition("#packages\n")
+    values = dict(line.split("=", 1) for line in header.splitlines() if "=" in line)
+    if result.returncode != 0 or "list" not in values:
+        logger.error(f"Análise de pacotes falhou: {result.stderr.strip()[:200]}")
+        return None
+    return {
+        "list": values["list"],
+        "files": int(values.get("files", 0)),
+        "local": int(values.get("local", 0)),
+        "packages": [tuple(line.split("\t", 1)) for line in packages.splitlines() if "\t" in line],
+    }
+
+def pinned(installer, packages):
+    """Especificações `nome=versão` (no formato do instalador) -> nome do pacote"""
+    return {PIN_FORMATS[installer].format(name=name, version=version): name for name, version in packages}
+
+def _collect_script(ssh_command, script, out, name):
+    process = tracer.watch(subprocess.Popen(ssh_command + ["sh", "-s"], stdin=subprocess.PIPE, stdout=out), name)
+    process.stdin.write(script.encode())
+    process.stdin.close()
+    return process.wait() == 0
+
+def collect_repos(ssh_command, base, out):
+    """Grava em `out` o tar.gz com a configuração de repositórios da origem"""
+    paths = " ".join(shlex.quote("." + path) for path in REPO_PATHS[base["database"]])
+    script = (
+        "cd / && tar czpf - --numeric-owner --ignore-failed-read --warning=no-failed-read "
+        f"{paths} 2>/dev/null; [ $? -le 2 ]\n"
+    )
+    return _collect_script(ssh_command, script, out, "collect_repos")
+
+def collect_owned(ssh_command, base, names, excluded_paths, out):
+    """Grava em `out` o tar.gz com os arquivos dos pacotes `names` na origem"""
+    query = f"{_OWNED_QUERIES[base['database']]} {' '.join(shlex.quote(name) for name in names)}"
+    excludes = " ".join(f"--exclude {shlex.quote(path)}" for path in excluded_paths)
+    script = _OWNED_SCRIPT.replace("QUERY", query).replace("EXCLUDES", excludes)
+    return _collect_script(ssh_command, script, out, "collect_owned")
+
+def missing_packages(image):
+    """Especificações que a imagem construída não conseguiu instalar"""
+    result = subprocess.run(
+        ["docker", "run", "--rm", "--entrypoint", "cat", image, MISSING_FILE],
+        capture_output=True, text=True
+    )
+    return result.stdout.split() if result.returncode == 0 else []
+
+def collect_delta(ssh_command, analysis, excluded_paths, out):
+    """Grava em `out` o tar.gz com os caminhos da análise (e apaga a lista remota)"""
+    excludes = " ".join(f"--exclude {shlex.quote(path)}" for path in excluded_paths)
+    command = (
+        f"cd / && tar czpf - --numeric-owner --anchored --no-recursion --ignore-failed-read --warning=no-failed-read {excludes} "
+        f"-T {shlex.quote(analysis['list'])}; status=$?; rm -f {shlex.quote(analysis['list'])}; "
+        # 1: arquivos que mudaram durante a leitura, como no tar da coleta completa
+        "[ $status -le 1 ]"
+    )
+    process = tracer.watch(subprocess.Popen(ssh_command + [command], stdout=out), "collect_delta")
+    return process.wait() == 0
+
+def install_lines(installer, packages_file, repos_archive=None):
+    """Linhas do Dockerfile que reinstalam os pacotes listados em `packages_file`
+
+    `packages_file` traz as versões fixadas (ver `pinned`) e `repos_archive`
+    a configuração de repositórios da origem. Se a instalação em lote
+    falhar, tenta um pacote por vez e registra os que não foram instalados
+    em MISSING_FILE (ver `missing_packages`).
+    """
+    prepare, install, clean = INSTALLERS[installer]
+    lines = []
+    if repos_archive:
+        if installer in _BOOTSTRAP:
+            lines.append(f"RUN {_BOOTSTRAP[installer]}")
+        lines.append(f"ADD {repos_archive} /")
+    lines.append(f"COPY {packages_file} /tmp/lincon-packages.txt")
+    lines.append(
+        f"RUN {_REFRESH.get(installer, prepare)}touch {MISSING_FILE} && "
+        # `env`: o xargs não entende atribuições de variável antes do comando
+        f"(xargs env {install} < /tmp/lincon-packages.txt || "
+        f"xargs -n 1 sh -c '{install} \"$0\" || echo \"$0\" >> {MISSING_FILE}' < /tmp/lincon-packages.txt) "
+        f"&& {clean}"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,174 @@
+import json
+import socket
+import subprocess
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('lincon')
+
+# Velocidade relativa de cada tipo de storage (1.0 = disco local rápido)
+TYPE_SPEED = {
+    "zfspool": 1.0,
+    "lvmthin": 1.0,
+    "lvm": 0.9,
+    "btrfs": 0.9,
+    "rbd": 0.8,
+    "cephfs": 0.6,
+    "dir": 0.6,
+    "glusterfs": 0.5,
+    "nfs": 0.4,
+    "cifs": 0.3,
+}
+
+# Storages thin só consomem o que foi escrito, não o tamanho do disco
+THIN_TYPES = {"zfspool", "lvmthin", "btrfs", "rbd", "cephfs"}
+
+# Margem exigida sobre o espaço necessário
+HEADROOM = 1.1
+
+# Pesos do score: espaço livre após a migração, velocidade, carga de I/O
+WEIGHT_FREE = 0.5
+WEIGHT_SPEED = 0.3
+WEIGHT_LOAD = 0.2
+LOCAL_BONUS = 0.05
+
+def default_runner(command):
+    """Executa um comando e retorna a saída; substituível nos testes"""
+    return subprocess.run(command, capture_output=True, text=True, check=True).stdout
+
+class PlacementEngine:
+    """Escolhe storage e node para um container LXC
+
+    Todas as consultas ao Proxmox passam por `runner(command) -> stdout`,
+    permitindo simular `pvesh` sem um cluster real.
+    """
+    def __init__(self, runner=default_runner, max_workers=8):
+        self.runner = runner
+        self.max_workers = max_workers
+
+    def _pvesh(self, path, *params):
+        output = self.runner(["pvesh", "get", path, "--output-format", "json", *params])
+        return json.loads(output or "null")
+
+    def local_node(self):
+        """Nome do node onde o LINCON está rodando"""
+        try:
+            for entry in self._pvesh("/cluster/status"):
+                if entry.get("type") == "node" and entry.get("local"):
+                    return entry["name"]
+        except (subprocess.CalledProcessError, FileNotFoundError, ValueError, TypeError):
+            pass
+        return socket.gethostname().split(".")[0]
+
+    def list_nodes(self):
+        """Nodes online do cluster (ou apenas o local, fora de um cluster)"""
+        try:
+            nodes = self._pvesh("/nodes")
+            return [node["node"] for node in nodes if node.get("status", "online") == "online"]
+        except (subprocess.CalledProcessError, FileNotFoundError, ValueError, TypeError):
+            return [self.local_node()]
+
+    def used_ids(self):
+        """VMIDs já usados no cluster (VMs e CTs); sem pvesh, os CTs do `pct list`"""
+        try:
+            return {int(entry["vmid"]) for entry in self._pvesh("/cluster/resources", "--type", "vm") or []}
+        except (subprocess.CalledProcessError, FileNotFoundError, ValueError, TypeError, KeyError):
+            pass
+        try:
+            output = self.runner(["pct", "list"])
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            return set()
+        return {int(line.split()[0]) for line in output.splitlines()[1:] if line.strip()}
+
+    def _io_load(self, node):
+        """Fração de iowait mais recente do node (0 se indisponível)"""
+        try:
+            samples = self._pvesh(f"/nodes/{node}/rrddata", "--timeframe", "hour")
+        except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+            return 0.0
+        for sample in reversed(samples or []):
+            if sample.get("iowait") is not None:
+                return min(float(sample["iowait"]), 1.0)
+        return 0.0
+
+    def _node_storages(self, node):
+        """Storages de um node com capacidade e carga"""
+        try:
+            storages = self._pvesh(f"/nodes/{node}/storage")
+        except (subprocess.CalledProcessError, FileNotFoundError, ValueError) as e:
+            logger.warning(f"Falha ao consultar storages do node {node}: {e}")
+            return []
+
+        load = self._io_load(node)
+        result = []
+        for storage in storages or []:
+            result.append({
+                "node": node,
+                "storage": storage["storage"],
+                "type": storage.get("type", ""),
+                "content": storage.get("content", ""),
+                "active": bool(storage.get("active", 0)),
+                "shared": bool(storage.get("shared", 0)),
+                "total": int(storage.get("total", 0)),
+                "used": int(storage.get("used", 0)),
+                "avail": int(storage.get("avail", 0)),
+                "load": load,
+            })
+        return result
+
+    def collect(self):
+        """Coleta capacidade e utilização de todos os storages, em paralelo por node"""
+        nodes = self.list_nodes()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(nodes) or 1)) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, self._node_storages, node) for node in nodes]
+            per_node = [future.result() for future in futures]
+        return [storage for storages in per_node for storage in storages]
+
+    def rank(self, storages, rootsize_bytes, inventory_bytes, local_node=None):
+        """Ordena os storages adequados do melhor para o pior
+
+        Storages thin precisam comportar o inventário; storages thick
+        precisam comportar o disco inteiro (`rootsize`).
+        """
+        candidates = []
+        for storage in storages:
+            if not storage["active"] or "rootdir" not in storage["content"]:
+                continue
+
+            thin = storage["type"] in THIN_TYPES
+            required = inventory_bytes if thin else rootsize_bytes
+            if storage["avail"] < required * HEADROOM or not storage["total"]:
+                continue
+
+            free_after = (storage["avail"] - required) / storage["total"]
+            score = (
+                WEIGHT_FREE * free_after
+                + WEIGHT_SPEED * TYPE_SPEED.get(storage["type"], 0.5)
+                + WEIGHT_LOAD * (1 - storage["load"])
+            )
+            if storage["node"] == local_node:
+                score += LOCAL_BONUS
+
+            candidates.append(dict(storage, thin=thin, required=required, score=round(score, 4)))
+
+        return sorted(candidates, key=lambda c: c["score"], reverse=True)
+
+    def place(self, rootsize_bytes, inventory_bytes, local_only=False):
+        """Retorna os candidatos ordenados para uma migração"""
+        local_node = self.local_node()
+        storages = self.collect()
+        if local_only:
+            storages = [s for s in storages if s["node"] == local_node]
+        return self.rank(storages, rootsize_bytes, inventory_bytes, local_node)
+
+def estimate_inventory(ssh_command):
+    """Bytes usados na raiz do host remoto (0 se não for possível medir)"""
+    result = subprocess.run(
+        ssh_command + ["df", "-B1", "--output=used", "/"],
+        capture_output=True, text=True
+    )
+    try:
+        return int(result.stdout.splitlines()[-1])
+    except (IndexError, ValueError):
+        return 0
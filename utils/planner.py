@@ -0,0 +1,206 @@
+import json
+import shlex
+import statistics
+import subprocess
+import logging
+from pathlib import Path
+from datetime import datetime
+
+logger = logging.getLogger('lincon')
+
+# Quantas migrações recentes entram na calibração
+HISTORY_WINDOW = 20
+
+# Valores usados enquanto não há histórico para calibrar (bytes/s e razão)
+DEFAULT_LINK_SPEED = 100 * 1024 ** 2
+DEFAULT_GZIP_RATIO = 0.5
+DEFAULT_EXTRACT_RATE = 150 * 1024 ** 2
+
+# Codecs que a coleta sabe executar: vazão na origem e razão relativa ao
+# gzip -6 (a do adaptativo é calibrada pelo histórico quando houver)
+CODECS = {
+    "gzip": {"speed": 60 * 1024 ** 2, "ratio_vs_gzip": 1.0},
+    "adaptive": {"speed": 120 * 1024 ** 2, "ratio_vs_gzip": 1.05},
+}
+
+# Amostra de arquivos da origem usada para estimar a razão de compressão
+SAMPLE_COMMAND = (
+    "find / -xdev -type f -size -4M 2>/dev/null | shuf -n 300 2>/dev/null"
+    " | tar cf - -T - 2>/dev/null | head -c 67108864 | tee >(wc -c >&2) | gzip -6 | wc -c"
+)
+
+def _history_file():
+    path = Path(__file__).parent.parent / "state" / "metrics"
+    path.mkdir(parents=True, exist_ok=True)
+    return path / "history.jsonl"
+
+def destination_key(kind, data):
+    """Identifica o destino para calibração (storage do Proxmox ou Docker local)"""
+    if kind == "lxc":
+        return f"lxc:{data.get('node') or 'local'}:{data.get('storage')}"
+    return "docker"
+
+def record_migration(kind, data, metrics):
+    """Acrescenta as métricas de uma migração concluída ao histórico"""
+    entry = dict(
+        metrics,
+        kind=kind,
+        destination=destination_key(kind, data),
+        target=data.get("target"),
+        timestamp=datetime.now().isoformat(),
+    )
+    with open(_history_file(), 'a') as f:
+        f.write(json.dumps(entry) + "\n")
+
+def load_history():
+    history_file = _history_file()
+    if not history_file.exists():
+        return []
+    entries = []
+    with open(history_file, 'r') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+def _median(values, default):
+    values = [value for value in values if value and value > 0]
+    return statistics.median(values[-HISTORY_WINDOW:]) if values else default
+
+def calibrate(history, destination, target=None):
+    """Velocidade do link, razão de compressão e taxa de extração medidas
+
+    A velocidade do link usa as migrações tar completas (a replicação
+    nativa e os incrementais mandam bem menos bytes) da mesma origem
+    quando houver; a taxa de extração usa as do mesmo destino.
+    """
+    tar_history = [h for h in history if h.get("engine") == "tar"]
+    same_target = [h for h in tar_history if target and h.get("target") == target] or tar_history
+    same_destination = [h for h in history if h.get("destination") == destination] or history
+
+    link = _median(
+        [h["transferred_bytes"] / h["transfer_seconds"] for h in same_target
+         if h.get("transfer_seconds")], DEFAULT_LINK_SPEED
+    )
+    ratio = _median(
+        [h["transferred_bytes"] / h["source_bytes"] for h in history
+         if h.get("engine") == "tar" and h.get("codec", "gzip") == "gzip" and h.get("source_bytes")],
+        DEFAULT_GZIP_RATIO
+    )
+    extract = _median(
+        [h["source_bytes"] / h["extract_seconds"] for h in same_destination
+         if h.get("extract_seconds") and h.get("source_bytes")], DEFAULT_EXTRACT_RATE
+    )
+    # O agente adaptativo mede o gzip -6 numa amostra do próprio stream
+    adaptive = _median(
+        [h["compression"]["ratio"] / h["compression"]["baseline_ratio"] for h in history
+         if h.get("codec") == "adaptive" and (h.get("compression") or {}).get("baseline_ratio")],
+        CODECS["adaptive"]["ratio_vs_gzip"]
+    )
+    return {
+        "link_speed": link,
+        "gzip_ratio": ratio,
+        "adaptive_vs_gzip": adaptive,
+        "extract_rate": extract,
+        "samples": len(history),
+    }
+
+def inventory(ssh_command, sample=True):
+    """Inventário pré-migração da origem: bytes, inodes e razão gzip amostrada"""
+    result = subprocess.run(
+        ssh_command + ["df", "-B1", "--output=used,iused", "/"],
+        capture_output=True, text=True, check=True
+    )
+    used, inodes = (int(value) for value in result.stdout.splitlines()[-1].split())
+    info = {"source_bytes": used, "files": inodes, "sample_ratio": None}
+
+    if sample:
+        sampled = subprocess.run(
+            ssh_command + [f"bash -c {shlex.quote(SAMPLE_COMMAND)}"],
+            capture_output=True, text=True
+        )
+        try:
+            raw = int(sampled.stderr.strip().splitlines()[-1])
+            compressed = int(sampled.stdout.strip())
+            if raw > 0:
+                info["sample_ratio"] = compressed / raw
+        except (IndexError, ValueError):
+            pass
+    return info
+
+def predict(kind, source_bytes, calibration, engine="tar", codec="gzip", ratio=None, thin=True, rootsize_bytes=0):
+    """Previsão de bytes na rede, tempo total e uso de disco no destino"""
+    gzip_ratio = ratio or calibration["gzip_ratio"]
+
+    if engine in ("zfs", "btrfs"):
+        # Stream nativo: sem compressão e sem etapa de extração
+        wire = source_bytes
+        transfer = wire / calibration["link_speed"]
+        extract = 0
+    else:
+        codec_info = CODECS[codec]
+        ratio_vs_gzip = calibration.get(f"{codec}_vs_gzip", codec_info["ratio_vs_gzip"])
+        wire = source_bytes * min(gzip_ratio * ratio_vs_gzip, 1.0)
+        # Compressão e rede trabalham em pipeline: vale o mais lento
+        transfer = max(wire / calibration["link_speed"], source_bytes / codec_info["speed"])
+        extract = source_bytes / calibration["extract_rate"]
+
+    if kind == "docker":
+        # Tarball temporário + camada da imagem
+        disk = wire + source_bytes if engine == "tar" else source_bytes
+    else:
+        rootfs = source_bytes if thin else max(rootsize_bytes, source_bytes)
+        disk = rootfs + (wire if engine == "tar" else 0)
+
+    return {
+        "engine": engine,
+        "codec": codec if engine == "tar" else None,
+        "wire_bytes": int(wire),
+        "transfer_seconds": round(transfer, 1),
+        "extract_seconds": round(extract, 1),
+        "total_seconds": round(transfer + extract, 1),
+        "disk_bytes": int(disk),
+    }
+
+def plan(kind, source_bytes, calibration, native_engine=None, ratio=None, thin=True, rootsize_bytes=0,
+         codecs=tuple(CODECS)):
+    """Previsões para as opções de motor/codec que a migração pode executar
+
+    `codecs` são os codecs disponíveis na origem (o adaptativo precisa de
+    python3); o motor nativo só entra quando origem e storage permitem.
+    """
+    options = [("tar", codec) for codec in codecs]
+    if native_engine:
+        options.append((native_engine, None))
+    return [
+        predict(kind, source_bytes, calibration, engine, codec, ratio, thin, rootsize_bytes)
+        for engine, codec in options
+    ]
+
+def choose(predictions, window_seconds=None, free_bytes=None):
+    """Escolhe a opção mais rápida que cabe na janela e no disco
+
+    Retorna (opção, cabe) — se nada couber, a mais rápida é retornada
+    com cabe=False para ser sinalizada.
+    """
+    ordered = sorted(predictions, key=lambda p: p["total_seconds"])
+    for prediction in ordered:
+        fits_window = window_seconds is None or prediction["total_seconds"] <= window_seconds
+        fits_disk = free_bytes is None or prediction["disk_bytes"] <= free_bytes
+        if fits_window and fits_disk:
+            return prediction, True
+    return ordered[0], False
+
+def apply_choice(kind, data, choice):
+    """Cópia de `data` configurada para executar a opção escolhida
+
+    O codec vai em "compression"; em LXC, "engine" é "tar" ou "native".
+    """
+    data = dict(data)
+    if choice["engine"] == "tar":
+        data["compression"] = choice["codec"]
+    if kind == "lxc":
+        data["engine"] = "tar" if choice["engine"] == "tar" else "native"
+    return data
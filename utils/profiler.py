@@ -0,0 +1,236 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import subprocess
+import sys
+import threading
+import time
+import logging
+
+logger = logging.getLogger('lincon')
+
+# Intervalo de amostragem de CPU/RSS dos processos filhos, em segundos
+SAMPLE_INTERVAL = 0.1
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+class _NullSpan:
+    """Span usado com o profiling desligado: não registra nada"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class _Span:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = self.tracer.now()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.args["error"] = str(exc)
+        self.tracer.complete(self.name, self.start, self.tracer.now() - self.start, self.args)
+        return False
+
+    def set(self, **args):
+        """Adiciona argumentos ao span (ex.: bytes transferidos)"""
+        self.args.update(args)
+
+def _read_proc(pid):
+    """Retorna (segundos de CPU, RSS em bytes) de um processo via /proc"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm") as f:
+            rss_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    # utime e stime são os campos 14 e 15 do stat (11 e 12 após o nome)
+    cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    return cpu, rss_pages * PAGE_SIZE
+
+def _process_tree(pid):
+    """PID e descendentes (ex.: sshpass -> ssh), quando o kernel expõe children"""
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+# Argumentos cujo valor seguinte nunca vai para o trace
+SECRET_FLAGS = {"--password"}
+
+def _command_line(args):
+    """Linha de comando do processo, sem senhas (sshpass -p, pct --password)"""
+    if isinstance(args, str):
+        return args
+    args = [str(arg) for arg in args]
+    redacted = []
+    for i, arg in enumerate(args):
+        previous = args[i - 1] if i else ""
+        if previous in SECRET_FLAGS or (previous == "-p" and i >= 2 and args[i - 2] == "sshpass"):
+            arg = "***"
+        redacted.append(arg)
+    return " ".join(redacted)
+
+class Tracer:
+    """Coleta spans e amostras de processos no formato Chrome trace
+
+    Desligado por padrão: `span()` devolve um objeto nulo compartilhado e
+    `run()`/`watch()` repassam direto para o subprocess.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.profile = None
+        self.thread_profiles = []
+
+    def enable(self, python_profile=False):
+        self.enabled = True
+        self.origin = time.perf_counter()
+        if python_profile:
+            # O cProfile só mede a thread que o ligou: as threads criadas
+            # depois (workers, fan-out, coletores) ganham um profiler próprio
+            threading.setprofile(self._profile_thread)
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def _profile_thread(self, *args):
+        """Liga um profiler na thread nova (hook do `threading.setprofile`)"""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: o profiler principal (sys.monitoring) já mede todas as threads
+            sys.setprofile(None)
+            return
+        with self.lock:
+            self.thread_profiles.append(profile)
+
+    def now(self):
+        """Microssegundos desde o início do trace"""
+        return (time.perf_counter() - self.origin) * 1_000_000
+
+    def _add(self, event):
+        event.setdefault("pid", os.getpid())
+        event.setdefault("tid", threading.get_ident())
+        with self.lock:
+            self.events.append(event)
+
+    def complete(self, name, start, duration, args=None, tid=None):
+        event = {"name": name, "ph": "X", "ts": start, "dur": duration, "args": args or {}}
+        if tid is not None:
+            event["tid"] = tid
+        self._add(event)
+
+    def counter(self, name, values, tid=None):
+        event = {"name": name, "ph": "C", "ts": self.now(), "args": values}
+        if tid is not None:
+            event["tid"] = tid
+        self._add(event)
+
+    def span(self, name, **args):
+        """Context manager que registra a duração de uma etapa"""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, args)
+
+    def _sample(self, process, name):
+        """Amostra CPU e RSS da árvore do processo até ele terminar"""
+        start = self.now()
+        cpu_total, rss_peak, last_cpu, last_time = 0.0, 0, None, time.perf_counter()
+        while process.poll() is None:
+            samples = [_read_proc(pid) for pid in _process_tree(process.pid)]
+            samples = [sample for sample in samples if sample]
+            if samples:
+                cpu = sum(sample[0] for sample in samples)
+                rss = sum(sample[1] for sample in samples)
+                now = time.perf_counter()
+                if last_cpu is not None and now > last_time:
+                    self.counter(f"{name} cpu%", {"cpu": round(100 * (cpu - last_cpu) / (now - last_time), 1)}, tid=process.pid)
+                self.counter(f"{name} rss", {"rss_mb": round(rss / 1024 ** 2, 1)}, tid=process.pid)
+                cpu_total, rss_peak = max(cpu_total, cpu), max(rss_peak, rss)
+                last_cpu, last_time = cpu, now
+            time.sleep(SAMPLE_INTERVAL)
+        self.complete(name, start, self.now() - start, {
+            "command": _command_line(process.args),
+            "returncode": process.returncode,
+            "cpu_seconds": round(cpu_total, 3),
+            "rss_peak_mb": round(rss_peak / 1024 ** 2, 1),
+        }, tid=process.pid)
+
+    def watch(self, process, name):
+        """Acompanha um Popen já iniciado em segundo plano"""
+        if self.enabled:
+            threading.Thread(target=self._sample, args=(process, name), daemon=True).start()
+        return process
+
+    def run(self, command, name=None, input=None, capture_output=False, check=False, **kwargs):
+        """Equivalente a `subprocess.run`, amostrando o processo quando ligado"""
+        if not self.enabled:
+            return subprocess.run(command, input=input, capture_output=capture_output, check=check, **kwargs)
+
+        if capture_output:
+            kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+        if input is not None:
+            kwargs["stdin"] = subprocess.PIPE
+        with subprocess.Popen(command, **kwargs) as process:
+            sampler = threading.Thread(target=self._sample, args=(process, name or command[0]), daemon=True)
+            sampler.start()
+            stdout, stderr = process.communicate(input)
+        sampler.join()
+
+        result = subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+        if check:
+            result.check_returncode()
+        return result
+
+    def write(self, path):
+        """Grava o trace (e o perfil do cProfile, se houver) ao lado de `path`
+
+        O perfil junta o da thread principal com o de cada thread criada
+        durante a execução.
+        """
+        trace = {"traceEvents": self.events, "displayTimeUnit": "ms"}
+
+        if self.profile:
+            threading.setprofile(None)
+            self.profile.disable()
+            summary = io.StringIO()
+            stats = pstats.Stats(self.profile, stream=summary)
+            with self.lock:
+                for profile in self.thread_profiles:
+                    stats.add(profile)
+                threads = len(self.thread_profiles) + 1
+            profile_path = path.with_suffix(".prof")
+            stats.dump_stats(profile_path)
+            stats.sort_stats("cumulative").print_stats(25)
+            trace["pythonProfile"] = {"file": str(profile_path), "threads": threads, "top": summary.getvalue()}
+
+        with open(path, 'w') as f:
+            json.dump(trace, f)
+        logger.info(f"Trace de profiling gravado em {path}")
+        return path
+
+tracer = Tracer()
@@ -0,0 +1,282 @@
+import base64
+import contextvars
+import gzip
+import hashlib
+import json
+import re
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import time
+import logging
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.exceptions import MigrationError
+
+logger = logging.getLogger('lincon')
+
+CHUNK_SIZE = 8 * 1024 * 1024
+MAX_WORKERS = 4
+GZIP_LEVEL = 6
+
+DOCKER_HUB = "registry-1.docker.io"
+
+MEDIA_MANIFEST = "application/vnd.oci.image.manifest.v1+json"
+MEDIA_CONFIG = "application/vnd.oci.image.config.v1+json"
+MEDIA_LAYER = "application/vnd.oci.image.layer.v1.tar+gzip"
+
+def parse_reference(reference):
+    """Separa "host[:porta]/repo:tag" em (registry, repositório, tag)"""
+    name, tag = reference, "latest"
+    if ":" in reference.rsplit("/", 1)[-1]:
+        name, tag = reference.rsplit(":", 1)
+
+    first, _, rest = name.partition("/")
+    if rest and ("." in first or ":" in first or first == "localhost"):
+        return first, rest, tag
+
+    # Sem host explícito: Docker Hub
+    if "/" not in name:
+        name = f"library/{name}"
+    return DOCKER_HUB, name, tag
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return f"sha256:{digest.hexdigest()}"
+
+def _uploads_dir():
+    path = Path(__file__).parent.parent / "state" / "uploads"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+class RegistryClient:
+    """Cliente mínimo da API HTTP v2 de registries OCI/Docker"""
+    def __init__(self, registry, repository, username=None, password=None, insecure=False):
+        self.registry = registry
+        self.repository = repository
+        self.username = username
+        self.password = password
+        scheme = "http" if insecure else "https"
+        self.base_url = f"{scheme}://{registry}/v2/{repository}"
+        self.token = None
+
+    def _basic_auth(self):
+        credentials = f"{self.username}:{self.password}".encode()
+        return "Basic " + base64.b64encode(credentials).decode()
+
+    def _fetch_token(self, challenge):
+        """Obtém um token Bearer a partir do cabeçalho WWW-Authenticate"""
+        params = dict(re.findall(r'(\w+)="([^"]*)"', challenge))
+        realm = params.pop("realm")
+        url = f"{realm}?{urllib.parse.urlencode(params)}"
+        request = urllib.request.Request(url)
+        if self.username:
+            request.add_header("Authorization", self._basic_auth())
+        with urllib.request.urlopen(request) as response:
+            body = json.load(response)
+        self.token = body.get("token") or body.get("access_token")
+
+    def request(self, method, url, data=None, headers=None, retry_auth=True):
+        """Faz uma requisição autenticada; retorna (status, headers, corpo)"""
+        if not url.startswith("http"):
+            url = self.base_url + url
+        request = urllib.request.Request(url, data=data, method=method, headers=headers or {})
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        elif self.username:
+            request.add_header("Authorization", self._basic_auth())
+
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            challenge = e.headers.get("WWW-Authenticate", "")
+            if e.code == 401 and retry_auth and challenge.startswith("Bearer"):
+                self._fetch_token(challenge)
+                return self.request(method, url, data, headers, retry_auth=False)
+            return e.code, e.headers, e.read()
+
+    def _absolute(self, location):
+        return urllib.parse.urljoin(self.base_url, location)
+
+    def blob_exists(self, digest):
+        status, _, _ = self.request("HEAD", f"/blobs/{digest}")
+        return status == 200
+
+    def _resume_offset(self, location):
+        """Offset já recebido por um upload em andamento (None se expirou)
+
+        O Range é inclusivo: "0-0" já contém o byte 0. Sem Range (ou com
+        "0--1"), nada foi recebido.
+        """
+        status, headers, _ = self.request("GET", location)
+        if status != 204:
+            return None
+        _, _, end = headers.get("Range", "0--1").partition("-")
+        return int(end) + 1
+
+    def upload_blob(self, path, digest, progress_file):
+        """Envia um blob em chunks, retomando um upload anterior se possível
+
+        Retorna o número de bytes efetivamente enviados.
+        """
+        size = path.stat().st_size
+        location, offset, resumed = None, 0, False
+
+        if progress_file.exists():
+            saved = json.loads(progress_file.read_text())
+            offset = self._resume_offset(saved["location"])
+            if offset is not None:
+                location, resumed = saved["location"], True
+                logger.info(f"Retomando upload de {digest} a partir de {offset} bytes")
+
+        if location is None:
+            status, headers, body = self.request("POST", "/blobs/uploads/")
+            if status != 202:
+                raise MigrationError(f"Registry recusou o upload ({status}): {body[:200]!r}")
+            location, offset = self._absolute(headers["Location"]), 0
+
+        sent = 0
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while offset < size:
+                chunk = f.read(CHUNK_SIZE)
+                end = offset + len(chunk) - 1
+                status, headers, body = self.request("PATCH", location, data=chunk, headers={
+                    "Content-Type": "application/octet-stream",
+                    "Content-Range": f"{offset}-{end}",
+                    "Content-Length": str(len(chunk)),
+                })
+                if status == 416 and resumed:
+                    # O registry não aceita o offset retomado: recomeça do zero
+                    logger.info(f"Offset {offset} recusado, reenviando {digest} desde o início")
+                    progress_file.unlink(missing_ok=True)
+                    return sent + self.upload_blob(path, digest, progress_file)
+                if status != 202:
+                    raise MigrationError(f"Falha no envio do chunk {offset}-{end} ({status})")
+                location = self._absolute(headers["Location"])
+                offset, sent = end + 1, sent + len(chunk)
+                progress_file.write_text(json.dumps({"location": location, "offset": offset}))
+
+        separator = "&" if "?" in location else "?"
+        status, _, body = self.request(
+            "PUT", f"{location}{separator}digest={urllib.parse.quote(digest)}",
+            data=b"", headers={"Content-Length": "0"}
+        )
+        if status != 201:
+            raise MigrationError(f"Registry rejeitou o blob {digest} ({status}): {body[:200]!r}")
+        progress_file.unlink(missing_ok=True)
+        return sent
+
+    def put_manifest(self, tag, manifest):
+        status, _, body = self.request(
+            "PUT", f"/manifests/{tag}", data=manifest,
+            headers={"Content-Type": MEDIA_MANIFEST}
+        )
+        if status != 201:
+            raise MigrationError(f"Registry rejeitou o manifesto ({status}): {body[:200]!r}")
+
+def export_image(image, work_dir):
+    """Exporta a imagem com `docker save` e prepara os blobs OCI
+
+    Retorna (config, camadas), cada blob como {"path", "digest", "size"};
+    as camadas são comprimidas com gzip em paralelo.
+    """
+    work_dir = Path(work_dir)
+    extracted = work_dir / "image"
+    extracted.mkdir(parents=True, exist_ok=True)
+
+    save = subprocess.Popen(["docker", "save", image], stdout=subprocess.PIPE)
+    with tarfile.open(fileobj=save.stdout, mode="r|") as archive:
+        archive.extractall(extracted)
+    if save.wait() != 0:
+        raise MigrationError(f"docker save falhou para {image}")
+
+    manifest = json.loads((extracted / "manifest.json").read_text())[0]
+
+    def compress(layer):
+        source = extracted / layer
+        target = work_dir / f"{source.parent.name}-{source.name}.gz"
+        # mtime fixo mantém o digest estável entre exportações da mesma camada
+        with open(source, 'rb') as src, open(target, 'wb') as raw, \
+                gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=GZIP_LEVEL, mtime=0) as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        return {"path": target, "digest": _sha256_file(target), "size": target.stat().st_size}
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, compress, layer) for layer in manifest["Layers"]]
+        layers = [future.result() for future in futures]
+
+    config_path = extracted / manifest["Config"]
+    config = {"path": config_path, "digest": _sha256_file(config_path), "size": config_path.stat().st_size}
+    return config, layers
+
+@contextmanager
+def _workspace(work_dir):
+    """Diretório de trabalho informado (mantido) ou temporário"""
+    if work_dir:
+        Path(work_dir).mkdir(parents=True, exist_ok=True)
+        yield Path(work_dir)
+    else:
+        with tempfile.TemporaryDirectory(prefix="lincon_push_") as temp_dir:
+            yield Path(temp_dir)
+
+def push_image(image, reference, username=None, password=None, insecure=False, work_dir=None):
+    """Publica uma imagem local em um registry OCI
+
+    Blobs já presentes no registry são pulados, os demais são enviados em
+    paralelo e em chunks, retomando uploads interrompidos. Retorna as
+    métricas do envio.
+    """
+    registry, repository, tag = parse_reference(reference)
+    client = RegistryClient(registry, repository, username, password, insecure)
+
+    start = time.monotonic()
+    with _workspace(work_dir) as workspace:
+        config, layers = export_image(image, workspace)
+        blobs = [config] + layers
+
+        def push(blob):
+            if client.blob_exists(blob["digest"]):
+                return 0, True
+            key = f"{registry}/{repository}/{blob['digest'].split(':')[1]}"
+            progress = _uploads_dir() / (re.sub(r"[^\w.-]", "_", key) + ".json")
+            return client.upload_blob(blob["path"], blob["digest"], progress), False
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, push, blob) for blob in blobs]
+            results = [future.result() for future in futures]
+
+        manifest = {
+            "schemaVersion": 2,
+            "mediaType": MEDIA_MANIFEST,
+            "config": {"mediaType": MEDIA_CONFIG, "digest": config["digest"], "size": config["size"]},
+            "layers": [
+                {"mediaType": MEDIA_LAYER, "digest": layer["digest"], "size": layer["size"]}
+                for layer in layers
+            ],
+        }
+        client.put_manifest(tag, json.dumps(manifest).encode())
+
+    elapsed = time.monotonic() - start
+    pushed = sum(sent for sent, _ in results)
+    metrics = {
+        "reference": f"{registry}/{repository}:{tag}",
+        "blobs": len(blobs),
+        "skipped_blobs": sum(1 for _, skipped in results if skipped),
+        "pushed_bytes": pushed,
+        "total_bytes": sum(blob["size"] for blob in blobs),
+        "elapsed": round(elapsed, 3),
+        "throughput": round(pushed / elapsed, 1) if elapsed > 0 else 0,
+    }
+    logger.info(f"Push concluído: {metrics}")
+    return metrics
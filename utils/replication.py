@@ -0,0 +1,323 @@
+import json
+import subprocess
+import logging
+from pathlib import Path
+from datetime import datetime
+
+from utils.profiler import tracer
+
+logger = logging.getLogger('lincon')
+
+# Tipos de storage do Proxmox que aceitam replicação nativa (tipo pvesm -> fs)
+NATIVE_STORAGE_TYPES = {
+    "zfspool": "zfs",
+    "btrfs": "btrfs",
+}
+
+SNAPSHOT_PREFIX = "lincon-"
+
+# Mapeamento de `uname -m` para a arquitetura usada pelo Proxmox
+ARCH_MAP = {
+    "x86_64": "amd64",
+    "aarch64": "arm64",
+    "i686": "i386",
+    "i386": "i386",
+}
+
+def _state_file(ct_id):
+    """Caminho do arquivo que guarda o último snapshot replicado de um container"""
+    state_dir = Path(__file__).parent.parent / "state" / "replication"
+    state_dir.mkdir(parents=True, exist_ok=True)
+    return state_dir / f"{ct_id}.json"
+
+def load_replication_state(ct_id):
+    """Carrega o estado de replicação de um container (vazio se não existir)"""
+    state_file = _state_file(ct_id)
+    if state_file.exists():
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    return {}
+
+def save_replication_state(ct_id, state):
+    """Salva o estado de replicação de um container"""
+    state = dict(state, timestamp=datetime.now().isoformat())
+    with open(_state_file(ct_id), 'w') as f:
+        json.dump(state, f, indent=4)
+
+def is_replica(data, engine):
+    """Se o CT com o ID de `data` foi criado pela replicação desta origem"""
+    state = load_replication_state(data["id"])
+    return (state.get("fs") == engine["fs"] and state.get("source") == engine["source"]
+            and state.get("target") == data["target"])
+
+def nested_volumes(ssh_command, fs, source, root="/"):
+    """Datasets/subvolumes abaixo da raiz replicada na origem
+
+    O snapshot da raiz não os inclui (o tar atravessa para dentro deles).
+    None se a lista não pôde ser obtida.
+    """
+    if fs == "zfs":
+        command = ["zfs", "list", "-H", "-o", "name", "-r", "-t", "filesystem,volume", source]
+    else:
+        command = ["btrfs", "subvolume", "list", "-o", root]
+    result = subprocess.run(ssh_command + command, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    lines = [line.strip() for line in result.stdout.splitlines() if line.strip()]
+    if fs == "zfs":
+        return [name for name in lines if name != source]
+    # "ID 257 gen 10 top level 5 path @/var/lib/machines"; os snapshots
+    # ocultos da própria replicação ficam de fora
+    paths = [line.split(" path ", 1)[-1] for line in lines]
+    return [path for path in paths if not Path(path).name.startswith("." + SNAPSHOT_PREFIX)]
+
+def detect_source_fs(ssh_command):
+    """Retorna (fstype, source) da raiz do host remoto"""
+    result = subprocess.run(
+        ssh_command + ["findmnt", "-n", "-o", "FSTYPE,SOURCE", "/"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None, None
+
+    parts = result.stdout.split()
+    if len(parts) < 2:
+        return None, None
+
+    fstype, source = parts[0], parts[1]
+    # No btrfs o findmnt retorna "/dev/sdX[/subvol]"
+    if fstype == "btrfs" and "[" in source:
+        source = source[source.index("[") + 1:source.rindex("]")]
+    return fstype, source
+
+def detect_source_arch(ssh_command):
+    """Retorna a arquitetura do host remoto no formato do Proxmox"""
+    result = subprocess.run(ssh_command + ["uname", "-m"], capture_output=True, text=True)
+    return ARCH_MAP.get(result.stdout.strip(), "amd64")
+
+def get_storage_config(storage):
+    """Retorna a configuração de um storage do Proxmox"""
+    result = subprocess.run(
+        ["pvesh", "get", f"/storage/{storage}", "--output-format", "json"],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+def select_engine(ssh_command, storage):
+    """Verifica se origem e destino usam o mesmo fs e retorna o motor de replicação
+
+    Retorna um dicionário descrevendo a replicação ou None quando o
+    caminho tar deve ser usado.
+    """
+    try:
+        config = get_storage_config(storage)
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return None
+
+    dest_fs = NATIVE_STORAGE_TYPES.get(config.get("type"))
+    if not dest_fs:
+        return None
+
+    source_fs, source = detect_source_fs(ssh_command)
+    if source_fs != dest_fs:
+        logger.info(f"Sistemas de arquivos diferentes ({source_fs} -> {dest_fs}), usando tar")
+        return None
+
+    nested = nested_volumes(ssh_command, source_fs, source)
+    if nested is None:
+        logger.info(f"Não foi possível listar os volumes {source_fs} da origem, usando tar")
+        return None
+    if nested:
+        logger.info(f"Origem com volumes aninhados ({', '.join(nested[:5])}), usando tar")
+        return None
+
+    # `root`: ponto de montagem snapshotado na origem (btrfs)
+    engine = {"fs": dest_fs, "source": source, "root": "/"}
+    if dest_fs == "zfs":
+        engine["pool"] = config["pool"]
+    else:
+        engine["path"] = config["path"]
+    return engine
+
+def _run_remote(ssh_command, command):
+    subprocess.run(ssh_command + command, check=True, capture_output=True)
+
+def _pipe(send_command, receive_command):
+    """Encadeia `send` remoto com `receive` local, sem passar pelo Python"""
+    sender = tracer.watch(subprocess.Popen(send_command, stdout=subprocess.PIPE), "send")
+    receiver = tracer.watch(subprocess.Popen(receive_command, stdin=sender.stdout), "receive")
+    sender.stdout.close()
+    receive_code = receiver.wait()
+    send_code = sender.wait()
+    return send_code == 0 and receive_code == 0
+
+def _replicate_zfs(ssh_command, engine, ct_id, snapshot, previous):
+    volume = f"subvol-{ct_id}-disk-0"
+    dataset = f"{engine['pool']}/{volume}"
+    source = engine["source"]
+
+    _run_remote(ssh_command, ["zfs", "snapshot", f"{source}@{snapshot}"])
+
+    send = ["zfs", "send"]
+    if previous:
+        has_base = subprocess.run(
+            ["zfs", "list", "-H", "-t", "snapshot", f"{dataset}@{previous}"],
+            capture_output=True
+        ).returncode == 0
+        if has_base:
+            send.extend(["-i", f"@{previous}"])
+        else:
+            logger.warning(f"Snapshot base {previous} ausente no destino, enviando stream completo")
+            previous = None
+    send.append(f"{source}@{snapshot}")
+
+    if not _pipe(ssh_command + send, ["zfs", "receive", "-F", dataset]):
+        return None, previous
+
+    return volume, previous
+
+def _btrfs_snapshot_path(engine, snapshot):
+    """Snapshot na origem: oculto (com ponto) na raiz do fs replicado"""
+    return str(Path(engine.get("root", "/")) / f".{snapshot}")
+
+def _replicate_btrfs(ssh_command, engine, ct_id, snapshot, previous):
+    volume = f"{ct_id}/subvol-{ct_id}-disk-0.subvol"
+    images_dir = Path(engine["path"]) / "images" / str(ct_id)
+    images_dir.mkdir(parents=True, exist_ok=True)
+    # O btrfs receive dá ao subvolume o nome do snapshot enviado (com o ponto)
+    received = images_dir / f".{snapshot}"
+    subvolume = images_dir / f"subvol-{ct_id}-disk-0.subvol"
+
+    # btrfs send exige um snapshot somente leitura da raiz
+    _run_remote(ssh_command, ["btrfs", "subvolume", "snapshot", "-r", engine.get("root", "/"),
+                              _btrfs_snapshot_path(engine, snapshot)])
+
+    send = ["btrfs", "send"]
+    if previous and (images_dir / f".{previous}").exists():
+        send.extend(["-p", _btrfs_snapshot_path(engine, previous)])
+    else:
+        previous = None
+    send.append(_btrfs_snapshot_path(engine, snapshot))
+
+    if not _pipe(ssh_command + send, ["btrfs", "receive", str(images_dir)]):
+        return None, previous
+
+    # O volume do container é um snapshot gravável do que foi recebido
+    if subvolume.exists():
+        subprocess.run(["btrfs", "subvolume", "delete", str(subvolume)], check=True, capture_output=True)
+    subprocess.run(
+        ["btrfs", "subvolume", "snapshot", str(received), str(subvolume)],
+        check=True, capture_output=True
+    )
+    if previous:
+        subprocess.run(
+            ["btrfs", "subvolume", "delete", str(images_dir / f".{previous}")],
+            capture_output=True
+        )
+    return volume, previous
+
+def _cleanup_source_snapshot(ssh_command, engine, snapshot):
+    """Remove da origem o snapshot que deixou de ser base incremental"""
+    if engine["fs"] == "zfs":
+        command = ["zfs", "destroy", f"{engine['source']}@{snapshot}"]
+    else:
+        command = ["btrfs", "subvolume", "delete", _btrfs_snapshot_path(engine, snapshot)]
+    if subprocess.run(ssh_command + command, capture_output=True).returncode != 0:
+        logger.warning(f"Não foi possível remover o snapshot {snapshot} da origem")
+
+def _discard_partial(engine, ct_id):
+    """Remove o volume de uma primeira replicação que falhou (o tar cria outro)"""
+    if engine["fs"] == "zfs":
+        command = [["zfs", "destroy", "-r", f"{engine['pool']}/subvol-{ct_id}-disk-0"]]
+    else:
+        images_dir = Path(engine["path"]) / "images" / str(ct_id)
+        command = [["btrfs", "subvolume", "delete", str(path)] for path in images_dir.glob("*")]
+    for item in command:
+        try:
+            subprocess.run(item, capture_output=True)
+        except OSError:
+            pass
+
+def build_ct_config(data, volume, arch):
+    """Gera o arquivo de configuração do container para o volume replicado"""
+    if data["ip"] == "dhcp":
+        net_param = f"name=eth0,bridge={data['bridge']},ip=dhcp,type=veth"
+    else:
+        net_param = f"name=eth0,bridge={data['bridge']},ip={data['ip']}/24,gw={data['gateway']},type=veth"
+
+    lines = [
+        f"# LXC Migrated: {data['name']} (from {data['target']})",
+        f"arch: {arch}",
+        "cmode: shell",
+        "features: nesting=1",
+        f"hostname: {data['name']}",
+        f"memory: {data['memory']}",
+        "nameserver: 8.8.8.8",
+        f"net0: {net_param}",
+        "onboot: 1",
+        "ostype: unmanaged",
+        f"rootfs: {data['storage']}:{volume},size={data['rootsize']}G",
+        "unprivileged: 0",
+    ]
+    return "\n".join(lines) + "\n"
+
+def replicate(data, ssh_command, engine):
+    """Replica a raiz remota para o storage do container via send/receive
+
+    Na primeira execução envia um stream completo; nas seguintes envia
+    apenas o incremental entre o último snapshot replicado e um novo.
+    Retorna True em caso de sucesso; numa primeira replicação que falhou
+    o volume parcial é removido, para o caminho tar poder criar o CT.
+    """
+    ct_id = data["id"]
+    state = load_replication_state(ct_id)
+    previous = state.get("snapshot") if state.get("fs") == engine["fs"] else None
+    snapshot = f"{SNAPSHOT_PREFIX}{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    config_file = Path("/etc/pve/lxc") / f"{ct_id}.conf"
+    resync = config_file.exists()
+    # ID em uso por outro CT: o `receive -F` destruiria o volume dele
+    if resync and not is_replica(data, engine):
+        logger.error(f"CT {ct_id} já existe e não é uma réplica de {data['target']}; replicação recusada")
+        return False
+
+    if resync:
+        # O receive incremental exige o volume parado e sem alterações locais
+        subprocess.run(["pct", "stop", str(ct_id)], capture_output=True)
+
+    try:
+        if engine["fs"] == "zfs":
+            volume, previous = _replicate_zfs(ssh_command, engine, ct_id, snapshot, previous)
+        else:
+            volume, previous = _replicate_btrfs(ssh_command, engine, ct_id, snapshot, previous)
+    except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode(errors="replace").strip() if isinstance(e.stderr, bytes) else e.stderr
+        logger.error(f"Replicação {engine['fs']} falhou em {' '.join(map(str, e.cmd))}: {stderr}")
+        volume = None
+
+    if not volume:
+        _cleanup_source_snapshot(ssh_command, engine, snapshot)
+        if not resync:
+            _discard_partial(engine, ct_id)
+        return False
+
+    if engine["fs"] == "zfs":
+        subprocess.run(
+            ["zfs", "set", f"refquota={data['rootsize']}G", f"{engine['pool']}/{volume}"],
+            capture_output=True
+        )
+
+    if previous:
+        _cleanup_source_snapshot(ssh_command, engine, previous)
+
+    save_replication_state(ct_id, {
+        "fs": engine["fs"],
+        "snapshot": snapshot,
+        "source": engine["source"],
+        "target": data["target"],
+    })
+
+    if not resync:
+        config_file.write_text(build_ct_config(data, volume, detect_source_arch(ssh_command)))
+
+    logger.info(f"Replicação {engine['fs']} concluída ({'incremental' if previous else 'completa'}) para CT {ct_id}")
+    return True
@@ -0,0 +1,283 @@
+"""Origens que já são hosts de containers (Docker ou LXC)
+
+Coletar a raiz de um host de containers leva junto /var/lib/docker (as
+camadas de todas as imagens) e os rootfs dos guests. Aqui cada container
+da origem é migrado individualmente:
+
+- Docker -> Docker: `docker commit` na origem e `docker save` sem as
+  camadas cuja cadeia já existe no daemon local. O `docker load` só lê o
+  arquivo de uma camada que ele ainda não tem, então as camadas base
+  (debian, alpine, python...) não atravessam a rede.
+- Docker -> LXC: `docker export` (rootfs achatado) como template do pct,
+  só para containers com /sbin/init (o que o LXC executa ao iniciar).
+- LXC -> Docker/LXC: tar do rootfs do guest em vez de /.
+"""
+import json
+import shlex
+import hashlib
+import subprocess
+import time
+import logging
+
+from utils.profiler import tracer
+
+logger = logging.getLogger('lincon')
+
+CHUNK_SIZE = 1024 * 1024
+
+# Um container por linha: "<tipo> <json>"; no Proxmox o ID do LXC é o VMID
+DETECT_SCRIPT = r'''
+if command -v docker >/dev/null 2>&1; then
+    docker ps -a --no-trunc --format '{{json .}}' 2>/dev/null | sed 's/^/docker /'
+fi
+if command -v pct >/dev/null 2>&1; then
+    # Proxmox: o pct lista também os CTs parados (sem config em /var/lib/lxc)
+    pct list 2>/dev/null | awk 'NR > 1 {printf "lxc {\"ID\": \"%s\", \"Names\": \"%s\", \"Image\": \"\", \"State\": \"%s\"}\n", $1, $NF, $2}'
+elif command -v lxc-ls >/dev/null 2>&1; then
+    for n in $(lxc-ls -1 2>/dev/null); do
+        s=$(lxc-info -n "$n" -s -H 2>/dev/null | tr 'A-Z' 'a-z')
+        printf 'lxc {"ID": "%s", "Names": "%s", "Image": "", "State": "%s"}\n' "$n" "$n" "$s"
+    done
+fi
+'''
+
+# Rootfs do guest LXC: /proc/<pid>/root se estiver rodando (qualquer
+# backend de storage), senão o diretório do lxc.rootfs.path
+ROOTFS_SCRIPT = r'''
+P=$(lxc-info -n NAME -p -H 2>/dev/null)
+if [ -n "$P" ]; then echo /proc/$P/root; exit 0; fi
+R=$(lxc-info -n NAME -c lxc.rootfs.path 2>/dev/null | sed 's/^[^=]*= *//; s/^dir://')
+[ -n "$R" ] && [ -d "$R" ] && echo $R
+'''
+
+# Agente executado na origem com `python3 - <imagem>` (script pelo stdin).
+# O `docker save` vai para um arquivo temporário porque o manifest.json,
+# que liga os arquivos às camadas, pode vir no fim do tar. A saída é o
+# tar filtrado em gzip; as estatísticas vão para o stderr.
+SAVE_AGENT = r'''
+import gzip, hashlib, json, os, posixpath, subprocess, sys, tarfile, tempfile
+
+SKIP = set(json.loads(SKIP_CHAINS))
+
+def chains(diff_ids):
+    chain = None
+    for diff_id in diff_ids:
+        if chain is None:
+            chain = diff_id
+        else:
+            chain = "sha256:" + hashlib.sha256((chain + " " + diff_id).encode()).hexdigest()
+        yield chain
+
+def main():
+    fd, path = tempfile.mkstemp(prefix=".lincon_save.", dir="/var/tmp")
+    os.close(fd)
+    try:
+        if subprocess.call(["docker", "save", "-o", path, sys.argv[1]]) != 0:
+            sys.exit(1)
+        with tarfile.open(path) as source:
+            manifest = json.load(source.extractfile("manifest.json"))
+            needed, skipped = set(), set()
+            for entry in manifest:
+                config = json.load(source.extractfile(entry["Config"]))
+                for layer, chain in zip(entry["Layers"], chains(config["rootfs"]["diff_ids"])):
+                    (skipped if chain in SKIP else needed).add(layer)
+            # Camadas repetidas viram symlinks no formato antigo do save
+            for name in list(needed):
+                member = source.getmember(name)
+                if member.issym():
+                    needed.add(posixpath.normpath(posixpath.join(posixpath.dirname(name), member.linkname)))
+            skipped -= needed
+
+            stats = {"layers": len(needed) + len(skipped), "skipped_layers": len(skipped), "skipped_bytes": 0}
+            compressed = gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb", compresslevel=1)
+            with tarfile.open(fileobj=compressed, mode="w|") as out:
+                for member in source:
+                    if member.name in skipped:
+                        stats["skipped_bytes"] += member.size
+                        continue
+                    out.addfile(member, source.extractfile(member) if member.isreg() else None)
+            compressed.close()
+        sys.stderr.write("lincon-save " + json.dumps(stats) + "\n")
+    finally:
+        os.unlink(path)
+
+main()
+'''
+
+def detect(ssh_command):
+    """Containers Docker e LXC da origem
+
+    Lista de {"kind", "id", "name", "image", "state"}; vazia se a origem
+    não tem containers (ou não tem docker/lxc).
+    """
+    result = subprocess.run(ssh_command + ["sh", "-s"], input=DETECT_SCRIPT, capture_output=True, text=True)
+    containers = []
+    for line in result.stdout.splitlines():
+        kind, _, payload = line.partition(" ")
+        try:
+            info = json.loads(payload)
+        except ValueError:
+            continue
+        containers.append({
+            "kind": kind,
+            "id": info["ID"],
+            "name": info["Names"].split(",")[0],
+            "image": info.get("Image", ""),
+            "state": info.get("State", ""),
+        })
+    return containers
+
+def find(ssh_command, reference):
+    """Container da origem pelo nome ou ID (ou prefixo do ID), ou None"""
+    for container in detect(ssh_command):
+        if reference in (container["name"], container["id"]) or (
+                container["kind"] == "docker" and len(reference) >= 12 and container["id"].startswith(reference)):
+            return container
+    return None
+
+def shell_command(ssh_command, container=None):
+    """Comando que executa `sh -s` dentro do container da origem (ou no host)"""
+    if not container:
+        return list(ssh_command) + ["sh", "-s"]
+    if container["kind"] == "docker":
+        return list(ssh_command) + ["docker", "exec", "-i", container["id"], "sh", "-s"]
+    return list(ssh_command) + ["lxc-attach", "-n", container["id"], "--", "sh", "-s"]
+
+def rootfs(ssh_command, container):
+    """Caminho do rootfs de um guest LXC na origem, ou None"""
+    script = ROOTFS_SCRIPT.replace("NAME", shlex.quote(container["id"]))
+    result = subprocess.run(ssh_command + ["sh", "-s"], input=script, capture_output=True, text=True)
+    path = result.stdout.strip()
+    return path or None
+
+def rootfs_command(ssh_command, container, excluded_paths):
+    """Comando remoto que escreve o rootfs do container como tar.gz no stdout
+
+    Docker usa `docker export`; LXC, o tar czpf do rootfs do guest. None se
+    o rootfs do guest não está acessível.
+    """
+    if container["kind"] == "docker":
+        # pipefail (bash, dash, ash) para a falha do export não virar um gzip vazio válido
+        return f"set -o pipefail 2>/dev/null; docker export {shlex.quote(container['id'])} | gzip -1"
+    path = rootfs(ssh_command, container)
+    if not path:
+        return None
+    # Relativos à raiz do arquivo (.), como os nomes dos membros
+    excludes = " ".join(f"--exclude {shlex.quote('.' + excluded)}" for excluded in excluded_paths)
+    return f"cd {shlex.quote(path)} && tar czpf - --numeric-owner --anchored {excludes} ."
+
+def has_init(ssh_command, container):
+    """Se o container Docker da origem tem /sbin/init (funciona parado)"""
+    source = shlex.quote(f"{container['id']}:/sbin/init")
+    result = subprocess.run(ssh_command + [f"docker cp -L {source} - >/dev/null"], capture_output=True)
+    return result.returncode == 0
+
+def port_bindings(ssh_command, container):
+    """Portas publicadas do container Docker da origem ("8080:80,...")"""
+    result = subprocess.run(
+        ssh_command + ["docker", "inspect", "-f", shlex.quote("{{json .HostConfig.PortBindings}}"), container["id"]],
+        capture_output=True, text=True
+    )
+    try:
+        bindings = json.loads(result.stdout) or {}
+    except ValueError:
+        return ""
+    ports = []
+    for container_port, hosts in bindings.items():
+        for host in hosts or []:
+            if host.get("HostPort"):
+                ports.append(f"{host['HostPort']}:{container_port.split('/')[0]}")
+    return ",".join(ports)
+
+def chain_ids(diff_ids):
+    """ChainIDs das camadas: a identidade de uma camada junto com as de baixo"""
+    chains, chain = [], None
+    for diff_id in diff_ids:
+        if chain is None:
+            chain = diff_id
+        else:
+            chain = "sha256:" + hashlib.sha256(f"{chain} {diff_id}".encode()).hexdigest()
+        chains.append(chain)
+    return chains
+
+def local_chains():
+    """ChainIDs de todas as camadas presentes no daemon Docker local"""
+    images = subprocess.run(["docker", "image", "ls", "-q", "--no-trunc"], capture_output=True, text=True).stdout.split()
+    if not images:
+        return set()
+    result = subprocess.run(
+        ["docker", "image", "inspect", "--format", "{{json .RootFS.Layers}}"] + sorted(set(images)),
+        capture_output=True, text=True
+    )
+    chains = set()
+    for line in result.stdout.splitlines():
+        try:
+            chains.update(chain_ids(json.loads(line) or []))
+        except ValueError:
+            continue
+    return chains
+
+def _save_and_load(ssh_command, reference, skip):
+    """Transfere `reference` da origem para o daemon local; estatísticas ou None"""
+    script = SAVE_AGENT.replace("SKIP_CHAINS", repr(json.dumps(sorted(skip))))
+    source = tracer.watch(subprocess.Popen(
+        ssh_command + ["python3", "-", shlex.quote(reference)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    ), "docker_save")
+    source.stdin.write(script.encode())
+    source.stdin.close()
+
+    load = subprocess.Popen(["docker", "load"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    transferred = 0
+    with tracer.span("copy_loop") as span:
+        try:
+            while True:
+                chunk = source.stdout.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                load.stdin.write(chunk)
+                transferred += len(chunk)
+            load.stdin.close()
+        except BrokenPipeError:
+            source.kill()
+        span.set(bytes=transferred)
+    output = load.stdout.read().decode(errors="replace")
+    errors = source.stderr.read().decode(errors="replace")
+    if source.wait() != 0 or load.wait() != 0:
+        logger.error(f"docker save/load de {reference} falhou: {(errors or output).strip()[-300:]}")
+        return None
+
+    stats = {"bytes": transferred}
+    for line in errors.splitlines():
+        if line.startswith("lincon-save "):
+            stats.update(json.loads(line[len("lincon-save "):]))
+    return stats
+
+def transfer_image(ssh_command, container, image):
+    """Leva o container Docker da origem para a imagem local `image`
+
+    O estado atual (camada gravável) entra via `docker commit`; volumes não
+    fazem parte da imagem. Retorna as estatísticas ou None.
+    """
+    reference = f"lincon-export/{container['name'].lower()}:{int(time.time())}"
+    committed = subprocess.run(ssh_command + ["docker", "commit", container["id"], reference], capture_output=True, text=True)
+    if committed.returncode != 0:
+        logger.error(f"docker commit de {container['name']} falhou: {committed.stderr.strip()}")
+        return None
+    try:
+        skip = local_chains()
+        stats = _save_and_load(ssh_command, reference, skip)
+        if stats is None and skip:
+            # Daemons com o image store do containerd exigem todas as camadas
+            logger.warning("docker load sem as camadas locais falhou, enviando a imagem completa")
+            stats = _save_and_load(ssh_command, reference, set())
+    finally:
+        subprocess.run(ssh_command + ["docker", "rmi", reference], capture_output=True)
+    if stats is None:
+        return None
+
+    subprocess.run(["docker", "tag", reference, image], check=True)
+    subprocess.run(["docker", "rmi", reference], capture_output=True)
+    logger.info(f"Imagem de {container['name']}: {stats.get('skipped_layers', 0)}/{stats.get('layers', 0)} "
+                f"camadas já presentes ({stats.get('skipped_bytes', 0)} bytes não enviados)")
+    return stats
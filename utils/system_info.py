@@ -1,10 +1,19 @@
 import platform
 import os
 import subprocess
+import shutil
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
 
+# Tempo de validade do status dos componentes, em segundos
+STATUS_TTL = 30
+PROBE_TIMEOUT = 5
+
+@lru_cache(maxsize=None)
 def get_system_info():
-    """Retorna informações do sistema"""
+    """Retorna informações do sistema (não mudam durante a execução)"""
     info = {
         "os": platform.system(),
         "release": platform.release(),
@@ -31,9 +40,108 @@ def get_lincon_version():
     """Retorna a versão atual do LINCON"""
     return "0.1.0-dev"
 
-def get_system_status():
-    """Retorna o status dos componentes do sistema"""
+def _probe(command):
+    """Executa um comando de verificação e retorna a primeira linha (None se falhar)"""
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=PROBE_TIMEOUT)
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip().splitlines()[0] if result.stdout.strip() else ""
+
+def probe_components():
+    """Verifica Docker e Proxmox (daemon acessível, versões, pct/pvesm)"""
+    docker_version = _probe(["docker", "--version"])
+    docker_server = _probe(["docker", "info", "--format", "{{.ServerVersion}}"]) if docker_version else None
+    pct = shutil.which("pct")
+    pvesm = shutil.which("pvesm")
     return {
-        "docker": check_docker(),
-        "proxmox": check_proxmox(),
+        "docker": docker_version is not None,
+        "docker_version": docker_version,
+        "docker_daemon": bool(docker_server),
+        "docker_server_version": docker_server or None,
+        "proxmox": bool(pct and pvesm),
+        "pct": bool(pct),
+        "pvesm": bool(pvesm),
+        "proxmox_version": _probe(["pveversion"]) if pct else None,
     }
+
+class StatusCache:
+    """Cache do status dos componentes, renovado em segundo plano
+
+    `get()` nunca executa as verificações na thread de quem chama,
+    exceto na primeira vez, quando aguarda até `wait` segundos pelo
+    resultado inicial.
+    """
+    def __init__(self, ttl=STATUS_TTL, probe=probe_components):
+        self.ttl = ttl
+        self.probe = probe
+        self.status = None
+        self.updated_at = 0
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.refreshing = False
+
+    def _refresh(self):
+        try:
+            status = self.probe()
+            with self.lock:
+                self.status = status
+                self.updated_at = time.monotonic()
+        finally:
+            with self.lock:
+                self.refreshing = False
+            self.ready.set()
+
+    def refresh_async(self):
+        """Inicia uma renovação em segundo plano, se nenhuma estiver em andamento"""
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def get(self, wait=PROBE_TIMEOUT):
+        """Retorna o último status conhecido, renovando-o se estiver vencido"""
+        if time.monotonic() - self.updated_at > self.ttl:
+            self.refresh_async()
+        self.ready.wait(wait)
+        with self.lock:
+            return dict(self.status) if self.status else {"docker": False, "proxmox": False}
+
+status_cache = StatusCache()
+
+def get_system_status():
+    """Retorna o status dos componentes do sistema (em cache)"""
+    return status_cache.get()
+
+def get_storage_status():
+    """Retorna o status dos storages do Proxmox (`pvesm status`) em bytes"""
+    result = subprocess.run(["pvesm", "status"], capture_output=True, text=True, check=True)
+    storages = {}
+    for line in result.stdout.splitlines()[1:]:  # Pula o cabeçalho
+        parts = line.split()
+        if len(parts) < 6:
+            continue
+        name, type_, status = parts[0:3]
+        try:
+            total, used, avail = (int(value) * 1024 for value in parts[3:6])
+        except ValueError:
+            total = used = avail = 0
+        storages[name] = {
+            "type": type_,
+            "status": status,
+            "total": total,
+            "used": used,
+            "avail": avail,
+        }
+    return storages
+
+def get_docker_root_free():
+    """Retorna o espaço livre (bytes) no data-root do Docker"""
+    result = subprocess.run(
+        ["docker", "info", "--format", "{{.DockerRootDir}}"],
+        capture_output=True, text=True, check=True
+    )
+    return shutil.disk_usage(result.stdout.strip()).free
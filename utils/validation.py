@@ -0,0 +1,246 @@
+"""Validação pós-cutover: mesmas sondas na origem e no container migrado
+
+As sondas são um script sh curto (dd, /proc, cgroup) enviado pelo stdin de
+`sh -s`, então o mesmo texto roda via SSH, `pct exec` ou `docker exec`
+sem problemas de quoting. O relatório compara as duas execuções e aponta
+regressões acima de `REGRESSION_THRESHOLD`.
+"""
+import re
+import json
+import socket
+import subprocess
+import time
+import logging
+from pathlib import Path
+from datetime import datetime
+
+logger = logging.getLogger('lincon')
+
+PROBE_TIMEOUT = 180
+READY_TIMEOUT = 120
+CONNECT_TIMEOUT = 3
+REGRESSION_THRESHOLD = 0.25
+
+# Saída em linhas chave=valor; o arquivo de teste fica em /var/tmp, que
+# normalmente está no rootfs (/tmp pode ser tmpfs)
+PROBE_SCRIPT = r'''
+export LC_ALL=C
+T=/var/tmp/.lincon_probe.$$
+echo "nproc=$(nproc 2>/dev/null || grep -c ^processor /proc/cpuinfo)"
+echo "loadavg=$(cut -d' ' -f1 /proc/loadavg)"
+awk '/^MemAvailable:/{print "mem_available_kb=" $2}' /proc/meminfo
+echo "mem_limit=$(cat /sys/fs/cgroup/memory.max 2>/dev/null || cat /sys/fs/cgroup/memory/memory.limit_in_bytes 2>/dev/null)"
+echo "mem_usage=$(cat /sys/fs/cgroup/memory.current 2>/dev/null || cat /sys/fs/cgroup/memory/memory.usage_in_bytes 2>/dev/null)"
+echo "cpu=$( (dd if=/dev/zero bs=1M count=256 | md5sum >/dev/null) 2>&1 | tail -n1)"
+echo "disk_write=$(dd if=/dev/zero of=$T bs=1M count=64 conv=fsync 2>&1 | tail -n1)"
+# Sem O_DIRECT (tmpfs, overlay, busybox) a leitura vem do page cache: o modo
+# vai junto para só comparar leituras medidas do mesmo jeito
+if R=$(dd if=$T of=/dev/null bs=1M iflag=direct 2>&1); then
+    echo "disk_read_mode=direct"
+else
+    R=$(dd if=$T of=/dev/null bs=1M 2>&1)
+    echo "disk_read_mode=cached"
+fi
+echo "disk_read=$(echo "$R" | tail -n1)"
+echo "fsync=$(dd if=/dev/zero of=$T bs=4k count=100 oflag=dsync 2>&1 | tail -n1)"
+rm -f $T
+awk 'FNR > 1 && $4 == "0A" {print "listen=" $2}' /proc/net/tcp /proc/net/tcp6 2>/dev/null | sort -u
+ip -4 -o addr show scope global 2>/dev/null | awk '{split($4, a, "/"); print "address=" a[1]}'
+echo "boot=$(systemd-analyze time 2>/dev/null | head -n1)"
+'''
+
+# Só lista as portas em escuta (usado enquanto o container sobe)
+LISTEN_SCRIPT = r'''awk 'FNR > 1 && $4 == "0A" {print "listen=" $2}' /proc/net/tcp /proc/net/tcp6 2>/dev/null'''
+
+# Métrica -> True se maior é melhor
+METRICS = {
+    "cpu_mbps": True,
+    "disk_write_mbps": True,
+    "disk_read_mbps": True,
+    "fsync_ms": False,
+    "cpu_idle_cores": True,
+    "mem_headroom_mb": True,
+    "boot_to_ready_seconds": False,
+}
+
+# Só informativas: na origem é o boot do systemd, no container o tempo do
+# start até as portas da origem escutarem; não contam como regressão
+INFORMATIONAL = {"boot_to_ready_seconds"}
+
+# Métrica -> campo com o modo da medição (só se comparam modos iguais)
+MODES = {"disk_read_mbps": "disk_read_mode"}
+
+_LOOPBACK = {"0100007F", "00000000000000000000000001000000"}
+_DD = re.compile(r"(\d+) bytes.*copied,\s*([\d.]+)\s*s")
+_SPAN = re.compile(r"([\d.]+)(min|ms|s)\b")
+
+def _dd_rate(line):
+    """(bytes, segundos) da última linha do dd (GNU ou busybox), ou None"""
+    match = _DD.search(line or "")
+    if not match or not float(match.group(2)):
+        return None
+    return int(match.group(1)), float(match.group(2))
+
+def _boot_seconds(line):
+    """Total do `systemd-analyze time` ('... = 1min 2.345s')"""
+    if "=" not in (line or ""):
+        return None
+    units = {"min": 60, "s": 1, "ms": 0.001}
+    return round(sum(float(value) * units[unit] for value, unit in _SPAN.findall(line.rsplit("=", 1)[1])), 2)
+
+def _listening(values):
+    """Portas em escuta fora do loopback, a partir de 'ENDEREÇO:PORTA' em hex"""
+    ports = set()
+    for value in values:
+        address, _, port = value.partition(":")
+        if address not in _LOOPBACK:
+            ports.add(int(port, 16))
+    return sorted(ports)
+
+def parse_probe(output):
+    """Converte a saída do PROBE_SCRIPT nas métricas do relatório"""
+    values = {}
+    listen, addresses = [], []
+    for line in output.splitlines():
+        key, _, value = line.partition("=")
+        if key == "listen":
+            listen.append(value)
+        elif key == "address":
+            addresses.append(value)
+        elif key:
+            values[key] = value.strip()
+
+    result = {"ports": _listening(listen), "addresses": addresses, "disk_read_mode": values.get("disk_read_mode")}
+    for key, metric in (("cpu", "cpu_mbps"), ("disk_write", "disk_write_mbps"), ("disk_read", "disk_read_mbps")):
+        rate = _dd_rate(values.get(key))
+        result[metric] = round(rate[0] / rate[1] / 1e6, 1) if rate else None
+    fsync = _dd_rate(values.get("fsync"))
+    result["fsync_ms"] = round(fsync[1] / 100 * 1000, 2) if fsync else None
+
+    try:
+        result["cpu_idle_cores"] = round(int(values["nproc"]) - float(values["loadavg"]), 2)
+    except (KeyError, ValueError):
+        result["cpu_idle_cores"] = None
+    try:
+        headroom = int(values["mem_available_kb"]) / 1024
+        # Limite do cgroup (docker --memory / memória do CT) quando existir
+        if values.get("mem_limit", "").isdigit() and values.get("mem_usage", "").isdigit():
+            limit = int(values["mem_limit"])
+            if limit < 1 << 60:
+                headroom = min(headroom, (limit - int(values["mem_usage"])) / 1024 ** 2)
+        result["mem_headroom_mb"] = round(headroom)
+    except (KeyError, ValueError):
+        result["mem_headroom_mb"] = None
+    result["boot_to_ready_seconds"] = _boot_seconds(values.get("boot"))
+    return result
+
+def run_probe(shell_command, script=PROBE_SCRIPT):
+    """Executa o script com `shell_command` (ex.: [..., "sh", "-s"]); saída ou ''"""
+    try:
+        result = subprocess.run(shell_command, input=script, capture_output=True,
+                                text=True, timeout=PROBE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        logger.warning(f"Sondas excederam {PROBE_TIMEOUT}s: {shell_command[0]}")
+        return ""
+    return result.stdout
+
+def wait_ready(shell_command, ports, started, timeout=READY_TIMEOUT):
+    """Segundos desde `started` até o container aceitar exec e escutar `ports`
+
+    None se não ficou pronto dentro do timeout.
+    """
+    while time.monotonic() - started < timeout:
+        output = run_probe(shell_command, LISTEN_SCRIPT)
+        if output or not ports:
+            listening = _listening(line.partition("=")[2] for line in output.splitlines())
+            if set(ports) <= set(listening):
+                return round(time.monotonic() - started, 2)
+        time.sleep(1)
+    return None
+
+def reachable(host, port):
+    try:
+        with socket.create_connection((host, port), timeout=CONNECT_TIMEOUT):
+            return True
+    except OSError:
+        return False
+
+def compare(source, target):
+    """Deltas por métrica e lista das regressões"""
+    deltas, regressions = {}, []
+    for metric, higher_is_better in METRICS.items():
+        before, after = source.get(metric), target.get(metric)
+        delta = {"source": before, "target": after, "change": None}
+        mode = MODES.get(metric)
+        if mode and source.get(mode) != target.get(mode):
+            # Ex.: O_DIRECT num lado e page cache no outro
+            delta["modes"] = [source.get(mode), target.get(mode)]
+        elif before and after is not None:
+            delta["change"] = round((after - before) / abs(before), 3)
+            worse = -delta["change"] if higher_is_better else delta["change"]
+            if worse > REGRESSION_THRESHOLD and metric not in INFORMATIONAL:
+                regressions.append(metric)
+        deltas[metric] = delta
+    return deltas, regressions
+
+def validate(source_shell, target_shell, source_host, started, target_host=None):
+    """Roda as sondas na origem e no container e monta o relatório
+
+    `source_shell`/`target_shell` executam `sh -s` em cada lado; `started`
+    é o `time.monotonic()` de quando o container foi iniciado.
+    """
+    # Portas da origem primeiro: o tempo até ficar pronto não inclui as sondas
+    ports = _listening(line.partition("=")[2] for line in run_probe(source_shell, LISTEN_SCRIPT).splitlines())
+    ready = wait_ready(target_shell, ports, started)
+    source = parse_probe(run_probe(source_shell))
+    target = parse_probe(run_probe(target_shell))
+    # Na origem é o boot do systemd; no container, do start até as portas
+    target["boot_to_ready_seconds"] = ready
+
+    target_host = target_host or (target["addresses"][0] if target["addresses"] else None)
+    unreachable = []
+    for port in source["ports"]:
+        if reachable(source_host, port) and not (target_host and reachable(target_host, port)):
+            unreachable.append(port)
+
+    deltas, regressions = compare(source, target)
+    return {
+        "source": source,
+        "target": target,
+        "deltas": deltas,
+        "regressions": regressions,
+        "ready": ready is not None,
+        "missing_ports": sorted(set(source["ports"]) - set(target["ports"])),
+        "unreachable_ports": unreachable,
+        "target_host": target_host,
+    }
+
+def passed(report):
+    """True se o container ficou pronto sem regressões nem portas faltando"""
+    return report["ready"] and not (report["regressions"] or report["missing_ports"] or report["unreachable_ports"])
+
+def format_report(report):
+    """Linhas de texto com os deltas (para o console)"""
+    lines = []
+    for metric, delta in report["deltas"].items():
+        change = f"{delta['change']:+.0%}" if delta["change"] is not None else "-"
+        mark = " !" if metric in report["regressions"] else ""
+        if delta.get("modes"):
+            mark = f" (modos diferentes: {' x '.join(map(str, delta['modes']))})"
+        elif metric in INFORMATIONAL:
+            mark = " (informativo)"
+        lines.append(f"{metric:<24} {delta['source']!s:>10} -> {delta['target']!s:<10} {change}{mark}")
+    if report["missing_ports"]:
+        lines.append(f"Portas sem escuta no container: {', '.join(map(str, report['missing_ports']))}")
+    if report["unreachable_ports"]:
+        lines.append(f"Portas inalcançáveis no container: {', '.join(map(str, report['unreachable_ports']))}")
+    return lines
+
+def save_report(kind, name, report):
+    """Guarda o relatório em state/validations/ e retorna o caminho"""
+    directory = Path(__file__).parent.parent / "state" / "validations"
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{kind}_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=4)
+    return path